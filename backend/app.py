@@ -1,248 +1,1166 @@
-from flask import Flask, request, jsonify
+import time
+
+_import_start = time.perf_counter()
+
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 import torch
-import torch.nn as nn
 from pathlib import Path
+import hmac
 import json
+import os
+import threading
 import tiktoken
-import re
+
+from inference import (
+    AdmissionControl,
+    DAY_LABELS,
+    DAY_ORDER,
+    BatchScheduler,
+    InferencePool,
+    MetricsRegistry,
+    ModelRouter,
+    NgramDraft,
+    ModelVariant,
+    QueueFullError,
+    RateLimitError,
+    CausalGPT,
+    PromptPrefix,
+    ResponseCache,
+    SimpleGPT,
+    SingleFlight,
+    StopCriteria,
+    TokenTimer,
+    TokenUsage,
+    WeekGrammar,
+    WeekIndex,
+    apply_repetition_penalty,
+    convert_simple_gpt_state_dict,
+    enforce_week_structure,
+    host_signature,
+    iter_generate_batch,
+    load_allowed_token_ids,
+    load_state_dict_file,
+    load_thread_profile,
+    normalize_message,
+    normalize_week_text,
+    parse_day_line,
+    parse_week,
+    quantize_dynamic_int8,
+    resolve_checkpoint,
+    restrict_output_vocab,
+    sample_top_k,
+    save_thread_profile,
+    set_interop_threads,
+    sweep_threads,
+    thread_candidates,
+    thread_profile_lock,
+    verify_draft_token,
+)
 
 app = Flask(__name__)
-CORS(app)
 
 # Configuration
 PROJECT_ROOT = Path(__file__).resolve().parent
-MODEL_PATH = PROJECT_ROOT / "output" / "model" / "running_plan_finetuned_model_2.pth"
+# L'export safetensors voisin (export_safetensors.py) est chargé en priorité s'il existe
+MODEL_PATH = Path(os.getenv("MODEL_PATH", PROJECT_ROOT / "output" / "model" / "running_plan_finetuned_model_2.pth"))
+# Test A/B: second checkpoint (variante "b") et part du trafic qui lui est routée
+MODEL_B_PATH = os.getenv("MODEL_B_PATH", "")
+MODEL_B_WEIGHT = float(os.getenv("MODEL_B_WEIGHT", "0.5"))
+# Rechargement à chaud: intervalle (s) de surveillance des fichiers chargés (0 = désactivé).
+# Remplacer un checkpoint par renommage (mv), jamais en le réécrivant sur place: les
+# poids mappés en mémoire (MODEL_MMAP) du modèle en service seraient modifiés.
+MODEL_WATCH_S = float(os.getenv("MODEL_WATCH_S", "0"))
+# Jeton des endpoints /api/admin (en-tête "Authorization: Bearer ..."); vide = désactivés
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+# Architecture servie: "simple" (SimpleGPT, encodeur bidirectionnel du notebook) ou
+# "causal" (CausalGPT, mêmes poids convertis, attention causale fusionnée)
+MODEL_ARCH = os.getenv("MODEL_ARCH", "simple")
+# Décodage incrémental avec cache clé/valeur (attention causale, voir SimpleGPT.forward_cached);
+# sans effet sur les sorties avec MODEL_ARCH=causal, donc activé par défaut dans ce cas
+USE_KV_CACHE = os.getenv("USE_KV_CACHE", "1" if MODEL_ARCH == "causal" else "0") == "1"
+# Vocabulaire de sortie restreint aux tokens des sorties du dataset d'entraînement
+RESTRICTED_VOCAB = os.getenv("RESTRICTED_VOCAB", "0") == "1"
+VOCAB_DATASET_PATH = Path(os.getenv(
+    "VOCAB_DATASET_PATH", PROJECT_ROOT / "Data" / "running_week_training_dataset_final.json"
+))
+# Décodage contraint au format "Jour: Activité" x 7 (voir WeekGrammar)
+WEEK_GRAMMAR = os.getenv("WEEK_GRAMMAR", "1") == "1"
+# Conditions d'arrêt (voir StopCriteria): chaînes séparées par des virgules, semaine complète
+STOP_STRINGS = [s for s in os.getenv("STOP_STRINGS", "###").split(",") if s]
+STOP_ON_COMPLETE_WEEK = os.getenv("STOP_ON_COMPLETE_WEEK", "1") == "1"
+# Décodage spéculatif (brouillon n-grammes des sorties du dataset, voir NgramDraft):
+# tokens proposés par pas, 0 = désactivé; nécessite le cache KV (USE_KV_CACHE=1)
+SPECULATIVE_TOKENS = int(os.getenv("SPECULATIVE_TOKENS", "0"))
+# Réponses depuis l'index des semaines du dataset (voir WeekIndex) quand les caractéristiques
+# demandées (format du dataset ou message libre) y figurent ou en sont proches; le modèle
+# ne génère que les combinaisons nouvelles
+WEEK_INDEX = os.getenv("WEEK_INDEX", "0") == "1"
+# Écart maximal (voir WeekIndex.distance) pour servir la semaine indexée la plus proche
+# d'une combinaison absente de l'index (même objectif); 0 = clé exacte uniquement
+WEEK_INDEX_MAX_DISTANCE = float(os.getenv("WEEK_INDEX_MAX_DISTANCE", "1.5"))
+# Plafond du budget de tokens demandé par requête ("max_tokens" dans le corps JSON)
+MAX_TOKENS_LIMIT = int(os.getenv("MAX_TOKENS_LIMIT", "400"))
+# Processus servant le modèle: exporté par gunicorn.conf.py (qui en fixe la valeur par
+# défaut), 1 pour `python app.py`
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "1"))
+# Programmes complets (/api/plan): nombre maximal de semaines générées en un batch
+PLAN_MAX_WEEKS = int(os.getenv("PLAN_MAX_WEEKS", "30"))
+# Quantification au chargement: "none" ou "int8" (dynamique, Linear, CPU uniquement)
+MODEL_QUANT = os.getenv("MODEL_QUANT", "none")
+# Checkpoint mappé en mémoire au lieu d'être copié en RAM (pages partagées entre workers)
+MODEL_MMAP = os.getenv("MODEL_MMAP", "1") == "1"
+# Générations de préchauffage avant de se déclarer prêt (voir warmup)
+WARMUP_GENERATIONS = int(os.getenv("WARMUP_GENERATIONS", "2"))
+# Micro-batching des requêtes concurrentes (0 = désactivé, génération par requête)
+BATCH_WINDOW_MS = int(os.getenv("BATCH_WINDOW_MS", "0"))
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+# File d'inférence (voir InferencePool): threads dédiés au modèle, file bornée (429 au-delà)
+# et délai maximal par requête (504); avec micro-batching, un thread par place de batch
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(BATCH_MAX_SIZE if BATCH_WINDOW_MS > 0 else 2)))
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "32"))
+REQUEST_TIMEOUT_S = float(os.getenv("REQUEST_TIMEOUT_S", "120"))
+
+# Cache des réponses (LRU + TTL), clé = message normalisé + paramètres d'échantillonnage
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_TTL_S = float(os.getenv("RESPONSE_CACHE_TTL_S", "600"))
+# Regroupement des requêtes identiques en cours (même clé que le cache): une seule
+# génération, partagée (réponse ou flux) par toutes les requêtes arrivées pendant celle-ci
+COALESCE_REQUESTS = os.getenv("COALESCE_REQUESTS", "1") == "1"
+# Admission (avant tokenisation, 429 au-delà): budget par client en tokens générés
+# (seau de RATE_LIMIT_BURST tokens rechargé à RATE_LIMIT_TOKENS_PER_S, 0 = sans limite)
+# et plafond de générations admises par processus, en file ou en cours (par défaut:
+# cœurs disponibles par worker, au moins les threads d'inférence; 0 = sans plafond).
+# La file d'inférence garde ses propres 429 quand elle est pleine.
+# Le client est la clé d'API, sinon l'adresse IP: derrière un proxy inverse, fixer
+# PROXY_HOPS, sans quoi tous les clients partagent le budget de l'adresse du proxy.
+RATE_LIMIT_TOKENS_PER_S = float(os.getenv("RATE_LIMIT_TOKENS_PER_S", "20"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "2000"))
+MAX_CONCURRENT_GENERATIONS = int(os.getenv(
+    "MAX_CONCURRENT_GENERATIONS", str(max(INFERENCE_WORKERS, (os.cpu_count() or 1) // WEB_WORKERS))
+))
+# Clés d'API reconnues (en-tête X-API-Key, séparées par des virgules): budget par clé
+# au lieu de l'adresse IP; une clé inconnue est ignorée
+API_KEYS = {key for key in os.getenv("API_KEYS", "").split(",") if key}
+# Proxys inverses de confiance devant le service (0 = aucun): l'adresse du client est
+# alors lue dans X-Forwarded-For. Ne pas activer sans proxy, l'en-tête serait falsifiable.
+PROXY_HOPS = int(os.getenv("PROXY_HOPS", "0"))
+# Origines autorisées pour les appels /api depuis un navigateur (séparées par des virgules)
+CORS_ORIGINS = [origin for origin in os.getenv("CORS_ORIGINS", "*").split(",") if origin]
+# Réglage des threads torch par hôte: au premier démarrage, chaque nombre de threads
+# intra-op (1, 2, 4... jusqu'au maximum du processus) est mesuré sur un prompt de
+# programme; le plus rapide est enregistré dans THREAD_PROFILE_PATH puis réappliqué aux
+# démarrages suivants (threads inter-op: profil de benchmarks/thread_sweep.py).
+# Désactivé si TORCH_THREADS est fixé explicitement.
+THREAD_TUNING = os.getenv("THREAD_TUNING", "1") == "1" and not os.getenv("TORCH_THREADS")
+THREAD_PROFILE_PATH = Path(os.getenv("THREAD_PROFILE_PATH", PROJECT_ROOT / "output" / "thread_profile.json"))
+THREAD_TUNING_REPEATS = int(os.getenv("THREAD_TUNING_REPEATS", "3"))
+# Mode déterministe: sans "seed" dans la requête, SAMPLING_SEED est utilisé
+DETERMINISTIC = os.getenv("DETERMINISTIC", "0") == "1"
+SAMPLING_SEED = int(os.getenv("SAMPLING_SEED", "0"))
+
+INSTRUCTION = "Generate a complete week (1) of a running training program."
+DEFAULT_SAMPLING = dict(max_tokens=200, top_k=50, temperature=0.7, repetition_penalty=1.2)
+
+PRIMARY_VARIANT = "a"
+
+CORS(app, resources={r"/api/*": {"origins": CORS_ORIGINS}})
+if PROXY_HOPS > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_HOPS)
 
 # Variables globales
+# Modèle de la variante principale; les requêtes sont servies par la variante que
+# choisit `model_router` (voir ModelRouter)
 model = None
+model_router = ModelRouter()
+# Un rechargement à la fois; état du dernier rechargement par variante (/api/admin/models)
+reload_lock = threading.Lock()
+reload_status = {}
+ready = False
+# Durées de démarrage (secondes), exposées par /api/health. import_s est mesuré depuis
+# la première ligne de ce module, ou de wsgi.py sous gunicorn (torch inclus)
+startup_timings = {
+    "import_s": time.perf_counter() - _import_start, "load_s": None, "thread_tuning_s": None, "warmup_s": None
+}
+# Threads torch appliqués (exposés par /api/health): "profile", "sweep" ou "default"
+thread_config = {"intra_op_threads": None, "interop_threads": None, "source": "default", "timings_s": None}
 tokenizer = None
+inference_pool = None
+prompt_prefix = None
+week_grammar = None
+stop_criteria = None
+speculative_draft = None
+week_index = None
+response_cache = ResponseCache(max_size=RESPONSE_CACHE_SIZE, ttl_s=RESPONSE_CACHE_TTL_S)
+token_usage = TokenUsage()
+single_flight = SingleFlight(enabled=COALESCE_REQUESTS)
+admission_control = AdmissionControl(
+    tokens_per_s=RATE_LIMIT_TOKENS_PER_S, burst=RATE_LIMIT_BURST, max_concurrent=MAX_CONCURRENT_GENERATIONS,
+    busy_retry_after=lambda: inference_pool.retry_after() if inference_pool is not None else 1
+)
 
-# Modèle SimpleGPT (même architecture que celle utilisée dans le notebook)
-class SimpleGPT(nn.Module):
-    """Simplified GPT model for instruction finetuning"""
-    def __init__(self, vocab_size=50257, embedding_dim=256, n_layers=4, n_heads=4, context_length=1024):
-        super().__init__()
-        self.token_embedding = nn.Embedding(vocab_size, embedding_dim)
-        self.pos_embedding = nn.Embedding(context_length, embedding_dim)
-        
-        # Transformer layers
-        encoder_layer = nn.TransformerEncoderLayer(
-            d_model=embedding_dim,
-            nhead=n_heads,
-            dim_feedforward=512,
-            batch_first=True,
-            dropout=0.1
-        )
-        self.transformer = nn.TransformerEncoder(encoder_layer, num_layers=n_layers)
-        
-        # Output layer
-        self.output_layer = nn.Linear(embedding_dim, vocab_size)
-    
-    def forward(self, input_ids):
-        seq_len = input_ids.size(1)
-        pos_ids = torch.arange(seq_len, device=input_ids.device).unsqueeze(0)
-        
-        token_emb = self.token_embedding(input_ids)
-        pos_emb = self.pos_embedding(pos_ids)
-        x = token_emb + pos_emb
-        
-        x = self.transformer(x)
-        logits = self.output_layer(x)
-        return logits
+# Métriques Prometheus (/metrics), propres au processus
+metrics = MetricsRegistry()
+tokenize_seconds = metrics.histogram("runplan_tokenize_seconds", "Tokenisation du prompt")
+time_to_first_token_seconds = metrics.histogram(
+    "runplan_time_to_first_token_seconds",
+    "Délai entre la réception de la requête et le premier token échantillonné (hors libellés imposés)"
+)
+decode_token_seconds = metrics.histogram(
+    "runplan_decode_token_seconds",
+    "Latence moyenne par token échantillonné (après le premier, hors libellés imposés), par génération"
+)
+postprocess_seconds = metrics.histogram(
+    "runplan_postprocess_seconds", "Post-traitement de la réponse (extract_response + enforce_week_structure)"
+)
+request_seconds = metrics.histogram(
+    "runplan_request_seconds", "Durée totale des requêtes HTTP (fin du flux comprise)", labelnames=("endpoint",)
+)
+model_generation_seconds = metrics.histogram(
+    "runplan_model_generation_seconds", "Durée de génération d'une réponse, par variante de modèle",
+    labelnames=("model",)
+)
+model_outputs_total = metrics.counter(
+    "runplan_model_outputs_total", "Réponses générées par variante, valides ou non (7 jours produits par le modèle)",
+    labelnames=("model", "valid")
+)
+week_index_lookup_seconds = metrics.histogram(
+    "runplan_week_index_lookup_seconds", "Recherche dans l'index des semaines (WEEK_INDEX)",
+    buckets=(1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3)
+)
+errors_total = metrics.counter(
+    "runplan_errors_total", "Réponses en erreur (code HTTP, ou \"stream\" pour une erreur en cours de flux)",
+    labelnames=("endpoint", "status")
+)
 
 
-def apply_repetition_penalty(logits, generated_ids, penalty=1.2):
-    """Apply repetition penalty to logits"""
-    if penalty == 1.0 or generated_ids.numel() == 0:
-        return logits
-    unique_ids = torch.unique(generated_ids)
-    logits[unique_ids] = logits[unique_ids] / penalty
-    return logits
+@metrics.collector
+def collect_service_stats():
+    """Compteurs déjà tenus par le cache, l'usage des tokens et la file d'inférence"""
+    cache = response_cache.stats()
+    usage = token_usage.stats()
+    coalescing = single_flight.stats()
+    admission = admission_control.stats()
+    samples = [
+        ("runplan_generated_tokens_total", "counter", "Tokens générés", usage["generated_tokens"]),
+        ("runplan_kept_tokens_total", "counter", "Tokens générés repris dans les réponses", usage["kept_tokens"]),
+        ("runplan_cache_hits_total", "counter", "Réponses servies depuis le cache", cache["hits"]),
+        ("runplan_cache_misses_total", "counter", "Requêtes absentes du cache", cache["misses"]),
+        ("runplan_cache_entries", "gauge", "Entrées du cache de réponses", cache["size"]),
+        ("runplan_coalesced_requests_total", "counter", "Requêtes rattachées à une génération identique en cours", coalescing["followers"]),
+        ("runplan_coalesce_ratio", "gauge", "Part des requêtes générées rattachées à une génération en cours", coalescing["coalesce_ratio"] or 0.0),
+        ("runplan_active_generations", "gauge", "Générations admises en cours", admission["active"]),
+        ("runplan_budget_rejected_total", "counter", "Requêtes refusées, budget de tokens du client épuisé (429)", admission["budget_rejected"]),
+        ("runplan_concurrency_rejected_total", "counter", "Requêtes refusées, trop de générations en cours (429)", admission["concurrency_rejected"]),
+    ]
+    if speculative_draft is not None:
+        draft = speculative_draft.stats()
+        samples += [
+            ("runplan_draft_proposed_tokens_total", "counter", "Tokens proposés par le brouillon n-grammes", draft["proposed_tokens"]),
+            ("runplan_draft_accepted_tokens_total", "counter", "Tokens du brouillon acceptés par le modèle", draft["accepted_tokens"]),
+        ]
+    if week_index is not None:
+        index = week_index.stats()
+        samples += [
+            ("runplan_week_index_hits_total", "counter", "Semaines servies depuis l'index", index["hits"]),
+            ("runplan_week_index_nearest_hits_total", "counter", "Semaines servies depuis l'index par plus proche voisin", index["nearest_hits"]),
+            ("runplan_week_index_misses_total", "counter", "Semaines absentes de l'index (générées)", index["misses"]),
+        ]
+    if inference_pool is not None:
+        queue = inference_pool.stats()
+        samples += [
+            ("runplan_inference_queue_length", "gauge", "Jobs en attente dans la file d'inférence", queue["queue_length"]),
+            ("runplan_inference_busy_workers", "gauge", "Threads d'inférence occupés", queue["busy"]),
+            ("runplan_inference_rejected_total", "counter", "Requêtes rejetées (file pleine, 429)", queue["rejected"]),
+            ("runplan_inference_timeouts_total", "counter", "Requêtes au délai dépassé (504)", queue["timeouts"]),
+        ]
+    return samples
 
 
-def generate_with_sampling(model, prompt_ids, tokenizer, device, max_tokens=200, 
-                          top_k=50, temperature=0.7, stop_token=50256, repetition_penalty=1.2):
-    """Generate text using top-k sampling with repetition penalty (from notebook)"""
+def iter_generate_with_sampling(model, prompt_ids, device, max_tokens=200, top_k=50, temperature=0.7,
+                                stop_token=50256, repetition_penalty=1.2, use_cache=False, seed=None,
+                                past_key_values=None, grammar=None, stopping=None, draft=None, draft_tokens=4,
+                                timer=None):
+    """Générateur: produit chaque token échantillonné (int) dès qu'il est choisi.
+
+    Avec `use_cache=True`, le prompt est calculé une seule fois puis chaque pas ne
+    traite que le dernier token échantillonné (cache clé/valeur par couche).
+    `past_key_values` (avec `use_cache`) contient l'état déjà calculé pour le début de
+    `prompt_ids` (ex: préfixe commun du prompt): seule la suite est traitée.
+    Avec `seed`, l'échantillonnage est reproductible (générateur aléatoire dédié).
+    Avec `grammar` (voir `WeekGrammar`), les libellés de jour sont imposés sans
+    échantillonnage et la génération s'arrête après la ligne du dernier jour.
+    Avec `stopping` (voir `StopCriteria`), la génération s'arrête sur une chaîne
+    d'arrêt ou dès que la semaine est complète.
+    Avec `draft` (voir `NgramDraft`) et `use_cache`, décodage spéculatif: jusqu'à
+    `draft_tokens` tokens proposés sont vérifiés en un seul forward (voir
+    `verify_draft_token`), sans changer la loi des tokens produits.
+    `timer` (voir `TokenTimer`) chronomètre les tokens échantillonnés, hors tokens imposés.
+    """
     model.eval()
+    generator = None if seed is None else torch.Generator(device=device).manual_seed(seed)
+    # Vocabulaire restreint (voir restrict_output_vocab): les logits sont indexés autrement
+    vocab_ids = getattr(model, "vocab_ids", None)
+    vocab_index = getattr(model, "vocab_index", None)
     output_ids = prompt_ids.clone()
+    if not use_cache:
+        past_key_values = None
+    past_len = 0 if past_key_values is None else past_key_values[0][0].size(2)
+    next_input_ids = output_ids[:, past_len:]
+    constraint = grammar.start() if grammar is not None else None
+    stop_state = stopping.start() if stopping is not None else None
+    generated = 0
     
     with torch.no_grad():
-        for _ in range(max_tokens):
-            logits = model(output_ids)
-            next_token_logits = logits[0, -1, :] / temperature
-            next_token_logits = apply_repetition_penalty(next_token_logits, output_ids[0], penalty=repetition_penalty)
+        while generated < max_tokens:
+            if constraint is not None and constraint.pending:
+                # Tokens imposés: ajoutés tels quels, traités au prochain forward
+                forced = constraint.forced_tokens()[:max_tokens - generated]
+                forced_ids = torch.tensor([forced], dtype=torch.long, device=output_ids.device)
+                next_input_ids = torch.cat([next_input_ids, forced_ids], dim=1)
+                output_ids = torch.cat([output_ids, forced_ids], dim=1)
+                generated += len(forced)
+                for token_id in forced:
+                    constraint.advance(token_id)
+                    if stop_state is not None:
+                        stop_state.update(token_id)
+                    yield token_id
+                continue
             
-            top_k_logits, top_k_indices = torch.topk(next_token_logits, min(top_k, next_token_logits.size(0)))
-            top_k_probs = torch.softmax(top_k_logits, dim=-1)
-            sampled_idx = torch.multinomial(top_k_probs, 1)
-            next_token = top_k_indices[sampled_idx]
-            output_ids = torch.cat([output_ids, next_token.view(1, 1)], dim=1)
+            proposal = []
+            if draft is not None and use_cache:
+                proposal = draft.propose(output_ids[0].tolist(), min(draft_tokens, max_tokens - generated - 1))
+            if use_cache:
+                step_ids = next_input_ids
+                if proposal:
+                    proposal_ids = torch.tensor([proposal], dtype=torch.long, device=output_ids.device)
+                    step_ids = torch.cat([next_input_ids, proposal_ids], dim=1)
+                    proposal_columns = (proposal_ids if vocab_index is None else vocab_index[proposal_ids])[0].tolist()
+                logits, past_key_values = model.forward_cached(step_ids, past_key_values)
+                # Une ligne de logits par position à décider: après le dernier token connu,
+                # puis après chaque token proposé
+                logits = logits[:, next_input_ids.size(1) - 1:, :]
+            else:
+                logits = model(output_ids)[:, -1:, :]
             
-            if next_token.item() == stop_token:
+            accepted = 0
+            for position in range(logits.size(1)):
+                next_token_logits = logits[:, position, :] / temperature
+                next_token_logits = apply_repetition_penalty(
+                    next_token_logits, output_ids, penalty=repetition_penalty, vocab_index=vocab_index
+                )
+                if constraint is not None:
+                    next_token_logits = next_token_logits.masked_fill(
+                        constraint.banned_mask(vocab_ids), float("-inf")
+                    )
+                
+                rejected = False
+                if position < len(proposal):
+                    next_input_ids, is_accepted = verify_draft_token(
+                        next_token_logits, proposal_columns[position], top_k, generator=generator
+                    )
+                    accepted += is_accepted
+                    rejected = not is_accepted
+                else:
+                    next_input_ids = sample_top_k(next_token_logits, top_k, generator=generator)
+                if vocab_ids is not None:
+                    next_input_ids = vocab_ids[next_input_ids]
+                output_ids = torch.cat([output_ids, next_input_ids], dim=1)
+                generated += 1
+                
+                # Seule lecture côté hôte du pas: le token est produit, puis testé (arrêt, grammaire)
+                token_id = next_input_ids.item()
+                if timer is not None:
+                    timer.sampled()
+                yield token_id
+                finished = token_id == stop_token
+                if constraint is not None and not finished:
+                    constraint.advance(token_id)
+                    finished = constraint.done
+                if stop_state is not None and not finished:
+                    finished = stop_state.update(token_id)
+                if finished or rejected or (constraint is not None and constraint.pending):
+                    break
+            
+            if proposal:
+                draft.record(len(proposal), accepted)
+            if finished:
                 break
-    
-    return output_ids
+            if proposal:
+                # Le cache ne garde que les tokens retenus, sauf le dernier (traité au pas suivant)
+                kept = output_ids.size(1) - 1
+                past_key_values = tuple((k[:, :, :kept], v[:, :, :kept]) for k, v in past_key_values)
+                next_input_ids = output_ids[:, -1:]
+
 
+def generate_with_sampling(model, prompt_ids, tokenizer, device, max_tokens=200, 
+                          top_k=50, temperature=0.7, stop_token=50256, repetition_penalty=1.2,
+                          use_cache=False, seed=None, past_key_values=None, grammar=None, stopping=None,
+                          draft=None, draft_tokens=4, timer=None):
+    """Generate text using top-k sampling with repetition penalty (from notebook)"""
+    new_tokens = list(iter_generate_with_sampling(
+        model, prompt_ids, device, max_tokens=max_tokens, top_k=top_k, temperature=temperature,
+        stop_token=stop_token, repetition_penalty=repetition_penalty, use_cache=use_cache, seed=seed,
+        past_key_values=past_key_values, grammar=grammar, stopping=stopping, draft=draft,
+        draft_tokens=draft_tokens, timer=timer
+    ))
+    new_ids = torch.tensor([new_tokens], dtype=torch.long, device=prompt_ids.device)
+    return torch.cat([prompt_ids, new_ids], dim=1)
 
-def load_model():
-    """Charge le modèle au démarrage"""
-    global model, tokenizer
+
+def load_model(start_workers=True):
+    """Charge le modèle au démarrage (et la variante "b" si MODEL_B_PATH).
+
+    `start_workers=False` (préchargement gunicorn, voir wsgi.py): les threads
+    d'inférence sont démarrés ensuite dans chaque worker (`start_inference_workers`).
+    """
+    global model, tokenizer, prompt_prefix, week_grammar, stop_criteria, speculative_draft, week_index
     
+    start = time.perf_counter()
     try:
+        # Threads inter-op du profil: seulement avant tout calcul parallèle du processus
+        profile = load_thread_profile(THREAD_PROFILE_PATH, thread_signature()) if THREAD_TUNING else None
+        if profile is not None and profile.get("interop_threads") and set_interop_threads(profile["interop_threads"]):
+            print(f"  Threads inter-op: {profile['interop_threads']} (profil {THREAD_PROFILE_PATH.name})")
+        
         # Charger le tokenizer
         tokenizer = tiktoken.get_encoding("gpt2")
         print(f"✓ Tokenizer GPT-2 chargé")
         
-        # Créer l'instance du modèle
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        model = SimpleGPT(
-            vocab_size=50257,
-            embedding_dim=256,
-            n_layers=4,
-            n_heads=4,
-            context_length=1024
-        ).to(device)
-        
-        # Charger les poids
-        if MODEL_PATH.exists():
-            state_dict = torch.load(MODEL_PATH, map_location=device)
-            model.load_state_dict(state_dict)
-            print(f"✓ Modèle chargé avec succès depuis {MODEL_PATH}")
-            print(f"  Device: {device}")
-            print(f"  Architecture: SimpleGPT (256 dim, 4 layers, 4 heads)")
-        else:
+        checkpoint_path = resolve_checkpoint(MODEL_PATH)
+        if not checkpoint_path.exists():
             print(f"✗ Fichier modèle non trouvé: {MODEL_PATH}")
+            model = None
             return False
         
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        variant = build_variant(PRIMARY_VARIANT, checkpoint_path, device)
+        model, prompt_prefix = variant.model, variant.prompt_prefix
+        print(f"  Préfixe de prompt: {len(prompt_prefix.ids)} tokens précalculés")
+        if MODEL_B_PATH:
+            variant_b = build_variant("b", resolve_checkpoint(MODEL_B_PATH), device)
+            model_router.add(variant, weight=1.0 - MODEL_B_WEIGHT)
+            model_router.add(variant_b, weight=MODEL_B_WEIGHT)
+            print(f"  Test A/B: {MODEL_B_WEIGHT:.0%} du trafic vers la variante b")
+        else:
+            model_router.add(variant, weight=1.0)
+        if WEEK_GRAMMAR:
+            week_grammar = WeekGrammar(tokenizer, DAY_LABELS, device=device)
+            print(f"  Décodage contraint: 7 lignes \"Jour: Activité\", arrêt après {DAY_LABELS[-1]}")
+        if STOP_STRINGS or STOP_ON_COMPLETE_WEEK:
+            stop_criteria = StopCriteria(
+                tokenizer, STOP_STRINGS, day_labels=DAY_LABELS if STOP_ON_COMPLETE_WEEK else None
+            )
+        if SPECULATIVE_TOKENS > 0 and not USE_KV_CACHE:
+            print(f"⚠ SPECULATIVE_TOKENS ignoré: la vérification en un forward nécessite USE_KV_CACHE=1")
+        elif SPECULATIVE_TOKENS > 0:
+            speculative_draft = NgramDraft.from_dataset(VOCAB_DATASET_PATH, tokenizer, prefix="### Response:\n")
+            print(f"  Décodage spéculatif: {SPECULATIVE_TOKENS} tokens proposés par pas "
+                  f"({len(speculative_draft.table)} contextes n-grammes, {VOCAB_DATASET_PATH.name})")
+        if WEEK_INDEX:
+            week_index = WeekIndex.from_dataset(
+                VOCAB_DATASET_PATH, postprocess=enforce_week_structure, max_distance=WEEK_INDEX_MAX_DISTANCE
+            )
+            print(f"  Index des semaines: {len(week_index.table)} combinaisons ({VOCAB_DATASET_PATH.name})")
+        if start_workers:
+            start_inference_workers()
+        
+        startup_timings["load_s"] = time.perf_counter() - start
         return True
     except Exception as e:
         print(f"✗ Erreur lors du chargement du modèle: {e}")
+        model = None
         return False
 
 
-def build_prompt(instruction_text, input_text):
-    """Formate le prompt selon le format du notebook"""
-    prompt_text = (
+def file_signature(path):
+    """(mtime, taille) d'un fichier, None s'il n'existe pas"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def build_variant(name, checkpoint_path, device):
+    """Charge un checkpoint et l'état qui en dépend, sans toucher aux variantes en service"""
+    signature = file_signature(checkpoint_path)
+    # Créer l'instance du modèle
+    model_cls = CausalGPT if MODEL_ARCH == "causal" else SimpleGPT
+    variant_model = model_cls(
+        vocab_size=50257,
+        embedding_dim=256,
+        n_layers=4,
+        n_heads=4,
+        context_length=1024
+    ).to(device)
+    
+    # Charger les poids (assign=True: les paramètres deviennent les tenseurs du
+    # checkpoint, sans copie; avec MODEL_MMAP, pages lues à la demande)
+    state_dict = load_state_dict_file(checkpoint_path, device, mmap=MODEL_MMAP)
+    if MODEL_ARCH == "causal":
+        state_dict = convert_simple_gpt_state_dict(state_dict)
+    variant_model.load_state_dict(state_dict, assign=True)
+    print(f"✓ Modèle {name} chargé avec succès depuis {checkpoint_path}")
+    print(f"  Device: {device}")
+    print(f"  Architecture: {model_cls.__name__} (256 dim, 4 layers, 4 heads)")
+    variant_model.eval()
+    if RESTRICTED_VOCAB:
+        allowed_ids = load_allowed_token_ids(VOCAB_DATASET_PATH, tokenizer)
+        restrict_output_vocab(variant_model, allowed_ids)
+        print(f"  Vocabulaire de sortie restreint: {len(allowed_ids)} tokens ({VOCAB_DATASET_PATH.name})")
+    if MODEL_QUANT == "int8":
+        if device == "cpu":
+            variant_model = quantize_dynamic_int8(variant_model)
+            print(f"  Quantification: int8 dynamique (couches Linear)")
+        else:
+            print(f"⚠ MODEL_QUANT=int8 ignoré: quantification dynamique disponible sur CPU uniquement")
+    # Préfixe Alpaca + instruction fixe: ids (et état du transformer si cache KV)
+    variant_prefix = PromptPrefix(
+        build_prompt_prefix(INSTRUCTION), tokenizer, variant_model if USE_KV_CACHE else None, device
+    )
+    return ModelVariant(name, checkpoint_path, variant_model, variant_prefix, signature=signature)
+
+
+def start_batch_scheduler(variant):
+    """Micro-batching propre à la variante (BATCH_WINDOW_MS > 0)"""
+    if BATCH_WINDOW_MS > 0 and variant.batch_scheduler is None:
+        variant.batch_scheduler = BatchScheduler(
+            variant.model, variant.device, window_ms=BATCH_WINDOW_MS, max_batch_size=BATCH_MAX_SIZE
+        )
+
+
+def start_inference_workers():
+    """Démarre la file d'inférence, le micro-batching et la surveillance des checkpoints
+    (les threads ne survivent pas à un fork)"""
+    global inference_pool
+    if inference_pool is None:
+        inference_pool = InferencePool(num_workers=INFERENCE_WORKERS, max_queue=INFERENCE_QUEUE_SIZE)
+        print(f"  File d'inférence: {INFERENCE_WORKERS} thread(s), {INFERENCE_QUEUE_SIZE} requêtes en attente max")
+        if MODEL_WATCH_S > 0:
+            threading.Thread(target=watch_checkpoints, args=(MODEL_WATCH_S,), name="model-watch", daemon=True).start()
+            print(f"  Rechargement à chaud: fichiers surveillés toutes les {MODEL_WATCH_S:g} s")
+    for variant in model_router.variants():
+        start_batch_scheduler(variant)
+    if BATCH_WINDOW_MS > 0:
+        print(f"  Micro-batching: fenêtre {BATCH_WINDOW_MS} ms, batch max {BATCH_MAX_SIZE}")
+
+
+def reload_variant(name, checkpoint_path, weight=None):
+    """Charge `checkpoint_path` puis l'échange atomiquement avec la variante `name`.
+
+    Le trafic n'est pas interrompu: les requêtes déjà routées terminent avec l'ancien
+    modèle. Chaque worker gunicorn recharge indépendamment (voir MODEL_WATCH_S).
+    """
+    global model, prompt_prefix
+    reload_status[name] = {"state": "loading", "path": str(checkpoint_path), "error": None}
+    with reload_lock:
+        try:
+            start = time.perf_counter()
+            variant = build_variant(name, checkpoint_path, "cuda" if torch.cuda.is_available() else "cpu")
+            warm_variant(variant, generations=1)
+            if inference_pool is not None:
+                start_batch_scheduler(variant)
+            previous = model_router.add(variant, weight)
+            if name == PRIMARY_VARIANT:
+                model, prompt_prefix = variant.model, variant.prompt_prefix
+            if previous is not None:
+                previous.close()
+        except Exception as e:
+            print(f"✗ Rechargement de la variante {name} impossible: {e}")
+            reload_status[name].update(state="error", error=str(e))
+            raise
+        reload_status[name].update(state="ok", version=variant.version, load_s=time.perf_counter() - start)
+        print(f"✓ Variante {name} rechargée en {reload_status[name]['load_s']:.2f} s ({variant.version})")
+        return variant
+
+
+def watch_checkpoints(interval_s):
+    """Recharge une variante quand son fichier change (et ne bouge plus d'un relevé à l'autre)"""
+    previous = {}
+    failed = {}
+    while True:
+        time.sleep(interval_s)
+        for variant in model_router.variants():
+            signature = file_signature(variant.path)
+            changed = signature not in (None, variant.signature, failed.get(variant.name))
+            if changed and signature == previous.get(variant.name):
+                try:
+                    reload_variant(variant.name, variant.path)
+                except Exception:
+                    # Réessayé seulement si le fichier change de nouveau
+                    failed[variant.name] = signature
+            previous[variant.name] = signature
+
+
+def warm_variant(variant, generations=WARMUP_GENERATIONS, max_tokens=32):
+    """Générations hors trafic (allocations, noyaux) avec le modèle d'une variante"""
+    prompt_ids = encode_prompt("warmup", variant.device)
+    for seed in range(generations):
+        generate_with_sampling(
+            variant.model, prompt_ids, tokenizer, variant.device, max_tokens=max_tokens, use_cache=USE_KV_CACHE,
+            seed=seed, past_key_values=prefix_past(prompt_ids, variant), grammar=week_grammar, stopping=stop_criteria,
+            draft=speculative_draft, draft_tokens=SPECULATIVE_TOKENS
+        )
+
+
+def thread_signature():
+    """Hôte et configuration de service d'un profil de threads (THREAD_PROFILE_PATH)"""
+    return host_signature(
+        model_arch=MODEL_ARCH, model_quant=MODEL_QUANT, kv_cache=USE_KV_CACHE,
+        web_workers=WEB_WORKERS
+    )
+
+
+def tune_threads(max_tokens=64):
+    """Applique le profil de threads de l'hôte, ou le mesure puis l'enregistre (THREAD_TUNING).
+
+    La mesure génère une semaine (prompt /api/chat d'un programme marathon) avec la
+    variante principale pour chaque nombre de threads intra-op jusqu'au nombre courant
+    (maximum du processus). Elle est faite une seule fois par hôte: sous gunicorn, le
+    premier worker mesure sous verrou, les autres attendent puis appliquent son profil.
+    """
+    start = time.perf_counter()
+    signature = thread_signature()
+    profile = load_thread_profile(THREAD_PROFILE_PATH, signature)
+    if profile is None:
+        with thread_profile_lock(THREAD_PROFILE_PATH):
+            profile = load_thread_profile(THREAD_PROFILE_PATH, signature)
+            if profile is None:
+                sweep_thread_profile(signature, max_tokens)
+    if profile is not None:
+        torch.set_num_threads(profile["intra_op_threads"])
+        thread_config.update(source="profile", timings_s=profile.get("timings_s"))
+    thread_config.update(intra_op_threads=torch.get_num_threads(), interop_threads=torch.get_num_interop_threads())
+    startup_timings["thread_tuning_s"] = time.perf_counter() - start
+    print(
+        f"  Threads torch: {thread_config['intra_op_threads']} intra-op, {thread_config['interop_threads']} "
+        f"inter-op ({thread_config['source']}, {startup_timings['thread_tuning_s']:.2f} s)"
+    )
+
+
+def sweep_thread_profile(signature, max_tokens):
+    """Mesure les threads intra-op (le meilleur reste appliqué) et enregistre le profil de `signature`"""
+    variant = model_router.get(PRIMARY_VARIANT)
+    prompt_ids = encode_prompt(build_plan_input("marathon", "general", 12, 4), variant.device)
+    best, timings = sweep_threads(
+        lambda: generate_with_sampling(
+            variant.model, prompt_ids, tokenizer, variant.device, max_tokens=max_tokens,
+            use_cache=USE_KV_CACHE, seed=0, past_key_values=prefix_past(prompt_ids, variant),
+            grammar=week_grammar, stopping=stop_criteria
+        ),
+        thread_candidates(torch.get_num_threads()), repeats=THREAD_TUNING_REPEATS
+    )
+    timings_s = {str(threads): seconds for threads, seconds in timings.items()}
+    thread_config.update(source="sweep", timings_s=timings_s)
+    try:
+        save_thread_profile(THREAD_PROFILE_PATH, signature, {
+            "intra_op_threads": best, "interop_threads": torch.get_num_interop_threads(),
+            "timings_s": timings_s, "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        })
+    except OSError as e:
+        print(f"⚠ Profil de threads non enregistré ({THREAD_PROFILE_PATH}): {e}")
+
+
+def warmup(generations=WARMUP_GENERATIONS, max_tokens=32):
+    """Préchauffe chaque variante chargée puis passe à l'état prêt.
+
+    Le réglage des threads (THREAD_TUNING) est fait d'abord. Retourne la durée totale
+    du préchauffage en secondes (aussi exposée par /api/health).
+    """
+    global ready
+    if THREAD_TUNING:
+        tune_threads()
+    else:
+        thread_config.update(intra_op_threads=torch.get_num_threads(), interop_threads=torch.get_num_interop_threads())
+    start = time.perf_counter()
+    for variant in model_router.variants():
+        warm_variant(variant, generations, max_tokens)
+    startup_timings["warmup_s"] = time.perf_counter() - start
+    ready = True
+    return startup_timings["warmup_s"]
+
+
+def build_prompt_prefix(instruction_text):
+    """Début du prompt (en-tête + instruction), commun aux requêtes de même instruction"""
+    return (
         f"Below is an instruction that describes a task. "
         f"Write a response that appropriately completes the request."
         f"\n\n### Instruction:\n{instruction_text}"
     )
+
+
+def build_prompt(instruction_text, input_text):
+    """Formate le prompt selon le format du notebook"""
+    prompt_text = build_prompt_prefix(instruction_text)
     if input_text:
         prompt_text += f"\n\n### Input:\n{input_text}"
     prompt_text += f"\n\n### Response:\n"
     return prompt_text
 
 
-def clean_content(content: str) -> str:
-    """Nettoie et normalise le contenu généré"""
-    c = content.strip()
-    if not c:
-        return "Rest"
-    
-    # Couper le contenu au premier jour non complètement formé
-    day_names = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche",
-                 "lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche"]
-    for day in day_names:
-        if day in c and c.find(day) > 0:  # Ne pas couper au début
-            c = c[:c.find(day)].strip()
+def build_week_instruction(week_num, total_weeks, goal, level, training_days):
+    """Instruction d'une semaine de programme (1er format de `generate_instruction_variations`)"""
+    return (
+        f"Generate a complete week ({week_num}) of a {total_weeks}-week "
+        f"{goal} running program. Training level: {level}, "
+        f"{training_days} training days per week. "
+        f"Format attendu: 7 lignes, une par jour, de Lundi à Dimanche, au format 'Jour: Activité'."
+    )
+
+
+def build_plan_input(goal, level, total_weeks, training_days, goal_time=None):
+    """Caractéristiques du programme, au format du champ `input` du dataset"""
+    return (
+        f"Objectif: {goal}; Niveau: {level}; Semaines: {total_weeks}; "
+        f"Séances/sem: {training_days}; Temps objectif: {goal_time or 'Non précisé'}."
+    )
+
+
+def request_data():
+    """Corps JSON de la requête, qui doit être un objet (sinon ValueError)"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise ValueError("Le corps de la requête doit être un objet JSON")
+    return data
+
+
+def request_message(data):
+    """Message utilisateur de /api/chat, sans espaces de bord (sinon ValueError)"""
+    message = data.get("message", "")
+    if not isinstance(message, str):
+        raise ValueError("message doit être une chaîne")
+    return message.strip()
+
+
+def request_seed(data):
+    """Graine d'échantillonnage de la requête (ou SAMPLING_SEED en mode déterministe)"""
+    seed = data.get("seed")
+    if seed is None:
+        return SAMPLING_SEED if DETERMINISTIC else None
+    if isinstance(seed, bool) or not isinstance(seed, int):
+        raise ValueError("seed doit être un entier")
+    return seed
+
+
+def bounded_int(data, name, low, high):
+    """Champ entier `name` de la requête, compris entre `low` et `high` (sinon ValueError)"""
+    value = data.get(name)
+    if isinstance(value, bool) or not isinstance(value, int) or not low <= value <= high:
+        raise ValueError(f"{name} doit être un entier entre {low} et {high}")
+    return value
+
+
+def request_max_tokens(data):
+    """Budget de tokens de la requête (`max_tokens`), sinon celui de DEFAULT_SAMPLING"""
+    if data.get("max_tokens") is None:
+        return DEFAULT_SAMPLING["max_tokens"]
+    return bounded_int(data, "max_tokens", 1, MAX_TOKENS_LIMIT)
+
+
+def request_structured(data):
+    """Mode de réponse structurée (`structured`): champs de chaque jour et totaux de la semaine"""
+    structured = data.get("structured", False)
+    if not isinstance(structured, bool):
+        raise ValueError("structured doit être un booléen")
+    return structured
+
+
+def with_structure(payload, structured):
+    """Ajoute à une semaine ses champs structurés (`parse_week`) si la requête les demande"""
+    if not structured:
+        return payload
+    return dict(payload, structured=parse_week(payload["bot_response"]))
+
+
+def parse_plan_request(data):
+    """Caractéristiques du programme demandé à /api/plan (ValueError si invalides)"""
+    goal = data.get("goal")
+    level = data.get("level", "general")
+    goal_time = data.get("goal_time")
+    if not isinstance(goal, str) or not goal.strip():
+        raise ValueError("goal est requis (ex: marathon, halfmarathon, 10km)")
+    if not isinstance(level, str) or not level.strip():
+        raise ValueError("level doit être une chaîne (ex: beginner, general, advanced)")
+    if goal_time is not None and not isinstance(goal_time, str):
+        raise ValueError("goal_time doit être une chaîne (ex: 3h45m)")
+    return {
+        "goal": goal.strip(),
+        "level": level.strip(),
+        "weeks": bounded_int(data, "weeks", 1, PLAN_MAX_WEEKS),
+        "sessions": bounded_int(data, "sessions", 1, 7),
+        "goal_time": goal_time.strip() if goal_time else None,
+    }
+
+
+def count_kept_tokens(token_ids, tokenizer, stop_token=50256):
+    """Tokens générés repris dans la semaine finale (voir StopCriteria.kept_tokens)"""
+    return StopCriteria(tokenizer, day_labels=DAY_LABELS, stop_token=stop_token).kept_tokens(token_ids)
+
+
+def encode_prompt(user_message, device):
+    """Construit et tokenise le prompt Alpaca pour un message utilisateur"""
+    prompt = build_prompt(INSTRUCTION, user_message)
+    with tokenize_seconds.time():
+        prompt_ids = prompt_prefix.encode(prompt) if prompt_prefix is not None else tokenizer.encode(prompt)
+    return torch.tensor([prompt_ids[:1024]], dtype=torch.long).to(device)
+
+
+def prefix_past(prompt_ids, variant):
+    """État précalculé du préfixe commun pour ce prompt (None si inutilisable)"""
+    return variant.prompt_prefix.past_for(prompt_ids) if variant.prompt_prefix is not None else None
+
+
+def week_is_complete(response_text):
+    """Sortie valide: le modèle a produit lui-même une ligne pour chacun des 7 jours"""
+    days = {parse_day_line(line.strip()) for line in normalize_week_text(response_text).split("\n")}
+    return {parsed[0] for parsed in days if parsed is not None} == set(DAY_ORDER)
+
+
+def record_generation(variant, start, response_text, generated_tokens):
+    """Statistiques par variante (A/B): durée depuis `start`, validité de la sortie"""
+    elapsed = time.perf_counter() - start
+    valid = week_is_complete(response_text)
+    variant.record(elapsed, valid, generated_tokens)
+    model_generation_seconds.observe(elapsed, model=variant.name)
+    model_outputs_total.inc(model=variant.name, valid=str(valid).lower())
+
+
+def extract_response(full_text):
+    """Extrait la partie générée après le marqueur de réponse"""
+    if "### Response:\n" in full_text:
+        return full_text.split("### Response:\n")[-1].strip()
+    return full_text[-400:]
+
+
+def stream_week(token_ids, prompt_ids, tokenizer, stop_token=50256):
+    """Transforme un flux de tokens en événements `(type, données)` pour le streaming.
+
+    - "token": texte décodé depuis l'événement précédent
+    - "day": ligne "Jour: Activité" dès que le modèle a fermé la ligne (première
+      occurrence de chaque jour, comme dans `enforce_week_structure`)
+    - "week": semaine complète normalisée, identique à la réponse de /api/chat
+    """
+    generated = []
+    text = ""
+    closed_lines = 0
+    emitted_days = set()
+
+    def _day_events(lines):
+        for line in lines:
+            parsed = parse_day_line(line.strip())
+            if parsed is None or parsed[0] in emitted_days:
+                continue
+            emitted_days.add(parsed[0])
+            label = DAY_LABELS[DAY_ORDER.index(parsed[0])]
+            yield "day", {"day": label, "line": f"{label}: {parsed[1]}"}
+
+    for token_id in token_ids:
+        generated.append(token_id)
+        if token_id == stop_token:
             break
-    
-    # Nettoyer les caractères spéciaux
-    c = re.sub(r"[\\/]+", " ", c)
-    c = re.sub(r"\bmin\s*:\s*", "min ", c, flags=re.IGNORECASE)
-    c = re.sub(r"\s+", " ", c).strip(" -;,")
-    c = re.sub(r"(\d)(km|mile|miles|min)", r"\1 \2", c, flags=re.IGNORECASE)
-    
-    if c in {"-", "/", ""}:
-        return "Rest"
-    
-    # Si seulement un temps, ajouter "Easy Run"
-    if re.match(r"^\d+(?:\.\d+)?\s*min(utes)?$", c, flags=re.IGNORECASE):
-        return c + " Easy Run"
-    
-    # Si seulement une distance, ajouter "Easy Run"
-    if re.match(r"^\d+(?:\.\d+)?\s*(km|mile|miles)$", c, flags=re.IGNORECASE):
-        return c + " Easy Run"
-    
-    # Si distance + activité mais sans unité, ajouter km
-    m = re.match(r"^(\d+(?:\.\d+)?)\s*(easy run|run|long run|intervals|tempo|recovery)$", c, flags=re.IGNORECASE)
-    if m and "km" not in c.lower() and "mile" not in c.lower() and "min" not in c.lower():
-        num = m.group(1)
-        label = m.group(2).title()
-        return f"{num} km {label}"
-    
-    return c if c else "Rest"
+        new_text = tokenizer.decode(generated)
+        if new_text.endswith("\ufffd"):
+            # Caractère UTF-8 réparti sur plusieurs tokens: attendre la suite
+            continue
+        delta, text = new_text[len(text):], new_text
+        if delta:
+            yield "token", {"text": delta}
 
+        lines = normalize_week_text(text).split("\n")
+        yield from _day_events(lines[closed_lines:-1])
+        closed_lines = len(lines) - 1
 
-def enforce_week_structure(text, max_rest=3):
-    """Formate la réponse en structure de semaine avec sauts de ligne"""
-    text = text.replace("<|endoftext|>", "").strip()
+    text = tokenizer.decode([t for t in generated if t != stop_token])
+    yield from _day_events(normalize_week_text(text).split("\n")[closed_lines:])
+
+    full_text = tokenizer.decode(prompt_ids[0].tolist() + generated)
+    with postprocess_seconds.time():
+        bot_response = enforce_week_structure(extract_response(full_text))
+    yield "week", {
+        "bot_response": bot_response,
+        "generated_tokens": len(generated),
+        "kept_tokens": count_kept_tokens(generated, tokenizer, stop_token),
+    }
+
+
+def iter_chat_tokens(variant, prompt_ids, sampling, seed=None, timer=None):
+    """Tokens générés pour un prompt de /api/chat (exécuté par la file d'inférence)"""
+    # Une requête avec graine reste hors batch pour être reproductible
+    if variant.batch_scheduler is not None and seed is None:
+        output_ids = variant.batch_scheduler.submit(
+            prompt_ids[0].tolist(), timer=timer, grammar=week_grammar, stopping=stop_criteria, **sampling
+        ).result()
+        return iter(output_ids[0, prompt_ids.size(1):].tolist())
+    return iter_generate_with_sampling(
+        variant.model, prompt_ids, variant.device, seed=seed, past_key_values=prefix_past(prompt_ids, variant),
+        grammar=week_grammar, stopping=stop_criteria, draft=speculative_draft, draft_tokens=SPECULATIVE_TOKENS,
+        timer=timer, **sampling
+    )
+
+
+def observe_token_timer(timer):
+    """Premier token et latence par token de la génération chronométrée par `timer`"""
+    timer.observe(time_to_first_token_seconds, decode_token_seconds)
+
+
+def client_id():
+    """Client de la requête pour le budget de tokens: clé d'API reconnue, sinon adresse IP (voir PROXY_HOPS)"""
+    api_key = request.headers.get("X-API-Key")
+    if api_key in API_KEYS:
+        return f"key:{api_key}"
+    return f"ip:{request.remote_addr}"
+
+
+def admit_generation(key, tokens):
+    """Admission d'une génération de `tokens` tokens au plus, avant la tokenisation.
+
+    `RateLimitError` si elle est refusée (voir AdmissionControl). None si une génération
+    identique (`key`) est en cours ou déjà admise: la requête la suivra, sans coût ni place.
+    """
+    if single_flight.in_flight(key):
+        return None
+    return admission_control.admit(client_id(), tokens, key=key)
+
+
+def admitted_stream(admission, key, tokens, make_iter):
+    """`single_flight.stream` après `admit_generation`: retourne `(itérateur, leader, admission)`.
+
+    La place de génération est rattachée à la génération démarrée. Une requête qui suit
+    une génération en cours rend aussitôt place et réservation; si la génération suivie
+    s'est terminée entre-temps, la requête est admise au démarrage de la sienne. En cas
+    d'erreur, la place et la réservation sont rendues.
+    """
+    client = client_id()
+    admitted = admission
+
+    def start():
+        nonlocal admitted
+        if admitted is None:
+            # La génération suivie s'est terminée ou n'a pas démarré: admission de celle-ci
+            admitted = admission_control.admit(client, tokens)
+        return admitted.guard(make_iter())
+
+    try:
+        items, leader = single_flight.stream(key, start)
+    except Exception:
+        if admitted is not None:
+            admitted.release()
+            admitted.settle(0)
+        raise
+    if not leader:
+        if admitted is not None:
+            admitted.release()
+            admitted.settle(0)
+        admitted = admission_control.free(client)
+    return items, leader, admitted
+
+
+def queue_full_response(error):
+    """Réponse 429 (file d'inférence pleine, `RateLimitError`) avec l'en-tête Retry-After"""
+    response = jsonify({"error": str(error), "retry_after": error.retry_after})
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response, 429
+
+
+def request_cache_key(message, sampling, seed, variant):
+    """Clé de cache d'une requête: message, échantillonnage, graine et version du modèle"""
+    return ResponseCache.make_key(message, dict(sampling, model=variant.version), seed)
+
+
+def indexed_week(message, seed=None):
+    """Réponse de /api/chat depuis l'index des semaines (WEEK_INDEX), None si inconnue"""
+    if week_index is None:
+        return None
+    with week_index_lookup_seconds.time():
+        bot_response = week_index.lookup_message(message, seed=seed)
+    if bot_response is None:
+        return None
+    return {"bot_response": bot_response, "generated_tokens": 0, "kept_tokens": 0, "model": "index"}
 
-    # Normaliser les retours à la ligne venant du modèle:
-    # - vrais retours (\r\n)
-    # - séquence littérale "\\n" (souvent due à un double-échappement)
-    # - token "/n" utilisé comme marqueur de nouvelle ligne (si isolé)
-    text = text.replace("\r\n", "\n")
-    text = text.replace("\\n", "\n")
-    text = re.sub(r'(^|[ \t])/n(?=[ \t]|$)', r'\1\n', text)
-    
-    # Remplacer les noms de jours anglais par français si présents
-    text = text.replace("Monday", "Lundi")
-    text = text.replace("Tuesday", "Mardi")
-    text = text.replace("Wednesday", "Mercredi")
-    text = text.replace("Thursday", "Jeudi")
-    text = text.replace("Friday", "Vendredi")
-    text = text.replace("Saturday", "Samedi")
-    text = text.replace("Sunday", "Dimanche")
-    
-    # Normaliser les sauts de ligne
-    # Si des jours sont sur la même ligne (ex: "Lundi: Rest Mardi: Run"), les séparer
-    day_order = ["lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche"]
-    day_labels = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche"]
-    
-    # Ajouter des sauts de ligne avant chaque jour (sauf le premier)
-    for day_label in day_labels[1:]:
-        text = re.sub(rf'([^\n])\s+{day_label}:', r'\1\n' + day_label + ':', text, flags=re.IGNORECASE)
-    
-    # Diviser en lignes et traiter chacune
-    lines = [l.strip() for l in text.split("\n") if l.strip()]
-    day_map = {}
-    
-    for line in lines:
-        lower = line.lower()
-        for i, day in enumerate(day_order):
-            if lower.startswith(day):
-                # Extraire le contenu après le jour
-                if ":" in line:
-                    content = line.split(":", 1)[1].strip()
-                else:
-                    content = ""
-                
-                content = clean_content(content)
-                if not content:
-                    content = "Rest"
-                if day not in day_map:
-                    day_map[day] = content
-                break
-    
-    # Construire la sortie avec tous les jours
-    output_lines = []
-    for day, label in zip(day_order, day_labels):
-        content = day_map.get(day, "Rest")
-        output_lines.append(f"{label}: {content}")
-    
-    return "\n".join(output_lines)
+
+def indexed_plan_weeks(plan, seed=None):
+    """Semaines du programme servies par l'index (WEEK_INDEX, voir `WeekIndex.lookup`): `{numéro: résultat}`"""
+    if week_index is None:
+        return {}
+    weeks = {}
+    features = {name: plan[name] for name in ("goal", "level", "weeks", "sessions", "goal_time")}
+    for week_num in range(1, plan["weeks"] + 1):
+        with week_index_lookup_seconds.time():
+            bot_response = week_index.lookup(features, week_num, seed)
+        if bot_response is not None:
+            weeks[week_num] = {
+                "week": week_num, "bot_response": bot_response, "generated_tokens": 0, "kept_tokens": 0,
+                "model": "index",
+            }
+    return weeks
+
+
+def plan_settings(data):
+    """Valide une requête /api/plan: `(programme, sampling, graine, variante, clé de cache)`"""
+    plan = parse_plan_request(data)
+    seed = request_seed(data)
+    sampling = dict(DEFAULT_SAMPLING, max_tokens=request_max_tokens(data), use_cache=USE_KV_CACHE)
+    message = f"plan {json.dumps(plan, sort_keys=True)}"
+    variant = model_router.choose(message)
+    return plan, sampling, seed, variant, request_cache_key(message, sampling, seed, variant)
+
+
+def iter_plan_weeks(variant, plan, sampling, seed=None, indexed=None):
+    """Génère toutes les semaines d'un programme en un seul batch.
+
+    Produit `(numéro de semaine, résultat)` dans l'ordre des semaines, chacune dès
+    qu'elle et les précédentes sont terminées. Les semaines de `indexed` (voir
+    `indexed_plan_weeks`) sont reprises telles quelles, sans génération.
+    """
+    start = time.perf_counter()
+    indexed = indexed or {}
+    week_nums = [week_num for week_num in range(1, plan["weeks"] + 1) if week_num not in indexed]
+    plan_input = build_plan_input(plan["goal"], plan["level"], plan["weeks"], plan["sessions"], plan["goal_time"])
+    with tokenize_seconds.time():
+        prompts = [
+            tokenizer.encode(build_prompt(
+                build_week_instruction(week_num, plan["weeks"], plan["goal"], plan["level"], plan["sessions"]),
+                plan_input
+            ))[:1024]
+            for week_num in week_nums
+        ]
+
+    finished = {}
+    next_week = 1
+
+    def completed_weeks():
+        nonlocal next_week
+        while next_week in indexed or next_week in finished:
+            if next_week in indexed:
+                payload = indexed[next_week]
+            else:
+                row, output_ids = finished.pop(next_week)
+                generated_ids = output_ids[0, len(prompts[row]):].tolist()
+                kept_tokens = count_kept_tokens(generated_ids, tokenizer)
+                token_usage.record(len(generated_ids), kept_tokens)
+                response_text = extract_response(tokenizer.decode(output_ids[0].tolist()))
+                record_generation(variant, start, response_text, len(generated_ids))
+                with postprocess_seconds.time():
+                    bot_response = enforce_week_structure(response_text)
+                payload = {
+                    "week": next_week,
+                    "bot_response": bot_response,
+                    "generated_tokens": len(generated_ids),
+                    "kept_tokens": kept_tokens,
+                }
+            yield next_week, payload
+            next_week += 1
+
+    yield from completed_weeks()
+    if not prompts:
+        return
+    for row, output_ids in iter_generate_batch(
+        variant.model, prompts, variant.device, grammar=week_grammar, stopping=stop_criteria, seed=seed, **sampling
+    ):
+        finished[week_nums[row]] = (row, output_ids)
+        yield from completed_weeks()
+
+
+def submit_plan_weeks(variant, plan, sampling, seed, cache_key):
+    """Semaines d'un programme: `(itérateur, leader, admission)` (voir `admitted_stream`).
+
+    Les semaines de l'index (WEEK_INDEX) sont résolues d'abord: seules les autres sont
+    admises (`max_tokens` chacune) puis générées par la file d'inférence. Un programme
+    que l'index contient entièrement ne passe ni par l'admission ni par la file.
+    """
+    indexed = indexed_plan_weeks(plan, seed)
+    missing = plan["weeks"] - len(indexed)
+    if not missing:
+        return iter_plan_weeks(variant, plan, sampling, seed, indexed), True, admission_control.free(client_id())
+    tokens = sampling["max_tokens"] * missing
+    return admitted_stream(
+        admit_generation(cache_key, tokens), cache_key, tokens, lambda: inference_pool.submit_stream(
+            lambda: iter_plan_weeks(variant, plan, sampling, seed, indexed), timeout=REQUEST_TIMEOUT_S
+        )
+    )
+
+
+def structured_plan(result, structured):
+    """Réponse /api/plan avec les champs structurés de chaque semaine si demandés"""
+    if not structured:
+        return result
+    weeks = [with_structure(week, True) for week in result["weeks"]]
+    return dict(result, weeks=weeks, totals={
+        "total_km": round(sum((w["structured"]["totals"]["total_km"] for w in weeks), 0.0), 2),
+        "total_min": round(sum((w["structured"]["totals"]["total_min"] for w in weeks), 0.0), 2),
+        "sessions": sum(w["structured"]["totals"]["sessions"] for w in weeks),
+    })
+
+
+def plan_result(plan, weeks, variant):
+    """Réponse complète de /api/plan (mise en cache)"""
+    return {
+        "plan": plan,
+        "weeks": weeks,
+        "generated_tokens": sum(w["generated_tokens"] for w in weeks),
+        "indexed_weeks": sum(w.get("model") == "index" for w in weeks),
+        "model": variant.name,
+    }
+
+
+def cached_week_events(cached, from_cache=True):
+    """Rejoue une réponse en cache (ou de l'index) sous forme d'événements de streaming"""
+    for line in cached["bot_response"].split("\n"):
+        yield "day", {"day": line.split(":", 1)[0], "line": line}
+    yield "week", dict(cached, cached=from_cache)
+
+
+def sse_event(event, payload):
+    """Formate un événement server-sent events"""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Durée totale (à la fermeture de la réponse, flux compris) et erreurs par endpoint"""
+    endpoint = request.url_rule.rule if request.url_rule is not None else "inconnu"
+    start = g.get("request_start", time.perf_counter())
+    if response.status_code >= 400:
+        errors_total.inc(endpoint=endpoint, status=response.status_code)
+    response.call_on_close(lambda: request_seconds.observe(time.perf_counter() - start, endpoint=endpoint))
+    return response
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Métriques au format texte Prometheus"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
 
 
 @app.route("/api/health", methods=["GET"])
 def health():
-    """Endpoint de santé"""
+    """Endpoint de santé (503 tant que le modèle n'est pas chargé et préchauffé)"""
     return jsonify({
-        "status": "ok",
+        "status": "ok" if ready else "starting",
+        "ready": ready,
+        "startup": startup_timings,
+        "threads": thread_config,
         "model_loaded": model is not None,
-        "device": "cuda" if torch.cuda.is_available() else "cpu"
-    })
+        "device": "cuda" if torch.cuda.is_available() else "cpu",
+        "model_arch": MODEL_ARCH,
+        "model_quant": MODEL_QUANT,
+        "output_vocab_size": model.output_layer.out_features if model is not None else None,
+        "response_cache": response_cache.stats(),
+        "token_usage": token_usage.stats(),
+        "inference_queue": inference_pool.stats() if inference_pool is not None else None,
+        "models": model_router.stats(),
+        "speculative": speculative_draft.stats() if speculative_draft is not None else None,
+        "week_index": week_index.stats() if week_index is not None else None,
+        "coalescing": single_flight.stats(),
+        "admission": admission_control.stats()
+    }), 200 if ready else 503
 
 
 @app.route("/api/chat", methods=["GET", "POST", "OPTIONS"])
@@ -255,8 +1173,11 @@ def chat():
         return jsonify({"error": "Use POST for chat messages"}), 405
     
     try:
-        data = request.json
-        user_message = data.get("message", "").strip()
+        try:
+            data = request_data()
+            user_message = request_message(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
         if not user_message:
             return jsonify({"error": "Message vide"}), 400
@@ -264,53 +1185,345 @@ def chat():
         if model is None:
             return jsonify({"error": "Modèle non chargé"}), 500
         
-        # Générer la réponse
-        device = next(model.parameters()).device
+        try:
+            seed = request_seed(data)
+            max_tokens = request_max_tokens(data)
+            structured = request_structured(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        # Construire le prompt
-        instruction = "Generate a complete week (1) of a running training program."
-        prompt = build_prompt(instruction, user_message)
+        indexed = indexed_week(user_message, seed)
+        if indexed is not None:
+            return jsonify(with_structure(dict(indexed, user_message=user_message, cached=False), structured))
         
-        # Tokeniser
-        prompt_ids = tokenizer.encode(prompt)
-        prompt_ids_tensor = torch.tensor([prompt_ids[:1024]], dtype=torch.long).to(device)
+        sampling = dict(DEFAULT_SAMPLING, max_tokens=max_tokens, use_cache=USE_KV_CACHE)
+        variant = model_router.choose(normalize_message(user_message))
+        cache_key = request_cache_key(user_message, sampling, seed, variant)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return jsonify(with_structure(dict(cached, user_message=user_message, cached=True), structured))
         
-        # Générer avec top-k sampling
-        output_ids = generate_with_sampling(
-            model, 
-            prompt_ids_tensor, 
-            tokenizer, 
-            device,
-            max_tokens=200,
-            top_k=50,
-            temperature=0.7,
-            repetition_penalty=1.2
-        )
+        # Admission avant tokenisation (budget du client, générations en cours)
+        admission = admit_generation(cache_key, max_tokens)
+        generated_ids = []
+        try:
+            # Générer la réponse
+            prompt_ids_tensor = encode_prompt(user_message, variant.device)
+            
+            # Générer avec top-k sampling (file d'inférence), ou suivre la même génération en cours
+            start = time.perf_counter()
+            timer = TokenTimer(g.request_start)
+            token_ids, leader, admission = admitted_stream(
+                admission, cache_key, max_tokens, lambda: inference_pool.submit_stream(
+                    lambda: iter_chat_tokens(variant, prompt_ids_tensor, sampling, seed, timer=timer),
+                    timeout=REQUEST_TIMEOUT_S
+                )
+            )
+            generated_ids = list(token_ids)
+            observe_token_timer(timer)
+        finally:
+            if admission is not None:
+                admission.release()
+                admission.settle(len(generated_ids))
+        kept_tokens = count_kept_tokens(generated_ids, tokenizer)
         
         # Décoder
-        full_text = tokenizer.decode(output_ids[0].cpu().numpy())
-        
-        # Extraire la réponse
-        if "### Response:\n" in full_text:
-            generated_week = full_text.split("### Response:\n")[-1].strip()
-        else:
-            generated_week = full_text[-400:]
+        full_text = tokenizer.decode(prompt_ids_tensor[0].tolist() + generated_ids)
         
-        # Formater en structure de semaine
-        generated_week = enforce_week_structure(generated_week)
+        with postprocess_seconds.time():
+            # Extraire la réponse
+            response_text = extract_response(full_text)
+            
+            # Formater en structure de semaine
+            generated_week = enforce_week_structure(response_text)
         
-        return jsonify({
-            "user_message": user_message,
-            "bot_response": generated_week
-        })
+        result = {
+            "bot_response": generated_week,
+            "generated_tokens": len(generated_ids),
+            "kept_tokens": kept_tokens,
+            "model": variant.name,
+        }
+        # Statistiques et cache: une seule fois par génération
+        if leader:
+            token_usage.record(len(generated_ids), kept_tokens)
+            record_generation(variant, start, response_text, len(generated_ids))
+            response_cache.put(cache_key, result)
+        return jsonify(with_structure(dict(result, user_message=user_message, cached=False), structured))
+    except (QueueFullError, RateLimitError) as e:
+        return queue_full_response(e)
+    except TimeoutError as e:
+        return jsonify({"error": str(e)}), 504
+    except Exception as e:
+        print(f"Erreur: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/chat/stream", methods=["POST", "OPTIONS"])
+def chat_stream():
+    """Variante streaming (server-sent events) de /api/chat"""
+    if request.method == "OPTIONS":
+        return '', 204
+    
+    try:
+        data = request_data()
+        user_message = request_message(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    if not user_message:
+        return jsonify({"error": "Message vide"}), 400
+    
+    if model is None:
+        return jsonify({"error": "Modèle non chargé"}), 500
+    
+    try:
+        seed = request_seed(data)
+        max_tokens = request_max_tokens(data)
+        structured = request_structured(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    sampling = dict(DEFAULT_SAMPLING, max_tokens=max_tokens, use_cache=USE_KV_CACHE)
+    variant = model_router.choose(normalize_message(user_message))
+    cache_key = request_cache_key(user_message, sampling, seed, variant)
+    indexed = indexed_week(user_message, seed)
+    cached = indexed if indexed is not None else response_cache.get(cache_key)
+    if cached is None:
+        generated_ids = []
+        try:
+            admission = admit_generation(cache_key, max_tokens)
+            try:
+                prompt_ids_tensor = encode_prompt(user_message, variant.device)
+            except Exception:
+                if admission is not None:
+                    admission.release()
+                    admission.settle(0)
+                raise
+            start = time.perf_counter()
+            timer = TokenTimer(g.request_start)
+            token_ids, leader, admission = admitted_stream(
+                admission, cache_key, max_tokens, lambda: inference_pool.submit_stream(
+                    lambda: iter_generate_with_sampling(
+                        variant.model, prompt_ids_tensor, variant.device, seed=seed,
+                        past_key_values=prefix_past(prompt_ids_tensor, variant),
+                        grammar=week_grammar, stopping=stop_criteria, draft=speculative_draft,
+                        draft_tokens=SPECULATIVE_TOKENS, timer=timer, **sampling
+                    ),
+                    timeout=REQUEST_TIMEOUT_S
+                )
+            )
+        except (QueueFullError, RateLimitError) as e:
+            return queue_full_response(e)
+    
+    endpoint = request.url_rule.rule
+    
+    def events():
+        try:
+            if cached is not None:
+                for event, payload in cached_week_events(cached, from_cache=indexed is None):
+                    yield sse_event(event, with_structure(payload, structured) if event == "week" else payload)
+                return
+            collected = (generated_ids.append(token_id) or token_id for token_id in token_ids)
+            for event, payload in stream_week(collected, prompt_ids_tensor, tokenizer):
+                if event == "week":
+                    payload = dict(payload, model=variant.name)
+                    if leader:
+                        record_generation(variant, start, tokenizer.decode(generated_ids), len(generated_ids))
+                        token_usage.record(payload["generated_tokens"], payload["kept_tokens"])
+                        response_cache.put(cache_key, payload)
+                    payload = with_structure(dict(payload, cached=False), structured)
+                yield sse_event(event, payload)
+        except Exception as e:
+            print(f"Erreur: {e}")
+            errors_total.inc(endpoint=endpoint, status="stream")
+            yield sse_event("error", {"error": str(e)})
+        finally:
+            if cached is None:
+                admission.settle(len(generated_ids))
+                observe_token_timer(timer)
+    
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.route("/api/plan", methods=["POST", "OPTIONS"])
+def training_plan():
+    """Génère un programme complet (toutes les semaines décodées en un seul batch)"""
+    if request.method == "OPTIONS":
+        return '', 204
+    
+    if model is None:
+        return jsonify({"error": "Modèle non chargé"}), 500
+    
+    try:
+        data = request_data()
+        plan, sampling, seed, variant, cache_key = plan_settings(data)
+        structured = request_structured(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return jsonify(structured_plan(dict(cached, cached=True), structured))
+    
+    weeks = []
+    try:
+        plan_weeks, leader, admission = submit_plan_weeks(variant, plan, sampling, seed, cache_key)
+        try:
+            weeks = [payload for _, payload in plan_weeks]
+        finally:
+            admission.release()
+            admission.settle(sum(w["generated_tokens"] for w in weeks))
+    except (QueueFullError, RateLimitError) as e:
+        return queue_full_response(e)
+    except TimeoutError as e:
+        return jsonify({"error": str(e)}), 504
     except Exception as e:
         print(f"Erreur: {e}")
         return jsonify({"error": str(e)}), 500
+    
+    result = plan_result(plan, weeks, variant)
+    if leader:
+        response_cache.put(cache_key, result)
+    return jsonify(structured_plan(dict(result, cached=False), structured))
+
+
+@app.route("/api/plan/stream", methods=["POST", "OPTIONS"])
+def training_plan_stream():
+    """Variante streaming de /api/plan: un événement "week" par semaine, dans l'ordre"""
+    if request.method == "OPTIONS":
+        return '', 204
+    
+    if model is None:
+        return jsonify({"error": "Modèle non chargé"}), 500
+    
+    try:
+        data = request_data()
+        plan, sampling, seed, variant, cache_key = plan_settings(data)
+        structured = request_structured(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    cached = response_cache.get(cache_key)
+    if cached is None:
+        weeks = []
+        try:
+            plan_weeks, leader, admission = submit_plan_weeks(variant, plan, sampling, seed, cache_key)
+        except (QueueFullError, RateLimitError) as e:
+            return queue_full_response(e)
+    
+    endpoint = request.url_rule.rule
+    
+    def events():
+        try:
+            if cached is not None:
+                for payload in cached["weeks"]:
+                    yield sse_event("week", with_structure(payload, structured))
+                yield sse_event("plan", structured_plan(dict(cached, cached=True), structured))
+                return
+            for _, payload in plan_weeks:
+                weeks.append(payload)
+                yield sse_event("week", with_structure(payload, structured))
+            result = plan_result(plan, weeks, variant)
+            if leader:
+                response_cache.put(cache_key, result)
+            yield sse_event("plan", structured_plan(dict(result, cached=False), structured))
+        except Exception as e:
+            print(f"Erreur: {e}")
+            errors_total.inc(endpoint=endpoint, status="stream")
+            yield sse_event("error", {"error": str(e)})
+        finally:
+            if cached is None:
+                admission.settle(sum(w["generated_tokens"] for w in weeks))
+    
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def admin_error():
+    """Réponse d'erreur si la requête n'est pas autorisée sur /api/admin (sinon None)"""
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "Administration désactivée (ADMIN_TOKEN non défini)"}), 403
+    expected = f"Bearer {ADMIN_TOKEN}"
+    if not hmac.compare_digest(request.headers.get("Authorization", "").encode(), expected.encode()):
+        return jsonify({"error": "Jeton d'administration invalide"}), 401
+    return None
+
+
+@app.route("/api/admin/models", methods=["GET"])
+def admin_models():
+    """Variantes chargées (poids de routage, latence, validité des sorties) et rechargements"""
+    error = admin_error()
+    if error is not None:
+        return error
+    return jsonify({"models": model_router.stats(), "reloads": reload_status})
+
+
+@app.route("/api/admin/models/<name>", methods=["POST"])
+def admin_reload_model(name):
+    """Charge un checkpoint en arrière-plan puis le met en service sous le nom `name`.
+
+    Corps JSON optionnel: "checkpoint" (nom de fichier dans le dossier de MODEL_PATH;
+    par défaut le fichier actuel de la variante) et "weight" (poids de routage). Sans
+    "weight", une nouvelle variante ne reçoit aucun trafic avant PUT /api/admin/routing.
+    Ne concerne que le processus qui reçoit la requête: avec plusieurs workers
+    gunicorn, remplacer le fichier et laisser MODEL_WATCH_S le recharger partout.
+    """
+    error = admin_error()
+    if error is not None:
+        return error
+    data = request.get_json(silent=True) or {}
+    current = model_router.get(name)
+    checkpoint = data.get("checkpoint")
+    if checkpoint is None and current is None:
+        return jsonify({"error": "checkpoint est requis pour une nouvelle variante"}), 400
+    if checkpoint is None:
+        checkpoint_path = current.path
+    else:
+        # Seuls les fichiers du dossier des modèles sont chargeables
+        checkpoint_path = MODEL_PATH.parent / Path(str(checkpoint)).name
+        if not checkpoint_path.is_file():
+            return jsonify({"error": f"Checkpoint introuvable: {checkpoint_path.name}"}), 400
+    weight = data.get("weight")
+    if weight is not None and (isinstance(weight, bool) or not isinstance(weight, (int, float)) or weight < 0):
+        return jsonify({"error": "weight doit être un nombre positif ou nul"}), 400
+    
+    def run():
+        try:
+            reload_variant(name, checkpoint_path, weight)
+        except Exception:
+            pass
+    
+    threading.Thread(target=run, name=f"reload-{name}", daemon=True).start()
+    return jsonify({"status": "loading", "model": name, "path": str(checkpoint_path)}), 202
+
+
+@app.route("/api/admin/routing", methods=["PUT"])
+def admin_routing():
+    """Remplace les poids de routage A/B, ex: {"weights": {"a": 0.9, "b": 0.1}}"""
+    error = admin_error()
+    if error is not None:
+        return error
+    weights = (request.get_json(silent=True) or {}).get("weights")
+    if not isinstance(weights, dict):
+        return jsonify({"error": "weights doit être un objet {variante: poids}"}), 400
+    try:
+        model_router.set_weights(weights)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"models": model_router.stats()})
 
 
 if __name__ == "__main__":
     # Charger le modèle au démarrage
     if load_model():
+        print(f"  Préchauffage: {WARMUP_GENERATIONS} génération(s) en {warmup():.2f} s")
         print("\n🚀 Démarrage du serveur Flask...")
         app.run(debug=True, host="0.0.0.0", port=5000)
     else:
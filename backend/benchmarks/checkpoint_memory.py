@@ -0,0 +1,87 @@
+"""Mémoire par worker selon le format de checkpoint et le mappage mémoire.
+
+Lance N processus indépendants (spawn, sans partage par fork) qui chargent chacun
+le modèle comme le backend (`load_state_dict_file` puis `load_state_dict(assign=True)`)
+et font un forward. Une fois tous chargés, chaque processus lit /proc/self/smaps_rollup:
+RSS (pages partagées comprises), PSS (pages partagées divisées par le nombre de
+processus) et mémoire privée. Linux uniquement.
+
+Usage (depuis backend/, après export_safetensors.py):
+    python benchmarks/checkpoint_memory.py output/model/running_plan_finetuned_model_2.pth --workers 4
+"""
+import argparse
+import multiprocessing as mp
+import sys
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+
+
+def memory_kb():
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "private": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+
+def worker(path, mmap, loaded, release, results):
+    sys.path.insert(0, str(BACKEND_ROOT))
+    import torch
+
+    from inference import SimpleGPT, load_state_dict_file
+
+    torch.set_num_threads(1)
+    model = SimpleGPT()
+    model.load_state_dict(load_state_dict_file(path, mmap=mmap), assign=True)
+    model.eval()
+    with torch.no_grad():
+        model(torch.randint(0, 50257, (1, 64)))
+    loaded.wait()
+    results.put(memory_kb())
+    release.wait()
+
+
+def run_case(path, mmap, workers):
+    ctx = mp.get_context("spawn")
+    loaded, release = ctx.Barrier(workers + 1), ctx.Barrier(workers + 1)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=worker, args=(path, mmap, loaded, release, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    loaded.wait()
+    samples = [results.get() for _ in processes]
+    release.wait()
+    for process in processes:
+        process.join()
+    return {key: sum(s[key] for s in samples) / len(samples) / 1024 for key in samples[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("checkpoint", type=Path, help="checkpoint .pth (l'export .safetensors voisin est aussi mesuré)")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    cases = [(args.checkpoint, False), (args.checkpoint, True)]
+    exported = args.checkpoint.with_suffix(".safetensors")
+    if exported.exists():
+        cases.append((exported, True))
+    else:
+        print(f"⚠ {exported.name} absent (python export_safetensors.py {args.checkpoint}): non mesuré")
+
+    print(f"{args.workers} workers, moyenne par worker (Mo)")
+    print(f"{'format':>12} {'mmap':>5} {'RSS':>8} {'PSS':>8} {'privée':>8}")
+    for path, mmap in cases:
+        mem = run_case(path, mmap, args.workers)
+        print(f"{path.suffix:>12} {'oui' if mmap else 'non':>5} {mem['rss']:8.1f} {mem['pss']:8.1f} {mem['private']:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
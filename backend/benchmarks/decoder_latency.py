@@ -0,0 +1,75 @@
+"""Latence par token sur CPU: SimpleGPT (actuel) vs CausalGPT (SDPA), avec et sans cache KV.
+
+Usage:
+    python benchmarks/decoder_latency.py [--checkpoint output/model/running_plan_finetuned_model_2.pth]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import torch
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from inference import CausalGPT, SimpleGPT, convert_simple_gpt_state_dict
+
+
+def decode(model, prompt_ids, new_tokens, use_cache):
+    """Décodage glouton de `new_tokens` tokens; retourne la durée en secondes"""
+    output_ids = prompt_ids
+    past_key_values = None
+    next_input_ids = prompt_ids
+    start = time.perf_counter()
+    with torch.no_grad():
+        for _ in range(new_tokens):
+            if use_cache:
+                logits, past_key_values = model.forward_cached(next_input_ids, past_key_values)
+            else:
+                logits = model(output_ids)
+            next_input_ids = logits[:, -1, :].argmax(dim=-1, keepdim=True)
+            output_ids = torch.cat([output_ids, next_input_ids], dim=1)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checkpoint", type=Path, default=None, help="poids SimpleGPT (sinon aléatoires)")
+    parser.add_argument("--prompt-len", type=int, default=80)
+    parser.add_argument("--new-tokens", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    torch.manual_seed(0)
+    simple = SimpleGPT().eval()
+    if args.checkpoint is not None:
+        simple.load_state_dict(torch.load(args.checkpoint, map_location="cpu"))
+    causal = CausalGPT().eval()
+    causal.load_state_dict(convert_simple_gpt_state_dict(simple.state_dict()))
+
+    prompt_ids = torch.randint(0, 50257, (1, args.prompt_len))
+    variants = [
+        ("SimpleGPT, recalcul complet (actuel)", simple, False),
+        ("SimpleGPT, cache KV", simple, True),
+        ("CausalGPT SDPA, recalcul complet", causal, False),
+        ("CausalGPT SDPA, cache KV", causal, True),
+    ]
+
+    print(f"threads={torch.get_num_threads()} prompt={args.prompt_len} nouveaux tokens={args.new_tokens}")
+    baseline = None
+    for name, model, use_cache in variants:
+        decode(model, prompt_ids, 5, use_cache)  # chauffe
+        elapsed = min(decode(model, prompt_ids, args.new_tokens, use_cache) for _ in range(args.repeats))
+        per_token_ms = elapsed / args.new_tokens * 1000
+        baseline = baseline or per_token_ms
+        print(f"{name:<40} {per_token_ms:8.2f} ms/token  x{baseline / per_token_ms:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Test de charge de /api/chat: latence p50/p99 et débit (tokens/s) par niveau de concurrence.
+
+Toutes les requêtes viennent d'une seule IP: lancer le serveur sans contrôle
+d'admission (RATE_LIMIT_TOKENS_PER_S=0 MAX_CONCURRENT_GENERATIONS=0), sinon le budget
+de tokens du client est vite épuisé et les requêtes reçoivent des 429. Les PROMPTS
+se répètent: COALESCE_REQUESTS=0 pour que chaque requête soit réellement générée.
+
+Usage (serveur lancé au préalable):
+    COALESCE_REQUESTS=0 RATE_LIMIT_TOKENS_PER_S=0 MAX_CONCURRENT_GENERATIONS=0 python app.py
+    python benchmarks/load_test.py --url http://localhost:5000 --concurrency 1 4 8 16
+"""
+import argparse
+import json
+import statistics
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+PROMPTS = [
+    "entrainement 10 km",
+    "marathon débutant",
+    "semi-marathon 12 semaines 4 séances",
+    "Objectif: 5km; Niveau: beginner; Semaines: 8; Séances/sem: 3; Temps objectif: 35m.",
+    "plan marathon niveau intermediate",
+]
+
+
+def post_chat(url, message, timeout):
+    body = json.dumps({"message": message}).encode("utf-8")
+    req = urllib.request.Request(
+        f"{url}/api/chat", data=body, headers={"Content-Type": "application/json"}, method="POST"
+    )
+    start = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        payload = json.loads(resp.read())
+    return time.perf_counter() - start, payload.get("generated_tokens", 0)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[idx]
+
+
+def run_level(url, concurrency, requests_per_level, timeout):
+    messages = [PROMPTS[i % len(PROMPTS)] for i in range(requests_per_level)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda m: post_chat(url, m, timeout), messages))
+    elapsed = time.perf_counter() - start
+
+    latencies = [lat for lat, _ in results]
+    tokens = sum(n for _, n in results)
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "p50_s": statistics.median(latencies),
+        "p99_s": percentile(latencies, 99),
+        "tokens_per_s": tokens / elapsed if elapsed > 0 else 0.0,
+        "requests_per_s": len(results) / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests", type=int, default=32, help="requêtes par niveau de concurrence")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    print(f"{'conc':>5} {'req':>5} {'p50 (s)':>9} {'p99 (s)':>9} {'tok/s':>9} {'req/s':>7}")
+    for concurrency in args.concurrency:
+        r = run_level(args.url, concurrency, args.requests, args.timeout)
+        print(
+            f"{r['concurrency']:>5} {r['requests']:>5} {r['p50_s']:>9.2f} {r['p99_s']:>9.2f} "
+            f"{r['tokens_per_s']:>9.1f} {r['requests_per_s']:>7.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
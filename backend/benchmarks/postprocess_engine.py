@@ -0,0 +1,145 @@
+"""Post-traitement des réponses: moteur compilé (inference/week_format.py) vs version d'origine.
+
+Le corpus est construit à partir des sorties de test_data_results*.json: chaque semaine
+est reprise telle quelle puis sous une forme dégradée comme en produit le modèle (jours
+anglais, une seule ligne, "\\n" littéral, "/n", unités collées, semaine tronquée...).
+Vérifie que les deux versions donnent la même sortie, puis mesure enforce_week_structure
+et clean_content. `--write-golden` régénère le corpus de référence des tests.
+
+Usage:
+    python benchmarks/postprocess_engine.py [--repeats 20] [--write-golden tests_data/week_structure_golden.json]
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from inference.week_format import DAY_LABELS, DAY_ORDER, clean_content, enforce_week_structure
+
+DEFAULT_TEST_FILES = sorted((BACKEND_ROOT.parent / "output" / "json").glob("test_data_results*.json"))
+ENGLISH_DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def legacy_clean_content(content: str) -> str:
+    """clean_content d'origine (app.py), référence du corpus"""
+    c = content.strip()
+    if not c:
+        return "Rest"
+    day_names = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche",
+                 "lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche"]
+    for day in day_names:
+        if day in c and c.find(day) > 0:
+            c = c[:c.find(day)].strip()
+            break
+    c = re.sub(r"[\\/]+", " ", c)
+    c = re.sub(r"\bmin\s*:\s*", "min ", c, flags=re.IGNORECASE)
+    c = re.sub(r"\s+", " ", c).strip(" -;,")
+    c = re.sub(r"(\d)(km|mile|miles|min)", r"\1 \2", c, flags=re.IGNORECASE)
+    if c in {"-", "/", ""}:
+        return "Rest"
+    if re.match(r"^\d+(?:\.\d+)?\s*min(utes)?$", c, flags=re.IGNORECASE):
+        return c + " Easy Run"
+    if re.match(r"^\d+(?:\.\d+)?\s*(km|mile|miles)$", c, flags=re.IGNORECASE):
+        return c + " Easy Run"
+    m = re.match(r"^(\d+(?:\.\d+)?)\s*(easy run|run|long run|intervals|tempo|recovery)$", c, flags=re.IGNORECASE)
+    if m and "km" not in c.lower() and "mile" not in c.lower() and "min" not in c.lower():
+        return f"{m.group(1)} km {m.group(2).title()}"
+    return c if c else "Rest"
+
+
+def legacy_enforce_week_structure(text):
+    """enforce_week_structure d'origine (app.py), référence du corpus"""
+    text = text.replace("<|endoftext|>", "").strip().replace("<|endoftext|>", "")
+    text = text.replace("\r\n", "\n").replace("\\n", "\n")
+    text = re.sub(r'(^|[ \t])/n(?=[ \t]|$)', r'\1\n', text)
+    for english, label in zip(ENGLISH_DAYS, DAY_LABELS):
+        text = text.replace(english, label)
+    for day_label in DAY_LABELS[1:]:
+        text = re.sub(rf'([^\n])\s+{day_label}:', r'\1\n' + day_label + ':', text, flags=re.IGNORECASE)
+    day_map = {}
+    for line in [l.strip() for l in text.split("\n") if l.strip()]:
+        lower = line.lower()
+        for day in DAY_ORDER:
+            if lower.startswith(day):
+                content = legacy_clean_content(line.split(":", 1)[1].strip() if ":" in line else "")
+                if day not in day_map:
+                    day_map[day] = content or "Rest"
+                break
+    return "\n".join(f"{label}: {day_map.get(day, 'Rest')}" for day, label in zip(DAY_ORDER, DAY_LABELS))
+
+
+def _english(text):
+    for english, label in zip(ENGLISH_DAYS, DAY_LABELS):
+        text = text.replace(label, english)
+    return text
+
+
+# Dégradations observées dans les sorties du modèle
+DEGRADATIONS = [
+    lambda t: t.replace("\n", " "),
+    lambda t: _english(t) + "<|endoftext|>",
+    lambda t: t.replace("\n", "\\n") + "\\n",
+    lambda t: t.replace("\n", " /n ") + " /n",
+    lambda t: t.lower().replace("\n", "\r\n"),
+    lambda t: t.replace(" km", "km").replace(" min", "min:").replace(" Run", "/Run"),
+    lambda t: t[:len(t) * 2 // 3],
+    lambda t: "Here is your week:\n" + t + "\nLundi: 99 km Run\n### Instruction:",
+    lambda t: t.replace(": ", " ", 3).replace("\n", " ", 2),
+    lambda t: t.replace("Mardi: ", "Mardi: Mardi: ").replace("\nMercredi", " \n\nMercredi Mercredi:"),
+]
+
+
+def build_corpus(test_files):
+    """Textes du corpus: chaque sortie de test distincte, puis une forme dégradée"""
+    outputs = []
+    for test_file in test_files:
+        with open(test_file, "r", encoding="utf-8") as f:
+            outputs += [p["output"] for p in json.load(f)["test_programs"] if p.get("output")]
+    corpus = []
+    for i, output in enumerate(dict.fromkeys(outputs)):
+        corpus += [output, DEGRADATIONS[i % len(DEGRADATIONS)](output)]
+    return corpus
+
+
+def per_call_us(fn, items, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for item in items:
+            fn(item)
+    return (time.perf_counter() - start) / (repeats * len(items)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--test-files", type=Path, nargs="+", default=DEFAULT_TEST_FILES)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--write-golden", type=Path, help="écrit [[entrée, sortie attendue], ...] (version d'origine)")
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.test_files)
+    expected = [legacy_enforce_week_structure(text) for text in corpus]
+    mismatches = sum(enforce_week_structure(text) != out for text, out in zip(corpus, expected))
+    print(f"Corpus: {len(corpus)} textes, {mismatches} sortie(s) différente(s) de la version d'origine")
+    if args.write_golden:
+        with open(args.write_golden, "w", encoding="utf-8") as f:
+            json.dump([[text, out] for text, out in zip(corpus, expected)], f, ensure_ascii=False, indent=0)
+        print(f"Corpus de référence écrit: {args.write_golden}")
+
+    contents = [line.split(":", 1)[1] for text in corpus for line in text.split("\n") if ":" in line]
+    for name, legacy, compiled, items in (
+        ("enforce_week_structure", legacy_enforce_week_structure, enforce_week_structure, corpus),
+        ("clean_content", legacy_clean_content, clean_content, contents),
+    ):
+        before = per_call_us(legacy, items, args.repeats)
+        after = per_call_us(compiled, items, args.repeats)
+        print(f"{name:<24} origine {before:7.2f} µs, compilé {after:7.2f} µs (x{before / after:.1f})")
+
+
+if __name__ == "__main__":
+    main()
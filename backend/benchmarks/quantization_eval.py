@@ -0,0 +1,107 @@
+"""Dérive de précision et gain CPU de la quantification int8 dynamique (MODEL_QUANT=int8).
+
+Compare le modèle float et sa version int8 en teacher forcing sur le split de test
+(test_data_results*.json): perte et précision top-1 sur les tokens de réponse, taux
+d'accord des argmax, puis latence de décodage par token.
+
+Usage:
+    python benchmarks/quantization_eval.py --checkpoint output/model/running_plan_finetuned_model_2.pth \
+        --test-file ../output/json/test_data_results_3.json --limit 200
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import tiktoken
+import torch
+import torch.nn.functional as F
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from app import MODEL_PATH, build_prompt
+from decoder_latency import decode
+from inference import CausalGPT, SimpleGPT, convert_simple_gpt_state_dict, quantize_dynamic_int8
+
+DEFAULT_TEST_FILE = BACKEND_ROOT.parent / "output" / "json" / "test_data_results.json"
+
+
+def load_float_model(checkpoint, arch):
+    model_cls = CausalGPT if arch == "causal" else SimpleGPT
+    model = model_cls().eval()
+    if checkpoint is not None and checkpoint.exists():
+        state_dict = torch.load(checkpoint, map_location="cpu")
+        if arch == "causal":
+            state_dict = convert_simple_gpt_state_dict(state_dict)
+        model.load_state_dict(state_dict)
+    else:
+        print(f"⚠ Checkpoint introuvable ({checkpoint}), poids aléatoires")
+    return model
+
+
+def encode_example(entry, tokenizer):
+    """Ids prompt + réponse attendue, et index du premier token de réponse"""
+    prompt_ids = tokenizer.encode(build_prompt(entry["instruction"], entry.get("input", "")))
+    target_ids = tokenizer.encode(entry["output"]) + [50256]
+    ids = (prompt_ids + target_ids)[:1024]
+    return torch.tensor([ids], dtype=torch.long), len(prompt_ids)
+
+
+def evaluate(models, examples, tokenizer):
+    stats = {name: {"loss": 0.0, "correct": 0} for name in models}
+    agree = 0
+    total = 0
+    with torch.no_grad():
+        for entry in examples:
+            ids, response_start = encode_example(entry, tokenizer)
+            targets = ids[0, response_start:]
+            predictions = {}
+            for name, model in models.items():
+                logits = model(ids[:, :-1])[0, response_start - 1:]
+                stats[name]["loss"] += F.cross_entropy(logits, targets, reduction="sum").item()
+                predictions[name] = logits.argmax(dim=-1)
+                stats[name]["correct"] += (predictions[name] == targets).sum().item()
+            agree += (predictions["float32"] == predictions["int8"]).sum().item()
+            total += targets.numel()
+    return stats, agree, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checkpoint", type=Path, default=MODEL_PATH)
+    parser.add_argument("--arch", choices=["simple", "causal"], default="simple")
+    parser.add_argument("--test-file", type=Path, default=DEFAULT_TEST_FILE)
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--new-tokens", type=int, default=100)
+    args = parser.parse_args()
+
+    tokenizer = tiktoken.get_encoding("gpt2")
+    with open(args.test_file, "r", encoding="utf-8") as f:
+        examples = json.load(f)["test_programs"][:args.limit]
+
+    float_model = load_float_model(args.checkpoint, args.arch)
+    models = {"float32": float_model, "int8": quantize_dynamic_int8(float_model)}
+
+    stats, agree, total = evaluate(models, examples, tokenizer)
+    print(f"{len(examples)} exemples, {total} tokens de réponse ({args.test_file.name})")
+    for name, s in stats.items():
+        print(f"  {name:<8} perte {s['loss'] / total:.4f}  précision top-1 {s['correct'] / total:.2%}")
+    print(f"  accord argmax int8/float32: {agree / total:.2%}")
+
+    prompt_ids, _ = encode_example(examples[0], tokenizer)
+    for use_cache in (False, True):
+        timings = {}
+        for name, model in models.items():
+            decode(model, prompt_ids, 5, use_cache)  # chauffe
+            timings[name] = decode(model, prompt_ids, args.new_tokens, use_cache) / args.new_tokens * 1000
+        label = "cache KV" if use_cache else "recalcul complet"
+        print(
+            f"  {label:<16} float32 {timings['float32']:.2f} ms/token, int8 {timings['int8']:.2f} ms/token "
+            f"(x{timings['float32'] / timings['int8']:.2f})"
+        )
+
+
+if __name__ == "__main__":
+    main()
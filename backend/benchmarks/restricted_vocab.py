@@ -0,0 +1,67 @@
+"""Gain du vocabulaire de sortie restreint (RESTRICTED_VOCAB=1) par rapport à la tête complète.
+
+Construit l'ensemble de tokens à partir des sorties du dataset final, puis mesure sur CPU
+la tête de sortie seule (Linear + top-k) et un pas de décodage complet avec cache KV.
+
+Usage:
+    python benchmarks/restricted_vocab.py --dataset ../Data/running_week_training_dataset_final.json
+"""
+import argparse
+import copy
+import sys
+import time
+from pathlib import Path
+
+import tiktoken
+import torch
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from decoder_latency import decode
+from inference import SimpleGPT, load_allowed_token_ids, restrict_output_vocab
+
+DEFAULT_DATASET = BACKEND_ROOT.parent / "Data" / "running_week_training_dataset_final.json"
+
+
+def time_head(layer, hidden, top_k, repeats):
+    """Durée moyenne (ms) de la projection de sortie + top-k pour un token"""
+    with torch.no_grad():
+        for _ in range(10):
+            torch.topk(layer(hidden), top_k)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            torch.topk(layer(hidden), top_k)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", type=Path, default=DEFAULT_DATASET)
+    parser.add_argument("--prompt-len", type=int, default=80)
+    parser.add_argument("--new-tokens", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=500)
+    args = parser.parse_args()
+
+    allowed_ids = load_allowed_token_ids(args.dataset, tiktoken.get_encoding("gpt2"))
+    print(f"Vocabulaire restreint: {len(allowed_ids)} tokens sur 50257 ({args.dataset.name})")
+
+    torch.manual_seed(0)
+    full = SimpleGPT().eval()
+    restricted = restrict_output_vocab(copy.deepcopy(full), allowed_ids)
+
+    hidden = torch.randn(1, 256)
+    head_full = time_head(full.output_layer, hidden, 50, args.repeats)
+    head_restricted = time_head(restricted.output_layer, hidden, 50, args.repeats)
+    print(f"tête + top-k   complète {head_full:.3f} ms, restreinte {head_restricted:.3f} ms (x{head_full / head_restricted:.1f})")
+
+    prompt_ids = torch.randint(0, 50257, (1, args.prompt_len))
+    for name, model in (("complète", full), ("restreinte", restricted)):
+        decode(model, prompt_ids, 5, True)
+        ms = decode(model, prompt_ids, args.new_tokens, True) / args.new_tokens * 1000
+        print(f"pas de décodage (cache KV), tête {name:<10} {ms:.2f} ms/token")
+
+
+if __name__ == "__main__":
+    main()
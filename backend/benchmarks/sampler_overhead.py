@@ -0,0 +1,85 @@
+"""Surcoût par pas de décodage hors modèle: pénalité de répétition + échantillonnage top-k.
+
+Compare, pour un batch de B séquences et un historique de n tokens:
+- "unique": ancienne pénalité (torch.unique par ligne, division quel que soit le signe)
+- "bitmap": bitmap de présence (batch, V) mis à jour par scatter, pénalité sur tout le vocabulaire
+- "gather": `apply_repetition_penalty` (gather/scatter sur l'historique, signe respecté)
+suivis de l'échantillonnage top-k batché (`sample_top_k`). V = 50257 (vocabulaire GPT-2)
+ou la taille du vocabulaire restreint (`--restricted-size`, voir restrict_output_vocab).
+
+Usage:
+    python benchmarks/sampler_overhead.py --batch-sizes 1 8 --history 100 500
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import torch
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from inference import apply_repetition_penalty, sample_top_k
+
+
+def unique_penalty(logits, token_ids, penalty):
+    for row in range(logits.size(0)):
+        unique_ids = torch.unique(token_ids[row])
+        logits[row, unique_ids] = logits[row, unique_ids] / penalty
+    return logits
+
+
+def bitmap_penalty(logits, presence, new_ids, penalty):
+    presence.scatter_(1, new_ids, True)
+    penalized = torch.where(logits > 0, logits / penalty, logits * penalty)
+    return torch.where(presence, penalized, logits)
+
+
+def time_per_step(step, steps):
+    for _ in range(10):
+        step()
+    start = time.perf_counter()
+    for _ in range(steps):
+        step()
+    return (time.perf_counter() - start) / steps * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--history", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--restricted-size", type=int, default=128)
+    parser.add_argument("--top-k", type=int, default=50)
+    parser.add_argument("--steps", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=1)
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    generator = torch.Generator().manual_seed(0)
+    print(f"{args.threads} thread(s) torch, µs par pas (pénalité + top-k)")
+    print(f"{'V':>6} {'B':>3} {'n':>5} {'unique':>9} {'bitmap':>9} {'gather':>9}")
+    for vocab_size in (50257, args.restricted_size):
+        for batch_size in args.batch_sizes:
+            for history in args.history:
+                logits = torch.randn(batch_size, vocab_size)
+                token_ids = torch.randint(0, vocab_size, (batch_size, history))
+                presence = torch.zeros(batch_size, vocab_size, dtype=torch.bool).scatter_(1, token_ids, True)
+                new_ids = token_ids[:, -1:]
+                results = {
+                    "unique": lambda: sample_top_k(unique_penalty(logits.clone(), token_ids, 1.2), args.top_k, generator),
+                    "bitmap": lambda: sample_top_k(bitmap_penalty(logits, presence, new_ids, 1.2), args.top_k, generator),
+                    "gather": lambda: sample_top_k(
+                        apply_repetition_penalty(logits.clone(), token_ids, 1.2), args.top_k, generator
+                    ),
+                }
+                timings = {name: time_per_step(step, args.steps) for name, step in results.items()}
+                print(
+                    f"{vocab_size:>6} {batch_size:>3} {history:>5} "
+                    f"{timings['unique']:9.1f} {timings['bitmap']:9.1f} {timings['gather']:9.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
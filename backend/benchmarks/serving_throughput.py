@@ -0,0 +1,83 @@
+"""Débit du serveur de production (gunicorn) selon N workers x M threads torch.
+
+Chaque configuration "NxM" lance `gunicorn -c gunicorn.conf.py wsgi:application`
+(cache de réponses, regroupement des requêtes identiques et contrôle d'admission
+désactivés), attend /api/health puis mesure avec load_test.
+
+Usage (depuis backend/, modèle présent dans MODEL_PATH):
+    python benchmarks/serving_throughput.py --configs 1x1 1x4 2x2 4x1 --concurrency 8
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+from load_test import run_level
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+
+
+def wait_ready(url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/api/health", timeout=2):
+                return True
+        except OSError:
+            time.sleep(0.5)
+    return False
+
+
+def run_config(workers, torch_threads, args):
+    url = f"http://127.0.0.1:{args.port}"
+    env = dict(
+        os.environ,
+        BIND=f"127.0.0.1:{args.port}",
+        WEB_WORKERS=str(workers),
+        WEB_THREADS=str(args.http_threads),
+        TORCH_THREADS=str(torch_threads),
+        RESPONSE_CACHE_SIZE="0",
+        # load_test répète les mêmes prompts: regroupées, elles gonfleraient les tokens/s
+        COALESCE_REQUESTS="0",
+        # Tout le trafic vient d'une seule IP: sans budget ni plafond d'admission
+        RATE_LIMIT_TOKENS_PER_S="0",
+        MAX_CONCURRENT_GENERATIONS="0",
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:application"],
+        cwd=BACKEND_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        if not wait_ready(url, args.startup_timeout):
+            raise RuntimeError(f"serveur {workers}x{torch_threads} non prêt après {args.startup_timeout} s")
+        run_level(url, args.concurrency, args.concurrency, args.timeout)  # préchauffage
+        return run_level(url, args.concurrency, args.requests, args.timeout)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--configs", nargs="+", default=["1x1", "1x4", "2x2", "4x1"], help="workers x threads torch")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--http-threads", type=int, default=4)
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cœurs, concurrence {args.concurrency}, {args.requests} requêtes par configuration")
+    print(f"{'config':>7} {'p50 (s)':>9} {'p99 (s)':>9} {'tok/s':>9} {'req/s':>7}")
+    for config in args.configs:
+        workers, torch_threads = (int(n) for n in config.lower().split("x"))
+        r = run_config(workers, torch_threads, args)
+        print(f"{config:>7} {r['p50_s']:>9.2f} {r['p99_s']:>9.2f} {r['tokens_per_s']:>9.1f} {r['requests_per_s']:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
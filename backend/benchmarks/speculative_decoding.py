@@ -0,0 +1,92 @@
+"""Décodage spéculatif (SPECULATIVE_TOKENS): taux d'acceptation et gain de bout en bout.
+
+Génère la semaine de chaque programme de test (test_data_results*.json) avec cache KV,
+grammaire et conditions d'arrêt comme le backend, sans puis avec le brouillon n-grammes
+(construit sans les sorties du fichier de test), à graine égale.
+
+Usage:
+    python benchmarks/speculative_decoding.py --checkpoint output/model/running_plan_finetuned_model_2.pth \
+        --draft-tokens 2 4 8 --limit 50
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import tiktoken
+import torch
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from app import (
+    DAY_LABELS, DEFAULT_SAMPLING, MODEL_PATH, STOP_STRINGS, VOCAB_DATASET_PATH, build_prompt, generate_with_sampling
+)
+from inference import NgramDraft, StopCriteria, WeekGrammar, load_allowed_token_ids, restrict_output_vocab
+from quantization_eval import DEFAULT_TEST_FILE, load_float_model
+
+
+def run(model, prompts, tokenizer, grammar, stopping, draft, draft_tokens, seed):
+    """Génère chaque prompt; retourne (durée totale, tokens générés)"""
+    tokens = 0
+    start = time.perf_counter()
+    for i, prompt_ids in enumerate(prompts):
+        output_ids = generate_with_sampling(
+            model, prompt_ids, tokenizer, "cpu", max_tokens=DEFAULT_SAMPLING["max_tokens"],
+            top_k=DEFAULT_SAMPLING["top_k"], temperature=DEFAULT_SAMPLING["temperature"],
+            repetition_penalty=DEFAULT_SAMPLING["repetition_penalty"], use_cache=True, seed=seed + i,
+            grammar=grammar, stopping=stopping, draft=draft, draft_tokens=draft_tokens
+        )
+        tokens += output_ids.size(1) - prompt_ids.size(1)
+    return time.perf_counter() - start, tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checkpoint", type=Path, default=MODEL_PATH)
+    parser.add_argument("--arch", choices=["simple", "causal"], default="simple")
+    parser.add_argument("--test-file", type=Path, default=DEFAULT_TEST_FILE)
+    parser.add_argument("--dataset", type=Path, default=VOCAB_DATASET_PATH)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--draft-tokens", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--restricted-vocab", action="store_true", help="comme RESTRICTED_VOCAB=1")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--threads", type=int, default=1)
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    tokenizer = tiktoken.get_encoding("gpt2")
+    with open(args.test_file, "r", encoding="utf-8") as f:
+        programs = json.load(f)["test_programs"][:args.limit]
+    prompts = [
+        torch.tensor([tokenizer.encode(build_prompt(p["instruction"], p.get("input", "")))[:1024]])
+        for p in programs
+    ]
+
+    model = load_float_model(args.checkpoint, args.arch)
+    if args.restricted_vocab:
+        restrict_output_vocab(model, load_allowed_token_ids(args.dataset, tokenizer))
+    grammar = WeekGrammar(tokenizer, DAY_LABELS)
+    stopping = StopCriteria(tokenizer, STOP_STRINGS, day_labels=DAY_LABELS)
+    exclude = [p["output"] for p in programs]
+    run(model, prompts[:2], tokenizer, grammar, stopping, None, 0, args.seed)  # préchauffage
+
+    baseline_s, baseline_tokens = run(model, prompts, tokenizer, grammar, stopping, None, 0, args.seed)
+    baseline_rate = baseline_tokens / baseline_s
+    print(f"{len(prompts)} programmes de test, {args.threads} thread(s) torch")
+    print(f"{'draft':>6} {'proposés':>9} {'accept.':>8} {'tok/s':>8} {'gain':>6}")
+    print(f"{'-':>6} {'-':>9} {'-':>8} {baseline_rate:8.1f} {1.0:6.2f}")
+    for draft_tokens in args.draft_tokens:
+        draft = NgramDraft.from_dataset(args.dataset, tokenizer, prefix="### Response:\n", exclude_outputs=exclude)
+        elapsed, tokens = run(model, prompts, tokenizer, grammar, stopping, draft, draft_tokens, args.seed)
+        stats = draft.stats()
+        print(
+            f"{draft_tokens:>6} {stats['proposed_tokens']:>9} {stats['acceptance_rate'] or 0.0:8.1%} "
+            f"{tokens / elapsed:8.1f} {tokens / elapsed / baseline_rate:6.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
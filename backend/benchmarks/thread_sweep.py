@@ -0,0 +1,87 @@
+"""Profil de threads torch (intra-op x inter-op) de l'hôte, enregistré pour THREAD_TUNING.
+
+Au démarrage, le backend ne peut mesurer que les threads intra-op: le nombre de threads
+inter-op se fixe une seule fois, avant tout calcul parallèle du processus. Ce script
+lance un processus par couple (intra-op, inter-op), y mesure la génération d'une semaine
+sur le prompt représentatif de `app.tune_threads`, puis enregistre le meilleur couple
+dans THREAD_PROFILE_PATH (réappliqué aux démarrages suivants, inter-op compris).
+
+Usage (depuis backend/, modèle présent dans MODEL_PATH, mêmes variables que le service):
+    WEB_WORKERS=2 python benchmarks/thread_sweep.py --intra 1 2 4 --interop 1 2 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+
+def measure(intra, interop, repeats, max_tokens):
+    """Processus enfant: médiane de génération (s) avec `intra` x `interop` threads"""
+    import torch
+
+    torch.set_num_interop_threads(interop)
+    import app
+    from inference import sweep_threads
+
+    if not app.load_model(start_workers=False):
+        raise RuntimeError(f"modèle introuvable: {app.MODEL_PATH}")
+    variant = app.model_router.get(app.PRIMARY_VARIANT)
+    prompt_ids = app.encode_prompt(app.build_plan_input("marathon", "general", 12, 4), variant.device)
+    _, timings = sweep_threads(
+        lambda: app.generate_with_sampling(
+            variant.model, prompt_ids, app.tokenizer, variant.device, max_tokens=max_tokens,
+            use_cache=app.USE_KV_CACHE, seed=0, past_key_values=app.prefix_past(prompt_ids, variant),
+            grammar=app.week_grammar, stopping=app.stop_criteria
+        ),
+        [intra], repeats=repeats
+    )
+    return timings[intra]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--intra", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--interop", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--max-tokens", type=int, default=64)
+    parser.add_argument("--child", type=int, nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(*args.child, args.repeats, args.max_tokens)))
+        return
+
+    env = dict(os.environ, THREAD_TUNING="0")
+    timings = {}
+    print(f"{'intra-op':>9} {'inter-op':>9} {'génération s':>13}")
+    for intra in args.intra:
+        for interop in args.interop:
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", str(intra), str(interop),
+                 "--repeats", str(args.repeats), "--max-tokens", str(args.max_tokens)],
+                cwd=BACKEND_ROOT, env=env, check=True, capture_output=True, text=True
+            ).stdout
+            timings[(intra, interop)] = json.loads(output.strip().splitlines()[-1])
+            print(f"{intra:>9} {interop:>9} {timings[(intra, interop)]:13.3f}")
+
+    import app
+    from inference import save_thread_profile
+
+    intra, interop = min(timings, key=timings.get)
+    save_thread_profile(app.THREAD_PROFILE_PATH, app.thread_signature(), {
+        "intra_op_threads": intra, "interop_threads": interop,
+        "timings_s": {f"{i}x{j}": seconds for (i, j), seconds in timings.items()},
+        "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    })
+    print(f"Meilleur: {intra} intra-op x {interop} inter-op, enregistré dans {app.THREAD_PROFILE_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Index des semaines (WEEK_INDEX=1): couverture des demandes et latence de recherche.
+
+Rejoue les programmes de test (test_data_results*.json) comme trafic: le champ `input`
+de chaque programme est cherché comme un message de /api/chat (format du dataset ou
+message libre: "plan marathon 16 semaines", "entrainement beginner"...), pour son numéro
+de semaine. Avec la clé exacte seule (distance 0) puis avec le plus proche voisin
+(`--max-distance`, voir WEEK_INDEX_MAX_DISTANCE), affiche la part servie par l'index
+(dont par plus proche voisin), la part dont la semaine servie est exactement la sortie
+attendue (après enforce_week_structure), et la latence de recherche.
+
+Usage:
+    python benchmarks/week_index.py --test-files ../output/json/test_data_results.json \
+        ../output/json/test_data_results_3.json --max-distance 1.5
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from app import enforce_week_structure
+from inference import WeekIndex
+
+DEFAULT_DATASET = BACKEND_ROOT.parent / "Data" / "running_week_training_dataset_final.json"
+DEFAULT_TEST_FILES = sorted((BACKEND_ROOT.parent / "output" / "json").glob("test_data_results*.json"))
+
+
+def replay(index, programs):
+    """Cherche chaque programme; retourne (trouvés, dont plus proche voisin, exacts, latences en µs)"""
+    found = exact = 0
+    latencies = []
+    nearest_before = index.nearest_hits
+    for program in programs:
+        week = program.get("metadata", {}).get("week", 1)
+        start = time.perf_counter()
+        bot_response = index.lookup_message(program.get("input", ""), week=week)
+        latencies.append((time.perf_counter() - start) * 1e6)
+        if bot_response is not None:
+            found += 1
+            exact += bot_response == enforce_week_structure(program["output"])
+    return found, index.nearest_hits - nearest_before, exact, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", type=Path, default=DEFAULT_DATASET)
+    parser.add_argument("--test-files", type=Path, nargs="+", default=DEFAULT_TEST_FILES)
+    parser.add_argument("--max-distance", type=float, default=1.5)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = WeekIndex.from_dataset(args.dataset, postprocess=enforce_week_structure)
+    print(f"Index: {len(index.table)} combinaisons construites en {time.perf_counter() - start:.2f} s ({args.dataset.name})")
+    print(
+        f"{'fichier':<28} {'distance':>8} {'demandes':>9} {'couvert.':>9} {'voisin':>7} "
+        f"{'exactes':>8} {'p50 µs':>7} {'p99 µs':>7}"
+    )
+    for test_file in args.test_files:
+        with open(test_file, "r", encoding="utf-8") as f:
+            programs = json.load(f)["test_programs"]
+        for max_distance in (0, args.max_distance):
+            index.max_distance = max_distance
+            found, nearest, exact, latencies = replay(index, programs)
+            latencies.sort()
+            print(
+                f"{test_file.name:<28} {max_distance:8.1f} {len(programs):>9} {found / len(programs):9.1%} "
+                f"{nearest / len(programs):7.1%} {exact / max(found, 1):8.1%} "
+                f"{statistics.median(latencies):7.1f} {latencies[int(len(latencies) * 0.99)]:7.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
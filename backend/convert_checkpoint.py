@@ -0,0 +1,31 @@
+"""Convertit un checkpoint SimpleGPT (running_plan_finetuned_model_*.pth) pour CausalGPT.
+
+Usage:
+    python convert_checkpoint.py output/model/running_plan_finetuned_model_2.pth \
+        output/model/running_plan_finetuned_model_2_causal.pth
+"""
+import argparse
+from pathlib import Path
+
+import torch
+
+from inference import CausalGPT, convert_simple_gpt_state_dict
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", type=Path, help="checkpoint SimpleGPT (.pth)")
+    parser.add_argument("target", type=Path, help="checkpoint CausalGPT à écrire (.pth)")
+    args = parser.parse_args()
+
+    state_dict = convert_simple_gpt_state_dict(torch.load(args.source, map_location="cpu"))
+    # Vérifie que toutes les clés correspondent avant d'écrire
+    CausalGPT().load_state_dict(state_dict)
+
+    args.target.parent.mkdir(parents=True, exist_ok=True)
+    torch.save(state_dict, args.target)
+    print(f"✓ Checkpoint CausalGPT sauvegardé: {args.target}")
+
+
+if __name__ == "__main__":
+    main()
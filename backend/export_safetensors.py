@@ -0,0 +1,29 @@
+"""Exporte un checkpoint (running_plan_finetuned_model_*.pth) au format safetensors.
+
+Le fichier .safetensors est mappé en mémoire au chargement (MODEL_MMAP=1): les workers
+d'un même hôte partagent ses pages au lieu d'en garder chacun une copie. Le backend le
+charge à la place du .pth s'il se trouve à côté (même nom, extension .safetensors).
+
+Usage:
+    python export_safetensors.py output/model/running_plan_finetuned_model_2.pth
+"""
+import argparse
+from pathlib import Path
+
+from inference import SimpleGPT, export_safetensors, load_state_dict_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", type=Path, help="checkpoint SimpleGPT (.pth)")
+    parser.add_argument("target", type=Path, nargs="?", help="fichier à écrire (défaut: source en .safetensors)")
+    args = parser.parse_args()
+
+    target = export_safetensors(args.source, args.target)
+    # Vérifie que l'export se recharge dans le modèle
+    SimpleGPT().load_state_dict(load_state_dict_file(target))
+    print(f"✓ Checkpoint safetensors sauvegardé: {target}")
+
+
+if __name__ == "__main__":
+    main()
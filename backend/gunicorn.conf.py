@@ -0,0 +1,37 @@
+# Configuration gunicorn du backend (voir wsgi.py)
+#
+#   gunicorn -c gunicorn.conf.py wsgi:application
+#
+# WEB_WORKERS processus x WEB_THREADS threads HTTP; TORCH_THREADS threads de calcul
+# torch par worker (par défaut: cœurs disponibles / WEB_WORKERS, puis réglés au
+# démarrage par THREAD_TUNING dans cette limite, voir app.tune_threads).
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+# Exporté pour app.py (profil de threads, plafond de générations par processus)
+workers = int(os.environ.setdefault("WEB_WORKERS", "2"))
+threads = int(os.getenv("WEB_THREADS", "4"))
+worker_class = "gthread"
+preload_app = True
+timeout = int(os.getenv("WEB_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "30"))
+torch_threads = int(os.getenv("TORCH_THREADS", str(max(1, (os.cpu_count() or 1) // workers))))
+
+
+def post_fork(server, worker):
+    import torch
+
+    torch.set_num_threads(torch_threads)
+
+
+def post_worker_init(worker):
+    # Le worker n'accepte de connexions qu'une fois préchauffé
+    import app as backend
+
+    backend.start_inference_workers()
+    elapsed = backend.warmup()
+    threads = backend.thread_config
+    worker.log.info(
+        "Worker %s prêt: %d thread(s) torch intra-op, %d inter-op (%s), préchauffage %.2f s",
+        worker.pid, threads["intra_op_threads"], threads["interop_threads"], threads["source"], elapsed
+    )
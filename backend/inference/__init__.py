@@ -0,0 +1,85 @@
+from .simple_gpt import SimpleGPT
+from .causal_gpt import CausalGPT, convert_simple_gpt_state_dict
+from .checkpoint import export_safetensors, load_state_dict_file, resolve_checkpoint
+from .sampling import apply_repetition_penalty, sample_top_k, verify_draft_token
+from .ngram_draft import NgramDraft
+from .batch_generation import generate_batch, iter_generate_batch, left_pad
+from .batch_scheduler import BatchScheduler
+from .response_cache import ResponseCache, normalize_message
+from .single_flight import SingleFlight
+from .prompt_prefix import PromptPrefix
+from .quantization import quantize_dynamic_int8
+from .restricted_vocab import load_allowed_token_ids, restrict_output_vocab
+from .stopping import StopCriteria, StopState, TokenUsage
+from .model_router import ModelRouter, ModelVariant
+from .metrics import Counter, Histogram, MetricsRegistry, TokenTimer
+from .worker_pool import InferencePool, QueueFullError
+from .thread_tuning import (
+    host_signature, load_thread_profile, save_thread_profile, set_interop_threads, sweep_threads, thread_candidates,
+    thread_profile_lock
+)
+from .admission import Admission, AdmissionControl, RateLimitError
+from .week_grammar import WeekConstraint, WeekGrammar
+from .week_format import DAY_LABELS, DAY_ORDER, clean_content, enforce_week_structure, normalize_week_text, parse_day_line
+from .week_index import WeekIndex, make_week_key, parse_input_features, parse_message_features
+from .workout_fields import ACTIVITY_PATTERNS, parse_week, parse_workout
+
+__all__ = [
+    "SimpleGPT",
+    "CausalGPT",
+    "convert_simple_gpt_state_dict",
+    "export_safetensors",
+    "load_state_dict_file",
+    "resolve_checkpoint",
+    "generate_batch",
+    "iter_generate_batch",
+    "left_pad",
+    "apply_repetition_penalty",
+    "sample_top_k",
+    "verify_draft_token",
+    "NgramDraft",
+    "BatchScheduler",
+    "ResponseCache",
+    "normalize_message",
+    "SingleFlight",
+    "PromptPrefix",
+    "quantize_dynamic_int8",
+    "load_allowed_token_ids",
+    "restrict_output_vocab",
+    "StopCriteria",
+    "StopState",
+    "TokenUsage",
+    "WeekGrammar",
+    "WeekConstraint",
+    "DAY_LABELS",
+    "DAY_ORDER",
+    "clean_content",
+    "enforce_week_structure",
+    "normalize_week_text",
+    "parse_day_line",
+    "WeekIndex",
+    "make_week_key",
+    "parse_input_features",
+    "parse_message_features",
+    "ACTIVITY_PATTERNS",
+    "parse_week",
+    "parse_workout",
+    "InferencePool",
+    "QueueFullError",
+    "host_signature",
+    "load_thread_profile",
+    "save_thread_profile",
+    "set_interop_threads",
+    "sweep_threads",
+    "thread_candidates",
+    "thread_profile_lock",
+    "Admission",
+    "AdmissionControl",
+    "RateLimitError",
+    "Counter",
+    "Histogram",
+    "MetricsRegistry",
+    "TokenTimer",
+    "ModelRouter",
+    "ModelVariant",
+]
@@ -0,0 +1,181 @@
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+
+
+class RateLimitError(Exception):
+    """Requête refusée avant génération (budget du client épuisé ou trop de générations en cours): HTTP 429"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Admission:
+    """Génération admise: tokens réservés sur le budget du client et place de génération.
+
+    `guard(source)` rattache la place à l'itérateur de génération: elle est libérée à la
+    fin de l'itération, à une erreur ou à sa fermeture. `release()` la libère tout de
+    suite (requête servie sans nouvelle génération, erreur avant le démarrage).
+    `settle(used)` remplace la réservation par les tokens réellement générés; une
+    requête servie sans nouvelle génération règle 0 (réservation rendue).
+    """
+
+    def __init__(self, control, client, charged, holds_slot, settled=False, key=None):
+        self.control = control
+        self.client = client
+        self.charged = charged
+        self.key = key
+        self._holds_slot = holds_slot
+        self._settled = settled
+        self._lock = threading.Lock()
+
+    def release(self):
+        with self._lock:
+            holds_slot, self._holds_slot = self._holds_slot, False
+        if holds_slot:
+            self.control._release_slot(self.key)
+
+    def guard(self, source):
+        return _GuardedIterator(source, self)
+
+    def settle(self, used):
+        with self._lock:
+            if self._settled:
+                return
+            self._settled = True
+        self.control._refund(self.client, self.charged - used)
+
+
+class _GuardedIterator:
+    def __init__(self, source, admission):
+        self.source = iter(source)
+        self.admission = admission
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self.source)
+        except BaseException:
+            self.admission.release()
+            raise
+
+    def close(self):
+        self.admission.release()
+        close = getattr(self.source, "close", None)
+        if close is not None:
+            close()
+
+    def __del__(self):
+        self.admission.release()
+
+
+class AdmissionControl:
+    """Contrôle d'admission des générations, vérifié avant la tokenisation.
+
+    - Budget par client (IP ou clé d'API), en tokens générés: seau de `burst` tokens
+      rechargé à `tokens_per_s`. Une requête réserve son `max_tokens` (plafonné à
+      `burst`); `Admission.settle` rend ensuite la part non générée, ou prélève le
+      dépassement (le solde peut devenir négatif). Au plus `max_clients` seaux, les
+      moins récents sont oubliés.
+    - Plafond global de `max_concurrent` générations admises (en file ou en cours);
+      `busy_retry_after()` estime alors le délai avant qu'une place se libère (1 s
+      par défaut).
+    - Requêtes identiques (même `key`): tant qu'une génération admise avec cette clé
+      garde sa place, les suivantes ne sont ni décomptées ni plafonnées (`admit`
+      retourne None): elles suivront cette génération.
+
+    Au-delà: `RateLimitError` avec un délai `retry_after` estimé. `tokens_per_s <= 0` ou
+    `max_concurrent <= 0` désactive la limite correspondante. Thread-safe, propre au
+    processus. Compteurs exposés par `stats()`.
+    """
+
+    def __init__(self, tokens_per_s=20.0, burst=2000, max_concurrent=4, max_clients=10000, busy_retry_after=None):
+        self.tokens_per_s = tokens_per_s
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self.busy_retry_after = busy_retry_after or (lambda: 1)
+        self.max_clients = max_clients
+        self.active = 0
+        self.admitted = 0
+        self.budget_rejected = 0
+        self.concurrency_rejected = 0
+        self._buckets = OrderedDict()
+        self._keys = Counter()
+        self._lock = threading.Lock()
+
+    def _level(self, client, now):
+        """Solde du seau de `client` à `now` (appelé sous verrou)"""
+        level, updated = self._buckets.get(client, (self.burst, now))
+        return min(self.burst, level + (now - updated) * self.tokens_per_s)
+
+    def _store(self, client, level, now):
+        self._buckets[client] = (level, now)
+        self._buckets.move_to_end(client)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+
+    def admit(self, client, tokens, key=None):
+        """Réserve `tokens` sur le budget de `client` et une place de génération (sinon `RateLimitError`).
+
+        None si une génération de même `key` est déjà admise.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if key is not None and self._keys[key]:
+                return None
+            charged = 0
+            if self.tokens_per_s > 0:
+                charged = min(tokens, self.burst)
+                level = self._level(client, now)
+                if level < charged:
+                    self.budget_rejected += 1
+                    raise RateLimitError(
+                        "Budget de tokens épuisé pour ce client, réessayer plus tard",
+                        max(1, math.ceil((charged - level) / self.tokens_per_s))
+                    )
+            if 0 < self.max_concurrent <= self.active:
+                self.concurrency_rejected += 1
+                raise RateLimitError("Trop de générations en cours, réessayer plus tard", self.busy_retry_after())
+            if charged:
+                self._store(client, level - charged, now)
+            self.active += 1
+            self.admitted += 1
+            if key is not None:
+                self._keys[key] += 1
+        return Admission(self, client, charged, holds_slot=True, key=key)
+
+    def free(self, client):
+        """Admission sans coût ni place (requête rattachée à une génération en cours)"""
+        return Admission(self, client, 0, holds_slot=False, settled=True)
+
+    def _release_slot(self, key=None):
+        with self._lock:
+            self.active -= 1
+            if key is not None:
+                self._keys[key] -= 1
+                if not self._keys[key]:
+                    del self._keys[key]
+
+    def _refund(self, client, tokens):
+        if self.tokens_per_s <= 0 or not tokens:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._store(client, min(self.burst, self._level(client, now) + tokens), now)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "tokens_per_s": self.tokens_per_s,
+                "burst": self.burst,
+                "max_concurrent": self.max_concurrent,
+                "active": self.active,
+                "clients": len(self._buckets),
+                "admitted": self.admitted,
+                "budget_rejected": self.budget_rejected,
+                "concurrency_rejected": self.concurrency_rejected,
+            }
@@ -0,0 +1,129 @@
+import torch
+
+from .sampling import apply_repetition_penalty, sample_top_k
+
+
+def left_pad(prompts, device, pad_token_id=0):
+    """Aligne des prompts de longueurs différentes à droite (padding à gauche).
+
+    Retourne `(input_ids, attention_mask)` de forme (batch, max_len). La valeur de
+    `pad_token_id` est sans effet: ces positions sont masquées.
+    """
+    max_len = max(len(p) for p in prompts)
+    input_ids = torch.full((len(prompts), max_len), pad_token_id, dtype=torch.long, device=device)
+    attention_mask = torch.zeros((len(prompts), max_len), dtype=torch.long, device=device)
+    for row, prompt in enumerate(prompts):
+        if prompt:
+            input_ids[row, max_len - len(prompt):] = torch.tensor(prompt, dtype=torch.long, device=device)
+            attention_mask[row, max_len - len(prompt):] = 1
+    return input_ids, attention_mask
+
+
+def generate_batch(model, prompts, device, timers=None, **settings):
+    """Équivalent batch de `generate_with_sampling`: un forward par pas pour tout le batch.
+
+    `prompts` est une liste de listes d'ids. Retourne, dans l'ordre, un tenseur (1, n) par
+    prompt contenant prompt + tokens générés, comme `generate_with_sampling`.
+    Paramètres: voir `iter_generate_batch`.
+    """
+    results = [None] * len(prompts)
+    for row, output_ids in iter_generate_batch(model, prompts, device, timers=timers, **settings):
+        results[row] = output_ids
+    return results
+
+
+def iter_generate_batch(model, prompts, device, max_tokens=200, top_k=50, temperature=0.7,
+                        stop_token=50256, repetition_penalty=1.2, use_cache=False, grammar=None,
+                        stopping=None, seed=None, timers=None):
+    """Générateur: produit `(index du prompt, tenseur (1, n))` dès qu'une séquence est terminée.
+
+    Chaque séquence est retirée du batch dès qu'elle émet `stop_token` (ou termine la
+    semaine avec `grammar`, voir `WeekGrammar`: les tokens imposés y sont produits un par
+    pas, par masquage) ou que `stopping` (voir `StopCriteria`) déclenche son arrêt.
+    Avec `seed`, l'échantillonnage du batch est reproductible. `timers` (un `TokenTimer`
+    ou None par prompt) chronomètre les tokens échantillonnés de chaque séquence, hors
+    tokens imposés par `grammar`.
+    """
+    model.eval()
+    generator = None if seed is None else torch.Generator(device=device).manual_seed(seed)
+    vocab_ids = getattr(model, "vocab_ids", None)
+    vocab_index = getattr(model, "vocab_index", None)
+    output_ids, attention_mask = left_pad(prompts, device)
+    prompt_lens = [len(p) for p in prompts]
+    pad_lens = [output_ids.size(1) - n for n in prompt_lens]
+
+    active = list(range(len(prompts)))
+    constraints = [grammar.start() for _ in prompts] if grammar is not None else None
+    stop_states = [stopping.start() for _ in prompts] if stopping is not None else None
+    timers = list(timers) if timers is not None else None
+    past_key_values = None
+    next_input_ids = output_ids
+
+    def _retire(rows_to_keep):
+        nonlocal output_ids, attention_mask, past_key_values, next_input_ids, active, constraints, stop_states, timers
+        finished = [
+            (row, output_ids[pos:pos + 1, pad_lens[row]:])
+            for pos, row in enumerate(active) if pos not in rows_to_keep
+        ]
+        keep = torch.tensor(rows_to_keep, dtype=torch.long, device=output_ids.device)
+        output_ids = output_ids.index_select(0, keep)
+        attention_mask = attention_mask.index_select(0, keep)
+        next_input_ids = next_input_ids.index_select(0, keep)
+        if past_key_values is not None:
+            past_key_values = tuple(
+                (k.index_select(0, keep), v.index_select(0, keep)) for k, v in past_key_values
+            )
+        active = [active[pos] for pos in rows_to_keep]
+        if constraints is not None:
+            constraints = [constraints[pos] for pos in rows_to_keep]
+        if stop_states is not None:
+            stop_states = [stop_states[pos] for pos in rows_to_keep]
+        if timers is not None:
+            timers = [timers[pos] for pos in rows_to_keep]
+        return finished
+
+    with torch.no_grad():
+        for _ in range(max_tokens):
+            if use_cache:
+                logits, past_key_values = model.forward_cached(
+                    next_input_ids, past_key_values, attention_mask=attention_mask
+                )
+            else:
+                logits, _ = model.forward_cached(output_ids, attention_mask=attention_mask, causal=model.is_causal)
+            next_token_logits = logits[:, -1, :] / temperature
+            next_token_logits = apply_repetition_penalty(
+                next_token_logits, output_ids, penalty=repetition_penalty, attention_mask=attention_mask,
+                vocab_index=vocab_index
+            )
+            if constraints is not None:
+                forced = [bool(constraint.pending) for constraint in constraints]
+                banned = torch.stack([constraint.banned_mask(vocab_ids) for constraint in constraints])
+                next_token_logits = next_token_logits.masked_fill(banned, float("-inf"))
+
+            next_input_ids = sample_top_k(next_token_logits, top_k, generator=generator)
+            if vocab_ids is not None:
+                next_input_ids = vocab_ids[next_input_ids]
+            output_ids = torch.cat([output_ids, next_input_ids], dim=1)
+            attention_mask = torch.cat([attention_mask, torch.ones_like(next_input_ids)], dim=1)
+            if timers is not None:
+                for pos, timer in enumerate(timers):
+                    if timer is not None and not (constraints is not None and forced[pos]):
+                        timer.sampled()
+
+            finished = (next_input_ids[:, 0] == stop_token).tolist()
+            if constraints is not None:
+                for pos, token_id in enumerate(next_input_ids[:, 0].tolist()):
+                    constraints[pos].advance(token_id)
+                finished = [done or constraint.done for done, constraint in zip(finished, constraints)]
+            if stop_states is not None:
+                finished = [
+                    state.update(token_id) or done
+                    for done, state, token_id in zip(finished, stop_states, next_input_ids[:, 0].tolist())
+                ]
+            if any(finished):
+                yield from _retire([pos for pos, done in enumerate(finished) if not done])
+                if not active:
+                    break
+
+    if active:
+        yield from _retire([])
@@ -0,0 +1,93 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from .batch_generation import generate_batch
+
+
+class BatchScheduler:
+    """Regroupe les requêtes concurrentes en micro-batchs pour `generate_batch`.
+
+    Les requêtes arrivant pendant `window_ms` (au plus `max_batch_size`) sont décodées
+    ensemble; seules les requêtes aux paramètres d'échantillonnage identiques partagent
+    un batch. Après `close()`, les requêtes restantes sont traitées puis le thread
+    s'arrête; un prompt soumis ensuite est généré directement, sans batch.
+    """
+
+    def __init__(self, model, device, window_ms=10, max_batch_size=8):
+        self.model = model
+        self.device = device
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="batch-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, prompt_ids, timer=None, **settings):
+        """Ajoute un prompt (liste d'ids) à la file; retourne un `Future` du tenseur de sortie.
+
+        `timer` (voir `TokenTimer`) chronomètre les tokens de ce prompt dans son batch.
+        """
+        future = Future()
+        with self._close_lock:
+            if not self._closed:
+                self._queue.put((list(prompt_ids), settings, future, timer))
+                return future
+        try:
+            future.set_result(
+                generate_batch(self.model, [list(prompt_ids)], self.device, timers=[timer], **settings)[0]
+            )
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def close(self):
+        """Arrête le thread après les requêtes déjà en file (ex: modèle remplacé)"""
+        with self._close_lock:
+            self._closed = True
+            self._queue.put(None)
+
+    def _collect(self):
+        """Prochain micro-batch, et False si `close()` a été appelé entre-temps"""
+        item = self._queue.get()
+        if item is None:
+            return [], False
+        batch = [item]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, False
+            batch.append(item)
+        return batch, True
+
+    def _run(self):
+        running = True
+        while running:
+            batch, running = self._collect()
+            groups = {}
+            for prompt_ids, settings, future, timer in batch:
+                key = tuple(sorted(settings.items()))
+                groups.setdefault(key, []).append((prompt_ids, future, timer))
+
+            for key, items in groups.items():
+                try:
+                    outputs = generate_batch(
+                        self.model, [prompt_ids for prompt_ids, _, _ in items], self.device,
+                        timers=[timer for _, _, timer in items], **dict(key)
+                    )
+                except Exception as e:
+                    for _, future, _ in items:
+                        future.set_exception(e)
+                    continue
+                for (_, future, _), output_ids in zip(items, outputs):
+                    future.set_result(output_ids)
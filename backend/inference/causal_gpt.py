@@ -0,0 +1,107 @@
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+from .simple_gpt import _build_attention_mask
+
+
+class CausalBlock(nn.Module):
+    """Bloc décodeur post-norm, mêmes calculs qu'un `nn.TransformerEncoderLayer` masqué"""
+
+    def __init__(self, embedding_dim, n_heads, dim_feedforward=512, dropout=0.1):
+        super().__init__()
+        self.n_heads = n_heads
+        self.qkv = nn.Linear(embedding_dim, 3 * embedding_dim)
+        self.out_proj = nn.Linear(embedding_dim, embedding_dim)
+        self.linear1 = nn.Linear(embedding_dim, dim_feedforward)
+        self.linear2 = nn.Linear(dim_feedforward, embedding_dim)
+        self.norm1 = nn.LayerNorm(embedding_dim)
+        self.norm2 = nn.LayerNorm(embedding_dim)
+        self.dropout = dropout
+
+    def forward(self, x, layer_past=None, attn_mask=None):
+        batch_size, seq_len, dim = x.shape
+        head_dim = dim // self.n_heads
+
+        q, k, v = self.qkv(x).view(batch_size, seq_len, 3, self.n_heads, head_dim).permute(2, 0, 3, 1, 4)
+        if layer_past is not None:
+            k = torch.cat([layer_past[0], k], dim=2)
+            v = torch.cat([layer_past[1], v], dim=2)
+
+        dropout_p = self.dropout if self.training else 0.0
+        if attn_mask is not None:
+            # SDPA: True = position autorisée (inverse de _build_attention_mask)
+            attn_out = F.scaled_dot_product_attention(q, k, v, attn_mask=~attn_mask, dropout_p=dropout_p)
+        else:
+            # Sans cache, causal; avec cache et un seul nouveau token, il voit tout le passé
+            is_causal = layer_past is None and seq_len > 1
+            attn_out = F.scaled_dot_product_attention(q, k, v, dropout_p=dropout_p, is_causal=is_causal)
+        attn_out = attn_out.transpose(1, 2).reshape(batch_size, seq_len, dim)
+
+        x = self.norm1(x + F.dropout(self.out_proj(attn_out), dropout_p, self.training))
+        ff = self.linear2(F.dropout(F.relu(self.linear1(x)), dropout_p, self.training))
+        x = self.norm2(x + F.dropout(ff, dropout_p, self.training))
+        return x, (k, v)
+
+
+class CausalGPT(nn.Module):
+    """Décodeur causal remplaçant `SimpleGPT`, attention fusionnée (`scaled_dot_product_attention`).
+
+    Mêmes hyperparamètres et mêmes entrées/sorties que `SimpleGPT`; les poids existants
+    se chargent via `convert_simple_gpt_state_dict`. L'attention est toujours causale.
+    """
+
+    is_causal = True
+
+    def __init__(self, vocab_size=50257, embedding_dim=256, n_layers=4, n_heads=4, context_length=1024):
+        super().__init__()
+        self.token_embedding = nn.Embedding(vocab_size, embedding_dim)
+        self.pos_embedding = nn.Embedding(context_length, embedding_dim)
+        self.blocks = nn.ModuleList([CausalBlock(embedding_dim, n_heads) for _ in range(n_layers)])
+        self.output_layer = nn.Linear(embedding_dim, vocab_size)
+
+    def forward(self, input_ids):
+        logits, _ = self.forward_cached(input_ids)
+        return logits
+
+    def forward_cached(self, input_ids, past_key_values=None, attention_mask=None, causal=True):
+        """Même contrat que `SimpleGPT.forward_cached` (`causal=False` non supporté)"""
+        if not causal:
+            raise ValueError("CausalGPT ne supporte que l'attention causale")
+        past_len = 0 if past_key_values is None else past_key_values[0][0].size(2)
+        seq_len = input_ids.size(1)
+        if attention_mask is None:
+            pos_ids = torch.arange(past_len, past_len + seq_len, device=input_ids.device).unsqueeze(0)
+            attn_mask = None
+            if past_len > 0 and seq_len > 1:
+                attn_mask = _build_attention_mask(seq_len, past_len, None, True, input_ids.device)
+        else:
+            pos_ids = (attention_mask.long().cumsum(dim=-1) - 1).clamp(min=0)[:, past_len:]
+            attn_mask = _build_attention_mask(seq_len, past_len, attention_mask, True, input_ids.device)
+
+        x = self.token_embedding(input_ids) + self.pos_embedding(pos_ids)
+
+        present_key_values = []
+        for i, block in enumerate(self.blocks):
+            layer_past = None if past_key_values is None else past_key_values[i]
+            x, layer_present = block(x, layer_past, attn_mask)
+            present_key_values.append(layer_present)
+
+        return self.output_layer(x), tuple(present_key_values)
+
+
+def convert_simple_gpt_state_dict(state_dict):
+    """Convertit un state dict `SimpleGPT` (running_plan_finetuned_model_*.pth) pour `CausalGPT`"""
+    renames = {
+        "self_attn.in_proj_weight": "qkv.weight",
+        "self_attn.in_proj_bias": "qkv.bias",
+        "self_attn.out_proj.weight": "out_proj.weight",
+        "self_attn.out_proj.bias": "out_proj.bias",
+    }
+    converted = {}
+    for key, value in state_dict.items():
+        if key.startswith("transformer.layers."):
+            layer_idx, name = key[len("transformer.layers."):].split(".", 1)
+            key = f"blocks.{layer_idx}.{renames.get(name, name)}"
+        converted[key] = value
+    return converted
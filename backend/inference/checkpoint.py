@@ -0,0 +1,45 @@
+from pathlib import Path
+
+import torch
+
+
+def resolve_checkpoint(path):
+    """Chemin à charger: l'export `.safetensors` voisin de `path` s'il existe, sinon `path`"""
+    path = Path(path)
+    exported = path.with_suffix(".safetensors")
+    return exported if exported.exists() else path
+
+
+def load_state_dict_file(path, device="cpu", mmap=True):
+    """State dict d'un checkpoint `.safetensors` ou `.pth` (torch.save).
+
+    Avec `mmap`, les tenseurs sont adossés au fichier mappé en mémoire: sur CPU, les
+    pages (lues à la demande) restent dans le cache du noyau et sont partagées entre
+    processus qui chargent le même fichier, tant qu'elles ne sont pas modifiées.
+    Un `.pth` à l'ancien format (non zip) est chargé classiquement.
+    """
+    path = Path(path)
+    if path.suffix == ".safetensors":
+        from safetensors.torch import load_file
+
+        if not mmap:
+            return {name: tensor.clone() for name, tensor in load_file(path, device=str(device)).items()}
+        return load_file(path, device=str(device))
+    if mmap:
+        try:
+            return torch.load(path, map_location=device, mmap=True, weights_only=True)
+        except RuntimeError as e:
+            print(f"⚠ Chargement mmap impossible ({e}), chargement classique")
+    return torch.load(path, map_location=device)
+
+
+def export_safetensors(source, target=None):
+    """Réécrit le checkpoint `source` (.pth) au format safetensors; retourne le chemin écrit"""
+    from safetensors.torch import save_file
+
+    source = Path(source)
+    target = Path(target) if target is not None else source.with_suffix(".safetensors")
+    state_dict = load_state_dict_file(source, mmap=False)
+    # safetensors refuse les tenseurs non contigus ou partageant leur stockage
+    save_file({name: tensor.contiguous().clone() for name, tensor in state_dict.items()}, target)
+    return target
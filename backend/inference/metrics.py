@@ -0,0 +1,158 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Bornes (secondes) adaptées aux latences CPU: du token (ms) à la requête complète (s)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Compteur cumulatif (thread-safe), éventuellement étiqueté"""
+
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Histogram:
+    """Histogramme à bornes fixes (thread-safe), au format Prometheus"""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            counts, total = self._series.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._series[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe la durée du bloc `with`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            series = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+        for key, (counts, total) in sorted(series.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", dict(labels, le=_format_value(float(bound))), cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class TokenTimer:
+    """Chronomètre des tokens échantillonnés d'une génération, appelé par la boucle de décodage.
+
+    `sampled()` est appelé dès qu'un token est choisi par le modèle; les tokens imposés
+    (libellés de jour de `WeekGrammar`) ne le sont pas. `observe` enregistre le délai
+    du premier token échantillonné depuis `start` et la latence moyenne des suivants.
+    """
+
+    def __init__(self, start):
+        self.start = start
+        self.first = self.last = None
+        self.count = 0
+
+    def sampled(self):
+        self.last = time.perf_counter()
+        if self.first is None:
+            self.first = self.last
+        self.count += 1
+
+    def observe(self, first_token_histogram, decode_histogram):
+        if self.first is not None:
+            first_token_histogram.observe(self.first - self.start)
+        if self.count > 1:
+            decode_histogram.observe((self.last - self.first) / (self.count - 1))
+
+
+class MetricsRegistry:
+    """Ensemble de métriques rendu au format texte Prometheus (`render`).
+
+    Les collecteurs (`collector`) ajoutent des valeurs lues au moment du rendu, par
+    exemple les compteurs de `ResponseCache.stats()`. Les valeurs sont propres au
+    processus: sous gunicorn, chaque worker expose les siennes.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, buckets=DEFAULT_BUCKETS, labelnames=()):
+        metric = Histogram(name, documentation, buckets, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        """`fn()` retourne des tuples `(nom, type, description, valeur)`; utilisable en décorateur"""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for fn in self._collectors:
+            for name, metric_type, documentation, value in fn():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,141 @@
+import itertools
+import random
+import threading
+import time
+import zlib
+
+_versions = itertools.count(1)
+
+
+class ModelVariant:
+    """Modèle servi sous un nom (variante A/B), avec son état propre et ses statistiques.
+
+    `prompt_prefix` (état précalculé du préfixe) et `batch_scheduler` dépendent des
+    poids: ils sont reconstruits à chaque chargement. `version` change à chaque
+    chargement, pour que les réponses en cache d'anciens poids ne soient plus servies.
+    """
+
+    def __init__(self, name, path, model, prompt_prefix=None, batch_scheduler=None, signature=None):
+        self.name = name
+        self.path = path
+        self.model = model
+        self.prompt_prefix = prompt_prefix
+        self.batch_scheduler = batch_scheduler
+        # (mtime, taille) du fichier au moment du chargement (voir rechargement à chaud)
+        self.signature = signature
+        self.device = next(model.parameters()).device
+        self.version = f"{name}:{next(_versions)}"
+        self.loaded_at = time.time()
+        self.requests = 0
+        self.valid = 0
+        self.generated_tokens = 0
+        self.latency_total_s = 0.0
+        self.latency_max_s = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, latency_s, valid, generated_tokens=0):
+        """Comptabilise une requête servie: durée de génération, sortie valide ou non"""
+        with self._lock:
+            self.requests += 1
+            self.valid += int(valid)
+            self.generated_tokens += generated_tokens
+            self.latency_total_s += latency_s
+            self.latency_max_s = max(self.latency_max_s, latency_s)
+
+    def close(self):
+        """Libère l'état associé une fois la variante remplacée (micro-batching)"""
+        if self.batch_scheduler is not None:
+            self.batch_scheduler.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "path": str(self.path),
+                "version": self.version,
+                "loaded_at": self.loaded_at,
+                "requests": self.requests,
+                "valid_outputs": self.valid,
+                "valid_ratio": self.valid / self.requests if self.requests else None,
+                "generated_tokens": self.generated_tokens,
+                "avg_latency_s": self.latency_total_s / self.requests if self.requests else None,
+                "max_latency_s": self.latency_max_s,
+            }
+
+
+class ModelRouter:
+    """Variantes chargées et répartition pondérée des requêtes entre elles (A/B).
+
+    `add` remplace atomiquement une variante de même nom: les requêtes déjà routées
+    terminent avec l'ancienne, les suivantes utilisent la nouvelle. Avec une clé de
+    routage (`choose(key)`), une même requête est toujours servie par la même variante
+    tant que les poids ne changent pas.
+    """
+
+    def __init__(self):
+        self._variants = {}
+        self._weights = {}
+        self._lock = threading.Lock()
+
+    def add(self, variant, weight=None):
+        """Ajoute ou remplace la variante `variant.name`; retourne la précédente (ou None).
+
+        Sans `weight`, une variante remplacée garde son poids; une nouvelle reçoit 0 et ne
+        sert aucune requête tant qu'un poids ne lui est pas donné (`set_weights`).
+        """
+        if weight is not None and weight < 0:
+            raise ValueError("Le poids d'une variante doit être positif ou nul")
+        with self._lock:
+            previous = self._variants.get(variant.name)
+            self._variants[variant.name] = variant
+            if weight is not None or variant.name not in self._weights:
+                self._weights[variant.name] = 0.0 if weight is None else float(weight)
+            return previous
+
+    def set_weights(self, weights):
+        """Remplace les poids de routage (`{nom: poids}`); les variantes absentes passent à 0"""
+        with self._lock:
+            unknown = set(weights) - set(self._variants)
+            if unknown:
+                raise ValueError(f"Variantes inconnues: {', '.join(sorted(unknown))}")
+            if any(not isinstance(w, (int, float)) or isinstance(w, bool) or w < 0 for w in weights.values()):
+                raise ValueError("Les poids doivent être des nombres positifs ou nuls")
+            if sum(weights.values()) <= 0:
+                raise ValueError("Au moins une variante doit avoir un poids non nul")
+            self._weights = {name: float(weights.get(name, 0.0)) for name in self._variants}
+
+    def get(self, name):
+        with self._lock:
+            return self._variants.get(name)
+
+    def variants(self):
+        with self._lock:
+            return list(self._variants.values())
+
+    def choose(self, key=None):
+        """Variante qui sert la requête: tirage pondéré, déterministe pour une même `key`"""
+        with self._lock:
+            candidates = [(name, w) for name, w in self._weights.items() if w > 0]
+            if not candidates:
+                return None
+            total = sum(w for _, w in candidates)
+            point = zlib.crc32(key.encode()) / 2**32 if key is not None else random.random()
+            point *= total
+            for name, weight in candidates:
+                point -= weight
+                if point < 0:
+                    return self._variants[name]
+            return self._variants[candidates[-1][0]]
+
+    def stats(self):
+        with self._lock:
+            variants = list(self._variants.values())
+            weights = dict(self._weights)
+        total = sum(weights.values())
+        return {
+            variant.name: dict(
+                variant.stats(),
+                weight=weights[variant.name],
+                traffic_share=weights[variant.name] / total if total else 0.0,
+            )
+            for variant in variants
+        }
@@ -0,0 +1,73 @@
+import json
+import threading
+from collections import Counter, defaultdict
+
+
+class NgramDraft:
+    """Brouillon du décodage spéculatif: n-grammes des sorties du dataset d'entraînement.
+
+    Pour un contexte, propose token par token la suite la plus fréquente après les
+    `order` derniers tokens (repli sur des contextes plus courts), tant que sa fréquence
+    relative atteint `min_confidence`. Le modèle vérifie ensuite les propositions en un
+    seul forward (voir `iter_generate_with_sampling`). Compteurs thread-safe: `stats()`.
+    """
+
+    def __init__(self, sequences, order=4, min_confidence=0.3, stop_token=50256):
+        self.order = order
+        self.min_confidence = min_confidence
+        self.stop_token = stop_token
+        counts = defaultdict(Counter)
+        for sequence in sequences:
+            sequence = list(sequence) + [stop_token]
+            for i in range(1, len(sequence)):
+                for n in range(1, min(order, i) + 1):
+                    counts[tuple(sequence[i - n:i])][sequence[i]] += 1
+        # contexte -> (token suivant le plus fréquent, fréquence relative)
+        self.table = {}
+        for context, followers in counts.items():
+            token_id, count = followers.most_common(1)[0]
+            self.table[context] = (token_id, count / sum(followers.values()))
+        self.proposed = 0
+        self.accepted = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dataset(cls, dataset_path, tokenizer, prefix="", exclude_outputs=(), **kwargs):
+        """N-grammes des champs `output` du dataset, précédés de `prefix` (ex: fin du prompt)"""
+        with open(dataset_path, "r", encoding="utf-8") as f:
+            training_data = json.load(f).get("training_data", [])
+        outputs = {entry["output"] for entry in training_data if entry.get("output")} - set(exclude_outputs)
+        return cls([tokenizer.encode(prefix + output) for output in sorted(outputs)], **kwargs)
+
+    def propose(self, context, max_tokens):
+        """Jusqu'à `max_tokens` ids proposés à la suite de `context` (liste d'ids)"""
+        context = list(context[-self.order:])
+        proposal = []
+        while len(proposal) < max_tokens:
+            for n in range(min(self.order, len(context)), 0, -1):
+                entry = self.table.get(tuple(context[-n:]))
+                if entry is not None:
+                    break
+            else:
+                break
+            token_id, confidence = entry
+            if confidence < self.min_confidence:
+                break
+            proposal.append(token_id)
+            if token_id == self.stop_token:
+                break
+            context = context[1:] + [token_id] if len(context) == self.order else context + [token_id]
+        return proposal
+
+    def record(self, proposed, accepted):
+        with self._lock:
+            self.proposed += proposed
+            self.accepted += accepted
+
+    def stats(self):
+        with self._lock:
+            return {
+                "proposed_tokens": self.proposed,
+                "accepted_tokens": self.accepted,
+                "acceptance_rate": self.accepted / self.proposed if self.proposed else None,
+            }
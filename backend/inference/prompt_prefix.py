@@ -0,0 +1,38 @@
+import torch
+
+
+class PromptPrefix:
+    """Début de prompt commun à toutes les requêtes, calculé une seule fois.
+
+    Garde les ids tiktoken du préfixe et, si un modèle est fourni, les clés/valeurs de
+    chaque couche (`SimpleGPT.forward_cached`) pour ne traiter que la suite du prompt.
+    """
+
+    # Suite représentative pour vérifier que le découpage BPE ne traverse pas la frontière
+    PROBE_SUFFIX = "\n\n### Input:\nentrainement 10 km\n\n### Response:\n"
+
+    def __init__(self, text, tokenizer, model=None, device="cpu"):
+        self.text = text
+        self.tokenizer = tokenizer
+        self.ids = tokenizer.encode(text)
+        self.enabled = tokenizer.encode(text + self.PROBE_SUFFIX) == self.ids + tokenizer.encode(self.PROBE_SUFFIX)
+        self.past_key_values = None
+        if self.enabled and model is not None:
+            with torch.no_grad():
+                prefix_ids = torch.tensor([self.ids], dtype=torch.long, device=device)
+                _, self.past_key_values = model.forward_cached(prefix_ids)
+
+    def encode(self, prompt):
+        """Tokenise `prompt` en réutilisant les ids du préfixe quand il commence par celui-ci"""
+        if not self.enabled or not prompt.startswith(self.text):
+            return self.tokenizer.encode(prompt)
+        return self.ids + self.tokenizer.encode(prompt[len(self.text):])
+
+    def past_for(self, prompt_ids):
+        """Clés/valeurs du préfixe si `prompt_ids` le prolonge, sinon None"""
+        n = len(self.ids)
+        if self.past_key_values is None or prompt_ids.size(1) <= n:
+            return None
+        if prompt_ids[0, :n].tolist() != self.ids:
+            return None
+        return self.past_key_values
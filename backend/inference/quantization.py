@@ -0,0 +1,22 @@
+import torch
+import torch.nn as nn
+from torch.ao.quantization import quantize_dynamic
+
+
+def quantize_dynamic_int8(model):
+    """Quantification dynamique int8 des couches Linear (inférence CPU uniquement).
+
+    Les Linear internes d'un `nn.TransformerEncoderLayer` (SimpleGPT) restent en float:
+    le chemin rapide de l'encodeur PyTorch lit directement leurs poids. La projection de
+    sortie 256×50257, qui domine le coût par token, est quantifiée dans tous les cas.
+    """
+    skipped = set()
+    for name, module in model.named_modules():
+        if isinstance(module, nn.TransformerEncoderLayer):
+            skipped.update(f"{name}.{child}" for child, _ in module.named_modules() if child)
+
+    targets = {
+        name for name, module in model.named_modules()
+        if isinstance(module, nn.Linear) and name not in skipped
+    }
+    return quantize_dynamic(model, targets, dtype=torch.qint8)
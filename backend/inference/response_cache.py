@@ -0,0 +1,54 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_message(message):
+    """Normalise un message utilisateur pour la clé de cache (casse et espaces)"""
+    return " ".join(message.split()).lower()
+
+
+class ResponseCache:
+    """Cache LRU des réponses générées, avec expiration (TTL) et compteurs hit/miss.
+
+    Thread-safe: partagé entre les threads de requêtes Flask. `max_size=0` désactive le
+    cache (toujours miss, rien n'est stocké).
+    """
+
+    def __init__(self, max_size=512, ttl_s=600.0):
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(message, sampling, seed=None):
+        return normalize_message(message), tuple(sorted(sampling.items())), seed
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_s:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
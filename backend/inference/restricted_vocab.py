@@ -0,0 +1,42 @@
+import json
+
+import torch
+import torch.nn as nn
+
+
+def load_allowed_token_ids(dataset_path, tokenizer, extra_ids=(50256,)):
+    """Ids des tokens présents dans les sorties du dataset (+ `extra_ids`, ex: fin de texte)"""
+    with open(dataset_path, "r", encoding="utf-8") as f:
+        training_data = json.load(f).get("training_data", [])
+
+    token_ids = set(extra_ids)
+    for output in {entry["output"] for entry in training_data if entry.get("output")}:
+        token_ids.update(tokenizer.encode(output))
+    return sorted(token_ids)
+
+
+def restrict_output_vocab(model, token_ids):
+    """Réduit `model.output_layer` aux seuls `token_ids` (modifie le modèle en place).
+
+    Les logits produits sont alors indexés de 0 à len(token_ids) - 1: `model.vocab_ids`
+    donne l'id GPT-2 de chaque index, `model.vocab_index` fait la conversion inverse
+    (-1 pour les ids hors vocabulaire).
+    """
+    full_layer = model.output_layer
+    vocab_size = full_layer.out_features
+    ids = torch.tensor(token_ids, dtype=torch.long, device=full_layer.weight.device)
+
+    layer = nn.Linear(full_layer.in_features, len(token_ids), bias=full_layer.bias is not None)
+    layer = layer.to(full_layer.weight.device)
+    with torch.no_grad():
+        layer.weight.copy_(full_layer.weight[ids])
+        if full_layer.bias is not None:
+            layer.bias.copy_(full_layer.bias[ids])
+    model.output_layer = layer
+
+    vocab_index = torch.full((vocab_size,), -1, dtype=torch.long, device=ids.device)
+    vocab_index[ids] = torch.arange(len(token_ids), device=ids.device)
+    model.register_buffer("vocab_ids", ids, persistent=False)
+    model.register_buffer("vocab_index", vocab_index, persistent=False)
+    return model
+
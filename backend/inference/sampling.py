@@ -0,0 +1,59 @@
+import torch
+
+
+def apply_repetition_penalty(logits, token_ids, penalty=1.2, attention_mask=None, vocab_index=None):
+    """Pénalise, ligne par ligne, les logits (batch, V) des tokens déjà présents dans la séquence.
+
+    Le signe est respecté: un logit positif est divisé par `penalty`, un logit négatif
+    multiplié, le token devient donc moins probable dans les deux cas. Sans `torch.unique`:
+    les doublons de `token_ids` (batch, n) réécrivent la même valeur (gather puis scatter).
+    `attention_mask` exclut le padding; `vocab_index` (voir `restrict_output_vocab`)
+    convertit les ids en colonnes de logits, les ids hors vocabulaire sont ignorés.
+    Modifie `logits` en place et le retourne.
+    """
+    if penalty == 1.0 or token_ids.size(1) == 0:
+        return logits
+    if attention_mask is None and vocab_index is None:
+        values = logits.gather(1, token_ids)
+        return logits.scatter_(1, token_ids, torch.where(values > 0, values / penalty, values * penalty))
+
+    columns = token_ids if vocab_index is None else vocab_index[token_ids]
+    keep = columns >= 0
+    if attention_mask is not None:
+        keep &= attention_mask.bool()
+    # Positions ignorées: remplacées par la première colonne retenue de la ligne (déjà
+    # pénalisée, sans effet de plus); une ligne sans colonne retenue garde ses logits
+    first_kept = columns.gather(1, keep.int().argmax(dim=1, keepdim=True)).clamp(min=0)
+    columns = torch.where(keep, columns, first_kept)
+    values = logits.gather(1, columns)
+    penalized = torch.where(values > 0, values / penalty, values * penalty)
+    penalized = torch.where(keep.any(dim=1, keepdim=True), penalized, values)
+    return logits.scatter_(1, columns, penalized)
+
+
+def sample_top_k(logits, top_k=50, generator=None):
+    """Échantillonne une colonne par ligne parmi les `top_k` plus grands logits (batch, V).
+
+    Retourne un tenseur (batch, 1) d'indices de colonnes, sans synchronisation avec l'hôte.
+    """
+    top_k_logits, top_k_indices = torch.topk(logits, min(top_k, logits.size(-1)))
+    top_k_probs = torch.softmax(top_k_logits, dim=-1)
+    sampled_idx = torch.multinomial(top_k_probs, 1, generator=generator)
+    return top_k_indices.gather(-1, sampled_idx)
+
+
+def verify_draft_token(logits, column, top_k=50, generator=None):
+    """Vérifie un token proposé par un brouillon déterministe (décodage spéculatif).
+
+    La colonne `column` est acceptée avec la probabilité que lui donne l'échantillonnage
+    top-k de `logits` (1, V); sinon une autre colonne est tirée selon la même loi privée
+    de `column`. Les tokens produits suivent donc exactement la loi de `sample_top_k`.
+    Retourne `(indice de colonne (1, 1), accepté)`.
+    """
+    top_k_logits, top_k_indices = torch.topk(logits, min(top_k, logits.size(-1)))
+    top_k_probs = torch.softmax(top_k_logits, dim=-1)
+    match = top_k_indices == column
+    if torch.rand(1, generator=generator, device=logits.device) < top_k_probs[match].sum():
+        return torch.full((1, 1), column, dtype=torch.long, device=logits.device), True
+    sampled_idx = torch.multinomial(top_k_probs.masked_fill(match, 0.0), 1, generator=generator)
+    return top_k_indices.gather(-1, sampled_idx), False
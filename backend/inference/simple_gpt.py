@@ -0,0 +1,124 @@
+import math
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+
+# Modèle SimpleGPT (même architecture que celle utilisée dans le notebook)
+class SimpleGPT(nn.Module):
+    """Simplified GPT model for instruction finetuning"""
+    # `model(input_ids)` est bidirectionnel (pas de masque causal à l'entraînement)
+    is_causal = False
+
+    def __init__(self, vocab_size=50257, embedding_dim=256, n_layers=4, n_heads=4, context_length=1024):
+        super().__init__()
+        self.token_embedding = nn.Embedding(vocab_size, embedding_dim)
+        self.pos_embedding = nn.Embedding(context_length, embedding_dim)
+        
+        # Transformer layers
+        encoder_layer = nn.TransformerEncoderLayer(
+            d_model=embedding_dim,
+            nhead=n_heads,
+            dim_feedforward=512,
+            batch_first=True,
+            dropout=0.1
+        )
+        self.transformer = nn.TransformerEncoder(encoder_layer, num_layers=n_layers)
+        
+        # Output layer
+        self.output_layer = nn.Linear(embedding_dim, vocab_size)
+    
+    def forward(self, input_ids, causal=False):
+        seq_len = input_ids.size(1)
+        pos_ids = torch.arange(seq_len, device=input_ids.device).unsqueeze(0)
+        
+        token_emb = self.token_embedding(input_ids)
+        pos_emb = self.pos_embedding(pos_ids)
+        x = token_emb + pos_emb
+        
+        if causal:
+            mask = nn.Transformer.generate_square_subsequent_mask(seq_len, device=input_ids.device)
+            x = self.transformer(x, mask=mask, is_causal=True)
+        else:
+            x = self.transformer(x)
+        logits = self.output_layer(x)
+        return logits
+
+    def forward_cached(self, input_ids, past_key_values=None, attention_mask=None, causal=True):
+        """Forward incrémental: seuls `input_ids` (les nouveaux tokens) sont calculés.
+
+        Les clés/valeurs de chaque couche sont mises en cache et réutilisées au pas
+        suivant. L'attention est causale: le résultat correspond à `forward(..., causal=True)`
+        sur la séquence complète. Retourne `(logits, present_key_values)`.
+
+        `attention_mask` (batch, past_len + seq_len) vaut 0 sur les tokens de padding
+        (padding à gauche pour les batchs): ils sont ignorés et les positions repartent
+        de 0 au premier vrai token. `causal=False` reproduit l'attention bidirectionnelle
+        de `forward` (sans cache) sur un batch paddé.
+        """
+        past_len = 0 if past_key_values is None else past_key_values[0][0].size(2)
+        seq_len = input_ids.size(1)
+        if attention_mask is None:
+            pos_ids = torch.arange(past_len, past_len + seq_len, device=input_ids.device).unsqueeze(0)
+        else:
+            pos_ids = (attention_mask.long().cumsum(dim=-1) - 1).clamp(min=0)[:, past_len:]
+
+        x = self.token_embedding(input_ids) + self.pos_embedding(pos_ids)
+        attn_mask = _build_attention_mask(seq_len, past_len, attention_mask, causal, input_ids.device)
+
+        present_key_values = []
+        for i, layer in enumerate(self.transformer.layers):
+            layer_past = None if past_key_values is None else past_key_values[i]
+            x, layer_present = _encoder_layer_cached(layer, x, layer_past, attn_mask)
+            present_key_values.append(layer_present)
+
+        if self.transformer.norm is not None:
+            x = self.transformer.norm(x)
+        logits = self.output_layer(x)
+        return logits, tuple(present_key_values)
+
+
+def _build_attention_mask(seq_len, past_len, attention_mask, causal, device):
+    """Masque booléen (True = interdit) de forme (batch ou 1, 1, seq_len, past_len + seq_len)."""
+    total_len = past_len + seq_len
+    mask = torch.zeros(1, 1, seq_len, total_len, dtype=torch.bool, device=device)
+    if causal and seq_len > 1:
+        # Le nouveau token i (position absolue past_len + i) ne voit pas les suivants
+        mask = mask | torch.ones(seq_len, total_len, dtype=torch.bool, device=device).triu(past_len + 1)
+    if attention_mask is not None:
+        mask = mask | (attention_mask == 0)[:, None, None, :]
+        # Un token de padding se voit lui-même: évite une ligne entièrement masquée (NaN)
+        diagonal = torch.zeros(seq_len, total_len, dtype=torch.bool, device=device)
+        diagonal[:, past_len:] = torch.eye(seq_len, dtype=torch.bool, device=device)
+        mask = mask & ~diagonal
+    return mask if mask.any() else None
+
+
+def _encoder_layer_cached(layer, x, layer_past=None, attn_mask=None):
+    """Rejoue un `nn.TransformerEncoderLayer` (post-norm) avec un cache clé/valeur."""
+    attn = layer.self_attn
+    batch_size, seq_len, dim = x.shape
+    n_heads = attn.num_heads
+    head_dim = dim // n_heads
+
+    q, k, v = F.linear(x, attn.in_proj_weight, attn.in_proj_bias).chunk(3, dim=-1)
+    q = q.view(batch_size, seq_len, n_heads, head_dim).transpose(1, 2)
+    k = k.view(batch_size, seq_len, n_heads, head_dim).transpose(1, 2)
+    v = v.view(batch_size, seq_len, n_heads, head_dim).transpose(1, 2)
+
+    if layer_past is not None:
+        k = torch.cat([layer_past[0], k], dim=2)
+        v = torch.cat([layer_past[1], v], dim=2)
+
+    scores = q @ k.transpose(-2, -1) / math.sqrt(head_dim)
+    if attn_mask is not None:
+        scores = scores.masked_fill(attn_mask, float("-inf"))
+
+    attn_out = torch.softmax(scores, dim=-1) @ v
+    attn_out = attn_out.transpose(1, 2).reshape(batch_size, seq_len, dim)
+    attn_out = attn.out_proj(attn_out)
+
+    x = layer.norm1(x + attn_out)
+    x = layer.norm2(x + layer.linear2(layer.activation(layer.linear1(x))))
+    return x, (k, v)
@@ -0,0 +1,110 @@
+import threading
+
+
+class _Flight:
+    """Génération en cours partagée par ses abonnés.
+
+    Les éléments déjà produits sont gardés pour les abonnés arrivés en retard. Il n'y a
+    pas de thread dédié: l'abonné qui a besoin de l'élément suivant le lit lui-même
+    dans la source, sous verrou. Le flux continue donc tant qu'il reste un abonné,
+    même si le premier demandeur abandonne.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.items = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.lock = threading.Lock()
+
+
+class SingleFlight:
+    """Regroupe les requêtes identiques sur une seule génération (single-flight).
+
+    `stream(key, make_iter)` démarre `make_iter()` si aucune génération n'est en cours
+    pour `key`. Sinon la requête s'abonne à la génération existante: elle reçoit les
+    mêmes éléments, depuis le début, et la même erreur éventuelle. La génération est
+    oubliée dès qu'elle se termine, ou quand son dernier abonné abandonne (la source est
+    alors fermée). Thread-safe. Compteurs exposés par `stats()`: générations démarrées
+    (`leaders`) et requêtes rattachées (`followers`).
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.leaders = 0
+        self.followers = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def stream(self, key, make_iter):
+        """Retourne `(itérateur, leader)`. `leader` est False si la requête suit une génération en cours.
+
+        Les exceptions de `make_iter()` (ex: `QueueFullError`) sont propagées, et rien
+        n'est enregistré.
+        """
+        with self._lock:
+            flight = self._flights.get(key) if self.enabled else None
+            leader = flight is None
+            if leader:
+                flight = _Flight(make_iter())
+                if self.enabled:
+                    self._flights[key] = flight
+                self.leaders += 1
+            else:
+                self.followers += 1
+            flight.subscribers += 1
+        return self._subscribe(key, flight), leader
+
+    def in_flight(self, key):
+        """True si une génération est en cours pour `key` (une requête `stream` la suivrait)"""
+        with self._lock:
+            return self.enabled and key in self._flights
+
+    def _subscribe(self, key, flight):
+        position = 0
+        try:
+            while True:
+                with flight.lock:
+                    if position == len(flight.items) and not flight.done:
+                        try:
+                            flight.items.append(next(flight.source))
+                        except StopIteration:
+                            self._finish(key, flight)
+                        except Exception as e:
+                            flight.error = e
+                            self._finish(key, flight)
+                    if position == len(flight.items):
+                        if flight.error is not None:
+                            raise flight.error
+                        return
+                    item = flight.items[position]
+                position += 1
+                yield item
+        finally:
+            with self._lock:
+                flight.subscribers -= 1
+                abandoned = flight.subscribers == 0 and not flight.done
+                if abandoned and self._flights.get(key) is flight:
+                    del self._flights[key]
+            if abandoned:
+                with flight.lock:
+                    close = getattr(flight.source, "close", None)
+                    if close is not None:
+                        close()
+
+    def _finish(self, key, flight):
+        flight.done = True
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def stats(self):
+        with self._lock:
+            requests = self.leaders + self.followers
+            return {
+                "in_flight": len(self._flights),
+                "leaders": self.leaders,
+                "followers": self.followers,
+                "coalesce_ratio": self.followers / requests if requests else None,
+            }
@@ -0,0 +1,108 @@
+import threading
+
+
+class StopCriteria:
+    """Conditions d'arrêt évaluées sur le texte généré, token par token.
+
+    - `stop_strings`: arrêt dès qu'une de ces chaînes apparaît (ex: "###", début
+      d'une nouvelle section Alpaca)
+    - `day_labels`: arrêt dès qu'une ligne a été fermée pour chacun des jours (la
+      suite serait ignorée par `enforce_week_structure`)
+    `start()` crée l'état d'une séquence (`StopState`).
+    """
+
+    def __init__(self, tokenizer, stop_strings=(), day_labels=None, stop_token=50256):
+        self.tokenizer = tokenizer
+        self.stop_strings = [s for s in stop_strings if s]
+        self.days = [label.lower() for label in day_labels] if day_labels else []
+        self.stop_token = stop_token
+        self._tail_len = max((len(s) for s in self.stop_strings), default=1) - 1
+
+    def start(self):
+        return StopState(self)
+
+    def kept_tokens(self, token_ids):
+        """Nombre de tokens de `token_ids` repris dans la semaine (lignes de jour retenues)"""
+        state = self.start()
+        for token_id in token_ids:
+            if token_id == self.stop_token:
+                break
+            state.update(token_id)
+        return state.kept_tokens
+
+
+class StopState:
+    """État de `StopCriteria` pour une séquence en cours de génération"""
+
+    def __init__(self, criteria):
+        self.criteria = criteria
+        self.generated = 0
+        self.days_seen = set()
+        self.done = False
+        self._tail = ""
+        self._line = ""
+        self._kept = 0
+
+    @property
+    def kept_tokens(self):
+        """Tokens jusqu'à la fin de la dernière ligne de jour retenue (première occurrence)"""
+        return self.generated if self._new_day(self._line) else self._kept
+
+    def _new_day(self, line):
+        lower = line.strip().lower()
+        for day in self.criteria.days:
+            if lower.startswith(day):
+                return day not in self.days_seen and day
+        return None
+
+    def update(self, token_id):
+        """Ajoute un token; retourne True si la génération doit s'arrêter"""
+        criteria = self.criteria
+        self.generated += 1
+        piece = criteria.tokenizer.decode([token_id])
+
+        if criteria.stop_strings:
+            window = self._tail + piece
+            if any(s in window for s in criteria.stop_strings):
+                self.done = True
+            self._tail = window[-criteria._tail_len:] if criteria._tail_len else ""
+
+        # "\\n" littéral: traité comme un retour à la ligne (voir normalize_week_text)
+        parts = piece.replace("\\n", "\n").split("\n")
+        self._line += parts[0]
+        for part in parts[1:]:
+            day = self._new_day(self._line)
+            if day:
+                self.days_seen.add(day)
+                self._kept = self.generated
+            self._line = part
+
+        if criteria.days and len(self.days_seen) == len(criteria.days):
+            self.done = True
+        return self.done
+
+
+class TokenUsage:
+    """Compteurs cumulés (thread-safe) des tokens générés et des tokens conservés"""
+
+    def __init__(self):
+        self.requests = 0
+        self.generated_tokens = 0
+        self.kept_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, generated_tokens, kept_tokens):
+        with self._lock:
+            self.requests += 1
+            self.generated_tokens += generated_tokens
+            self.kept_tokens += kept_tokens
+
+    def stats(self):
+        with self._lock:
+            ratio = self.kept_tokens / self.generated_tokens if self.generated_tokens else None
+            return {
+                "requests": self.requests,
+                "generated_tokens": self.generated_tokens,
+                "kept_tokens": self.kept_tokens,
+                "kept_ratio": ratio,
+            }
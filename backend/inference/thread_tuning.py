@@ -0,0 +1,125 @@
+import json
+import os
+import platform
+import statistics
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import torch
+
+try:
+    import fcntl
+except ImportError:  # Windows: pas de verrou entre processus
+    fcntl = None
+
+
+def _cpu_model():
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+
+def host_signature(**settings):
+    """Identifie l'hôte et la configuration de service pour lesquels un profil de threads est valable"""
+    return {
+        "machine": platform.machine(),
+        "cpu": _cpu_model(),
+        "cpus": os.cpu_count(),
+        "torch": torch.__version__,
+        **settings,
+    }
+
+
+def thread_candidates(max_threads):
+    """Nombres de threads essayés: puissances de deux jusqu'à `max_threads`, et `max_threads`"""
+    candidates = {max_threads}
+    n = 1
+    while n < max_threads:
+        candidates.add(n)
+        n *= 2
+    return sorted(candidates)
+
+
+def sweep_threads(run, candidates, repeats=3):
+    """Mesure `run()` pour chaque nombre de threads intra-op de `candidates`.
+
+    Une exécution de préchauffage puis `repeats` exécutions mesurées par nombre de
+    threads; le plus rapide (médiane) reste appliqué. Retourne `(meilleur, {threads: s})`.
+    """
+    timings = {}
+    for threads in candidates:
+        torch.set_num_threads(threads)
+        run()
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            run()
+            samples.append(time.perf_counter() - start)
+        timings[threads] = statistics.median(samples)
+    best = min(timings, key=timings.get)
+    torch.set_num_threads(best)
+    return best, timings
+
+
+def set_interop_threads(threads):
+    """Fixe les threads inter-op si c'est encore possible (avant tout travail parallèle du processus)"""
+    try:
+        torch.set_num_interop_threads(threads)
+        return True
+    except RuntimeError:
+        return False
+
+
+def load_thread_profile(path, signature):
+    """Profil enregistré pour `signature` (voir `host_signature`), None s'il n'y en a pas"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            profiles = json.load(f).get("profiles", [])
+    except (OSError, ValueError):
+        return None
+    return next((profile for profile in profiles if profile.get("host") == signature), None)
+
+
+def save_thread_profile(path, signature, profile):
+    """Enregistre `profile` pour `signature`, en remplaçant le profil existant (écriture atomique)"""
+    path = Path(path)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            profiles = json.load(f).get("profiles", [])
+    except (OSError, ValueError):
+        profiles = []
+    profiles = [p for p in profiles if p.get("host") != signature] + [dict(profile, host=signature)]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"profiles": profiles}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def thread_profile_lock(path):
+    """Verrou exclusif entre processus sur le profil `path` (fichier `<path>.lock`).
+
+    Un seul worker mesure les threads de l'hôte; les autres attendent puis relisent le
+    profil enregistré. Sans verrou possible (Windows, dossier en lecture seule), ne
+    bloque pas.
+    """
+    path = Path(path)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        lock_file = open(path.with_name(f"{path.name}.lock"), "a")
+    except OSError:
+        lock_file = None
+    try:
+        if lock_file is not None and fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+    finally:
+        if lock_file is not None:
+            lock_file.close()
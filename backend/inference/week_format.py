@@ -0,0 +1,116 @@
+import re
+
+DAY_ORDER = ["lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche"]
+DAY_LABELS = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche"]
+
+_ENGLISH_DAYS = dict(zip(
+    ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"], DAY_LABELS
+))
+# Marqueurs de fin de ligne venant du modèle et noms de jours anglais, en une passe:
+# - vrais retours (\r\n) et séquence littérale "\\n" (souvent due à un double-échappement)
+# - token "/n" isolé (début du texte ou espace avant; espace ou fin du texte après)
+_NEWLINE_OR_ENGLISH_DAY = re.compile(
+    r"\r\n|\\n|(?:\A|(?<=[ \t]))/n(?=[ \t]|(?:\r\n|\\n|\n)?\Z)|" + "|".join(_ENGLISH_DAYS)
+)
+# Jour (sauf le premier) précédé d'espaces sur la même ligne: "Lundi: Rest Mardi: Run"
+_INLINE_DAY = re.compile(r"(?<=[^\n])(\s+)(" + "|".join(DAY_LABELS[1:]) + "):", re.IGNORECASE)
+_DAY_PREFIX = re.compile("|".join(DAY_ORDER))
+_CANONICAL_DAYS = {label.casefold(): label for label in DAY_LABELS}
+
+# Nettoyage du contenu d'une ligne, en une passe: "min:" -> "min ", séparateurs "/" et "\"
+# et espaces -> un espace, "5km" -> "5 km"
+_CONTENT_TOKENS = re.compile(
+    r"(?i:\bmin[\s\\/]*:[\s\\/]*)|[\s\\/]+|(?i:(\d)(km|mile|miles|min))"
+)
+_DAY_NAME_AFTER_START = re.compile("|".join(DAY_LABELS + DAY_ORDER))
+_DAY_NAMES = DAY_LABELS + DAY_ORDER
+# Contenu réduit à un temps, une distance, ou une distance sans unité suivie d'une activité
+_BARE_CONTENT = re.compile(
+    r"(\d+(?:\.\d+)?)\s*(?:(min(?:utes)?|km|miles?)|(easy run|run|long run|intervals|tempo|recovery))$",
+    re.IGNORECASE
+)
+
+
+def _replace_marker(match):
+    token = match.group()
+    return _ENGLISH_DAYS.get(token, "\n")
+
+
+def normalize_week_text(text):
+    """Normalise le texte brut du modèle: un jour par ligne, noms de jours en français"""
+    text = _NEWLINE_OR_ENGLISH_DAY.sub(_replace_marker, text.replace("<|endoftext|>", ""))
+
+    # Séparer les jours écrits sur la même ligne. Comme une substitution par jour, un
+    # jour répété juste après le même jour (seuls des retours à la ligne et un espace
+    # final entre eux) reste sur sa ligne.
+    previous_end = previous_day = None
+
+    def _split(match):
+        nonlocal previous_end, previous_day
+        spaces, day = match.groups()
+        day = _CANONICAL_DAYS.get(day.casefold(), day)
+        if match.start() == previous_end and day == previous_day and not spaces[:-1].strip("\n"):
+            return match.group()
+        previous_end, previous_day = match.end(), day
+        return "\n" + day + ":"
+
+    return _INLINE_DAY.sub(_split, text)
+
+
+def clean_content(content: str) -> str:
+    """Nettoie et normalise le contenu généré"""
+    c = content.strip()
+    if not c:
+        return "Rest"
+
+    # Couper le contenu au premier jour non complètement formé (ordre de `_DAY_NAMES`,
+    # première occurrence de chaque nom, jamais au début)
+    if _DAY_NAME_AFTER_START.search(c, 1):
+        for day in _DAY_NAMES:
+            position = c.find(day)
+            if position > 0:
+                c = c[:position].strip()
+                break
+
+    c = _CONTENT_TOKENS.sub(
+        lambda m: "min " if m.group()[0] in "mM" else " " if m.group(1) is None else f"{m.group(1)} {m.group(2)}",
+        c
+    ).strip(" -;,")
+
+    if c in {"-", "/", ""}:
+        return "Rest"
+
+    m = _BARE_CONTENT.match(c)
+    if m is None:
+        return c
+    # Seulement un temps ou une distance: ajouter "Easy Run"
+    if m.group(2) is not None:
+        return c + " Easy Run"
+    # Distance + activité sans unité: ajouter km
+    return f"{m.group(1)} km {m.group(3).title()}"
+
+
+def parse_day_line(line):
+    """Retourne `(jour, contenu nettoyé)` si la ligne commence par un jour, sinon None"""
+    m = _DAY_PREFIX.match(line.lower())
+    if m is None:
+        return None
+    # Extraire le contenu après le jour
+    content = line.split(":", 1)[1] if ":" in line else ""
+    return m.group(), clean_content(content)
+
+
+def enforce_week_structure(text, max_rest=3):
+    """Formate la réponse en structure de semaine avec sauts de ligne"""
+    day_map = {}
+    for line in normalize_week_text(text.replace("<|endoftext|>", "").strip()).split("\n"):
+        line = line.strip()
+        m = _DAY_PREFIX.match(line.lower())
+        # Première ligne de chaque jour seulement
+        if m is None or m.group() in day_map:
+            continue
+        day_map[m.group()] = clean_content(line.split(":", 1)[1] if ":" in line else "")
+        if len(day_map) == len(DAY_ORDER):
+            break
+
+    return "\n".join(f"{label}: {day_map.get(day, 'Rest')}" for day, label in zip(DAY_ORDER, DAY_LABELS))
@@ -0,0 +1,93 @@
+import torch
+
+
+class WeekGrammar:
+    """Grammaire de décodage: 7 lignes "Jour: Activité", de `day_labels[0]` au dernier jour.
+
+    Les libellés de jour sont imposés (aucun échantillonnage), le contenu d'une ligne
+    est libre mais ne peut contenir de retour à la ligne, et la génération s'arrête dès
+    que la ligne du dernier jour est fermée (retour à la ligne ou `stop_token`).
+    `start()` crée l'état d'une séquence (`WeekConstraint`).
+    """
+
+    def __init__(self, tokenizer, day_labels, vocab_size=50257, stop_token=50256,
+                 max_line_tokens=24, device="cpu"):
+        self.label_ids = [tokenizer.encode(f"{label}:") for label in day_labels]
+        self.line_break_id = tokenizer.encode("\n")[0]
+        self.stop_token = stop_token
+        self.max_line_tokens = max_line_tokens
+
+        # Tokens contenant un retour à la ligne (ex: "\n\n", ".\n"): interdits dans une ligne
+        breaks = torch.tensor(
+            [token_id != stop_token and "\n" in tokenizer.decode([token_id]) for token_id in range(vocab_size)],
+            dtype=torch.bool, device=device
+        )
+        stop = torch.zeros(vocab_size, dtype=torch.bool, device=device)
+        stop[stop_token] = True
+        close = breaks.clone()
+        close[self.line_break_id] = False
+
+        # Masques (True = interdit) indexés par (ligne non vide, dernier jour)
+        self._masks = {
+            (False, False): breaks | stop,
+            (False, True): breaks | stop,
+            (True, False): close | stop,
+            (True, True): close,
+        }
+        self._only = {}
+        for token_id in {stop_token, self.line_break_id} | {t for ids in self.label_ids for t in ids}:
+            mask = torch.ones(vocab_size, dtype=torch.bool, device=device)
+            mask[token_id] = False
+            self._only[token_id] = mask
+        self._only_close_last = self._only[self.line_break_id] & ~stop
+
+    def start(self):
+        return WeekConstraint(self)
+
+
+class WeekConstraint:
+    """État de `WeekGrammar` pour une séquence en cours de génération"""
+
+    def __init__(self, grammar):
+        self.grammar = grammar
+        self.day = 0
+        self.line_tokens = 0
+        self.pending = list(grammar.label_ids[0])
+        self.done = False
+
+    @property
+    def is_last_day(self):
+        return self.day == len(self.grammar.label_ids) - 1
+
+    def forced_tokens(self):
+        """Tokens imposés par la grammaire à partir de la position courante (libellé du jour)"""
+        return list(self.pending)
+
+    def banned_mask(self, vocab_ids=None):
+        """Masque (True = interdit) des tokens pour la prochaine position.
+
+        `vocab_ids` (voir `restrict_output_vocab`) donne l'id de chaque colonne de logits.
+        """
+        grammar = self.grammar
+        if self.pending:
+            mask = grammar._only[self.pending[0]]
+        elif self.line_tokens >= grammar.max_line_tokens:
+            mask = grammar._only_close_last if self.is_last_day else grammar._only[grammar.line_break_id]
+        else:
+            mask = grammar._masks[(self.line_tokens > 0, self.is_last_day)]
+        return mask if vocab_ids is None else mask[vocab_ids]
+
+    def advance(self, token_id):
+        """Avance l'état avec le token émis à la position courante"""
+        grammar = self.grammar
+        if self.pending:
+            self.pending.pop(0)
+        elif token_id in (grammar.line_break_id, grammar.stop_token):
+            if self.is_last_day:
+                self.done = True
+            else:
+                self.day += 1
+                self.line_tokens = 0
+                self.pending = list(grammar.label_ids[self.day])
+        else:
+            self.line_tokens += 1
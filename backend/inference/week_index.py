@@ -0,0 +1,250 @@
+import json
+import re
+import threading
+from collections import Counter, defaultdict
+
+# Champs de `build_input_text`: "Objectif: x; Niveau: x; Semaines: x; Séances/sem: x; Temps objectif: x."
+_FIELD_PATTERN = re.compile(
+    r"(objectif|niveau|semaines|séances/sem|temps objectif)\s*:\s*([^;]*?)\s*(?:;|\.?\s*$)", re.IGNORECASE
+)
+_FIELD_NAMES = {
+    "objectif": "goal",
+    "niveau": "level",
+    "semaines": "weeks",
+    "séances/sem": "sessions",
+    "temps objectif": "goal_time",
+}
+_UNKNOWN = {"", "non précisé", "unknown", "none"}
+
+# Message libre (interface de chat): objectif et niveau reconnus, dans l'ordre de test
+_GOAL_ALIASES = (
+    (r"semi[\s-]?marathon|half[\s-]?marathon|halfmarathon|(?<!\d)21([.,]1)?\s*km", "halfmarathon"),
+    (r"marathon|(?<!\d)42([.,]2)?\s*km", "marathon"),
+    (r"(?<!\d)10\s*miles?|(?<!\d)16([.,]1)?\s*km", "16.1km"),
+    (r"(?<![\d.,])10\s*k(m|ilom[eè]tres?)?\b", "10km"),
+    (r"(?<![\d.,])5\s*k(m|ilom[eè]tres?)?\b", "5km"),
+    (r"\b(1\s*)?mile\b|(?<!\d)1[.,]6\s*km", "1.6km"),
+    (r"forme|fitness", "general fitness"),
+)
+_LEVEL_ALIASES = (
+    (r"d[ée]butant|beginner|novice", "beginner"),
+    (r"interm[ée]diaire|intermediate", "intermediate"),
+    (r"avanc[ée]|confirm[ée]|expert|advanced", "advanced"),
+    (r"entretien|maintenance", "maintenance"),
+    (r"g[ée]n[ée]ral", "general"),
+)
+_WEEKS_PATTERN = re.compile(r"(\d{1,2})\s*(?:semaines|semaine|sem\b|weeks?)", re.IGNORECASE)
+_WEEK_PATTERN = re.compile(r"(?<!par )(?<!per )\b(?:semaine|week)\s+(?:n°\s*)?(\d{1,2})\b", re.IGNORECASE)
+_SESSIONS_PATTERN = re.compile(
+    r"(\d)\s*(?:séances?|seances?|sessions?|sorties?|entra[iî]nements?|runs?|jours?|days?|fois)", re.IGNORECASE
+)
+_TIME_PATTERN = re.compile(r"(\d{1,2})\s*h(?:eures?)?\s*(\d{1,2})?|(\d{1,3})\s*(?:min(?:utes)?|m)\b", re.IGNORECASE)
+
+
+def _normalize_feature(value):
+    value = " ".join(str(value).split()).lower() if value is not None else ""
+    return None if value in _UNKNOWN else value
+
+
+def make_week_key(goal, level, weeks, sessions, goal_time=None, week=1):
+    """Clé d'index: caractéristiques normalisées (casse, espaces, "Non précisé" -> None) + semaine"""
+    return (
+        _normalize_feature(goal), _normalize_feature(level), _normalize_feature(weeks),
+        _normalize_feature(sessions), _normalize_feature(goal_time), int(week),
+    )
+
+
+def parse_input_features(text):
+    """Caractéristiques d'un texte au format de `build_input_text`, None si un champ manque"""
+    features = {}
+    for label, value in _FIELD_PATTERN.findall(text):
+        features[_FIELD_NAMES[label.lower()]] = value.rstrip(".")
+    if set(features) != set(_FIELD_NAMES.values()):
+        return None
+    return features
+
+
+def goal_time_minutes(value):
+    """Temps objectif en minutes ("3h30m", "3 h 30", "45 min"), None s'il n'est pas précisé"""
+    match = _TIME_PATTERN.search(value or "")
+    if match is None:
+        return None
+    hours, minutes, only_minutes = match.groups()
+    if hours is not None:
+        return int(hours) * 60 + int(minutes or 0)
+    return int(only_minutes)
+
+
+def _format_goal_time(minutes):
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes}m" if hours and minutes else f"{hours}h" if hours else f"{minutes}m"
+
+
+def parse_message_features(text):
+    """Caractéristiques d'un message libre ("semi-marathon en 16 semaines, 4 séances, 1h45").
+
+    Retourne `(caractéristiques, semaine)` ou None sans objectif reconnu. Les champs non
+    mentionnés valent None, la semaine (ex: "semaine 3") aussi.
+    """
+    lowered = text.lower()
+    goal = next((goal for pattern, goal in _GOAL_ALIASES if re.search(pattern, lowered)), None)
+    if goal is None:
+        return None
+    level = next((level for pattern, level in _LEVEL_ALIASES if re.search(pattern, lowered)), None)
+    week = _WEEK_PATTERN.search(lowered)
+    # Le numéro de semaine n'est ni une durée de programme ni un temps objectif
+    rest = lowered[:week.start()] + lowered[week.end():] if week else lowered
+    weeks = _WEEKS_PATTERN.search(rest)
+    sessions = _SESSIONS_PATTERN.search(rest)
+    rest = _WEEKS_PATTERN.sub(" ", _SESSIONS_PATTERN.sub(" ", re.sub(r"\d+([.,]\d+)?\s*(km|k|miles?)\b", " ", rest)))
+    minutes = goal_time_minutes(rest)
+    features = {
+        "goal": goal,
+        "level": level,
+        "weeks": weeks.group(1) if weeks else None,
+        "sessions": sessions.group(1) if sessions else None,
+        "goal_time": _format_goal_time(minutes) if minutes else None,
+    }
+    return features, int(week.group(1)) if week else None
+
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class WeekIndex:
+    """Index des semaines du dataset d'entraînement, par caractéristiques du programme.
+
+    Clé: `make_week_key` (objectif, niveau, semaines, séances, temps objectif, numéro
+    de semaine) tirée du champ `input` et de `metadata.week`. Plusieurs programmes
+    peuvent partager une clé: les sorties distinctes sont rangées de la plus fréquente
+    à la moins fréquente; `seed` choisit parmi elles. `postprocess` (ex:
+    `enforce_week_structure`) est appliqué une fois à la construction.
+
+    `lookup` cherche d'abord la clé exacte, puis la semaine la plus proche du même
+    objectif (`max_distance` > 0): niveau, séances, temps objectif et position de la
+    semaine dans le programme sont comparés (voir `distance`); au-delà de
+    `max_distance`, la combinaison est jugée nouvelle et laissée au modèle.
+    Compteurs thread-safe des recherches trouvées (dont par plus proche voisin) et
+    manquées: `stats()`.
+    """
+
+    def __init__(self, entries, postprocess=None, max_distance=1.5):
+        outputs = defaultdict(Counter)
+        for entry in entries:
+            features = parse_input_features(entry.get("input", ""))
+            week = (entry.get("metadata") or {}).get("week")
+            if features is None or week is None or not entry.get("output"):
+                continue
+            outputs[make_week_key(week=week, **features)][entry["output"]] += 1
+        self.table = {
+            key: [postprocess(text) if postprocess else text for text, _ in counts.most_common()]
+            for key, counts in outputs.items()
+        }
+        self.max_distance = max_distance
+        # Clés par objectif, avec leurs caractéristiques numériques (plus proche voisin)
+        self._by_goal = defaultdict(list)
+        for key in self.table:
+            goal, level, weeks, sessions, goal_time, week = key
+            self._by_goal[goal].append((key, level, _as_int(weeks), _as_int(sessions), goal_time_minutes(goal_time), week))
+        self.hits = 0
+        self.nearest_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dataset(cls, dataset_path, postprocess=None, max_distance=1.5):
+        with open(dataset_path, "r", encoding="utf-8") as f:
+            return cls(json.load(f).get("training_data", []), postprocess=postprocess, max_distance=max_distance)
+
+    def get(self, key, seed=None):
+        """Semaine indexée pour `key` (voir `make_week_key`), None pour une combinaison inconnue"""
+        candidates = self.table.get(key)
+        with self._lock:
+            if candidates is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return candidates[(seed or 0) % len(candidates)]
+
+    @staticmethod
+    def distance(features, week, candidate):
+        """Écart entre une demande (caractéristiques normalisées, semaine) et une clé indexée.
+
+        +1 par niveau différent, +0.5 par séance d'écart, +1 par heure d'écart de temps
+        objectif, +2 par écart de position dans le programme (0 = première semaine,
+        1 = dernière) et +1 par 8 semaines d'écart de durée. Un champ non précisé dans la
+        demande n'est pas comparé.
+        """
+        _, level, weeks, sessions, minutes, candidate_week = candidate
+        d = 0.0
+        if features["level"] is not None and features["level"] != level:
+            d += 1
+        if features["sessions"] is not None and sessions is not None:
+            d += abs(features["sessions"] - sessions) * 0.5
+        if features["minutes"] is not None:
+            d += abs(features["minutes"] - minutes) / 60 if minutes is not None else 0.5
+        if features["weeks"] is not None and weeks is not None:
+            position = (week - 1) / max(features["weeks"] - 1, 1)
+            d += abs(position - (candidate_week - 1) / max(weeks - 1, 1)) * 2
+            d += abs(features["weeks"] - weeks) / 8
+        else:
+            d += abs(week - candidate_week) / 2
+        return d
+
+    def nearest(self, goal, level=None, weeks=None, sessions=None, goal_time=None, week=1):
+        """Clé indexée la plus proche (même objectif, voir `distance`), None au-delà de `max_distance`"""
+        goal, level, weeks, sessions, goal_time, week = make_week_key(goal, level, weeks, sessions, goal_time, week)
+        features = {
+            "level": level, "weeks": _as_int(weeks), "sessions": _as_int(sessions),
+            "minutes": goal_time_minutes(goal_time),
+        }
+        best, best_distance = None, self.max_distance
+        for candidate in self._by_goal.get(goal, ()):
+            d = self.distance(features, week, candidate)
+            if d <= best_distance:
+                best, best_distance = candidate[0], d
+        return best
+
+    def lookup(self, features, week=1, seed=None):
+        """Semaine pour `features` (champs de `make_week_key`): clé exacte, sinon la plus proche"""
+        key = make_week_key(week=week, **features)
+        candidates = self.table.get(key)
+        nearest = candidates is None and self.max_distance > 0
+        if nearest:
+            key = self.nearest(week=week, **features)
+            candidates = self.table.get(key) if key is not None else None
+        with self._lock:
+            if candidates is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.nearest_hits += nearest
+        return candidates[(seed or 0) % len(candidates)]
+
+    def lookup_message(self, message, week=1, seed=None):
+        """Semaine `week` pour un message au format `input` du dataset, ou libre (voir
+        `parse_message_features`; une semaine citée dans le message l'emporte)"""
+        features = parse_input_features(message)
+        if features is None:
+            parsed = parse_message_features(message)
+            if parsed is None:
+                with self._lock:
+                    self.misses += 1
+                return None
+            features, week = parsed[0], parsed[1] or week
+        return self.lookup(features, week, seed)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "keys": len(self.table),
+                "hits": self.hits,
+                "nearest_hits": self.nearest_hits,
+                "misses": self.misses,
+                "coverage": self.hits / lookups if lookups else None,
+            }
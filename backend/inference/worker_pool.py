@@ -0,0 +1,141 @@
+import math
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+_END = object()
+
+
+class QueueFullError(Exception):
+    """File d'inférence pleine: la requête est rejetée (HTTP 429)"""
+
+    def __init__(self, retry_after):
+        super().__init__("File d'inférence pleine, réessayer plus tard")
+        self.retry_after = retry_after
+
+
+class InferencePool:
+    """Threads dédiés à l'inférence, découplés des threads HTTP.
+
+    Les handlers déposent des jobs dans une file bornée à `max_queue` jobs en attente
+    (au-delà, `QueueFullError`); `num_workers` threads les exécutent dans l'ordre.
+    Compteurs exposés par `stats()`: longueur de file, attente, rejets, délais dépassés.
+    """
+
+    def __init__(self, num_workers=2, max_queue=32):
+        self.num_workers = num_workers
+        self.max_queue = max_queue
+        self.busy = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.wait_total_s = 0.0
+        self.wait_max_s = 0.0
+        self.service_total_s = 0.0
+        self.completed = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"inference-{i}", daemon=True) for i in range(num_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def retry_after(self):
+        """Estimation (secondes, arrondie au-dessus) du délai avant qu'une place se libère"""
+        with self._lock:
+            service_s = self.service_total_s / self.completed if self.completed else 1.0
+        return max(1, math.ceil(service_s * (self._queue.qsize() + 1) / self.num_workers))
+
+    def submit(self, fn, *args, **kwargs):
+        """Ajoute `fn(*args, **kwargs)` à la file; retourne un `Future` de son résultat."""
+        future = Future()
+        try:
+            self._queue.put_nowait((time.monotonic(), future, fn, args, kwargs))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise QueueFullError(self.retry_after()) from None
+        with self._lock:
+            self.submitted += 1
+        return future
+
+    def submit_stream(self, make_iter, timeout=None):
+        """Consomme l'itérateur `make_iter()` dans un worker; retourne un itérateur côté appelant.
+
+        Lève `QueueFullError` comme `submit`. L'itérateur renvoyé lève `TimeoutError`
+        au-delà de `timeout` secondes au total; la génération est alors interrompue à
+        l'élément suivant, comme lorsque l'appelant abandonne l'itération.
+        """
+        channel = queue.Queue()
+        cancel = threading.Event()
+
+        def pump():
+            try:
+                for item in make_iter():
+                    if cancel.is_set():
+                        return
+                    channel.put(item)
+            except Exception as e:
+                channel.put(e)
+            finally:
+                channel.put(_END)
+
+        future = self.submit(pump)
+        return self._drain(channel, cancel, future, timeout)
+
+    def _drain(self, channel, cancel, future, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while True:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = channel.get(timeout=remaining)
+                except queue.Empty:
+                    with self._lock:
+                        self.timeouts += 1
+                    raise TimeoutError(f"Délai de génération dépassé ({timeout} s)") from None
+                if item is _END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            cancel.set()
+            future.cancel()
+
+    def _run(self):
+        while True:
+            enqueued, future, fn, args, kwargs = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            start = time.monotonic()
+            with self._lock:
+                self.busy += 1
+                self.wait_total_s += start - enqueued
+                self.wait_max_s = max(self.wait_max_s, start - enqueued)
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self.busy -= 1
+                    self.completed += 1
+                    self.service_total_s += time.monotonic() - start
+
+    def stats(self):
+        with self._lock:
+            started = self.completed + self.busy
+            return {
+                "workers": self.num_workers,
+                "busy": self.busy,
+                "queue_length": self._queue.qsize(),
+                "max_queue": self.max_queue,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "avg_wait_s": self.wait_total_s / started if started else 0.0,
+                "max_wait_s": self.wait_max_s,
+            }
@@ -0,0 +1,118 @@
+import re
+from functools import lru_cache
+
+# Libellés canoniques des séances, par priorité (le premier trouvé l'emporte): mêmes
+# motifs que CANONICAL_ACTIVITY_PATTERNS (src/csv_to_json/clean_training_text.py), qui a
+# produit les sorties d'entraînement. Copiés ici: l'image du backend n'inclut pas src/.
+ACTIVITY_PATTERNS = [
+    (r"\blong\s*run\b", "Long Run"),
+    (r"\bmarathon\s*pace\b", "Marathon Pace"),
+    (r"\btempo\b|\bthreshold\b", "Tempo Run"),
+    (r"\bintervals?\b|\brepeats?\b|\brepetition\b|\brépétition\b|\btrack\b|\bfartlek\b", "Intervals"),
+    (r"\bhills?\b|\buphill\b|\buphills\b", "Hills"),
+    (r"\bstrides?\b", "Strides"),
+    (r"\bcross-?train\b|\bcross\s*training\b", "Cross-Train"),
+    (r"\brecovery\b", "Recovery Run"),
+    (r"\brun\b", "Run"),
+]
+REST = "Rest"
+# Séance sans libellé reconnu (ex: "Easy", "30 à 45 minutes easy or Off")
+OTHER = "Other"
+KM_PER_MILE = 1.609344
+
+# Un groupe par libellé: une seule recherche, puis le libellé de plus haute priorité
+_ACTIVITY = re.compile("|".join(f"({pattern})" for pattern, _ in ACTIVITY_PATTERNS), re.IGNORECASE)
+_REST = re.compile(r"(?:rest|rest day|day off|off|repos)", re.IGNORECASE)
+_NUMBER = r"\d+(?:[.,]\d+)?"
+# Quantités d'une ligne, en une passe (la première de chaque sorte est retenue):
+# séries "6 x 400m", distances "8-10 km", durées "30 à 45 minutes", répétitions "4 à 6 fois"
+_QUANTITIES = re.compile(
+    rf"(?P<sets>\d+)\s*[x×]\s*(?P<set_len>{_NUMBER})\s*(?P<set_unit>km|m|miles?|mi|min(?:utes?)?)\b"
+    rf"|(?P<dist>{_NUMBER})(?:\s*[-–]\s*(?P<dist_to>{_NUMBER}))?\s*(?P<dist_unit>km|kilometers|kilometres|miles?|mi)\b"
+    rf"|(?P<dur>{_NUMBER})(?:\s*(?:à|-|–)\s*(?P<dur_to>{_NUMBER}))?\s*(?:minutes?|mins?|mn)\b"
+    r"|(?P<reps>\d+)(?:\s*(?:à|-|–)\s*(?P<reps_to>\d+))?\s*(?:fois|reps?|répétitions?|repetitions?)\b"
+    r"|(?:répétitions?|repetitions?)\s*:\s*(?P<reps_n>\d+)(?:\s*[-–]\s*(?P<reps_n_to>\d+))?",
+    re.IGNORECASE
+)
+
+
+def _value(low, high=None):
+    """Valeur d'une quantité, milieu de l'intervalle pour "8-10" ou "30 à 45" """
+    low = float(low.replace(",", "."))
+    return low if high is None else (low + float(high.replace(",", "."))) / 2
+
+
+def _km(value, unit):
+    unit = unit.lower()
+    if unit == "m":
+        return value / 1000
+    return value * KM_PER_MILE if unit.startswith("mi") else value
+
+
+def parse_workout(content):
+    """Champs d'une séance ("8-10 km Easy Run"): activité, distance (km), durée (min), répétitions.
+
+    La première quantité de chaque sorte est retenue. Un intervalle donne sa valeur
+    médiane; une série "6 x 400m" donne 6 répétitions et 2.4 km ("4 x 5 min": 20 min).
+    """
+    content = content.strip()
+    if not content or _REST.fullmatch(content):
+        return {"activity": REST, "distance_km": None, "duration_min": None, "reps": None}
+
+    groups = [m.lastindex for m in _ACTIVITY.finditer(content)]
+    found = {}
+    for m in _QUANTITIES.finditer(content):
+        if m.group("sets") is not None:
+            sets, length = int(m.group("sets")), _value(m.group("set_len"))
+            found.setdefault("reps", sets)
+            if m.group("set_unit").lower().startswith("min"):
+                found.setdefault("duration_min", sets * length)
+            else:
+                found.setdefault("distance_km", sets * _km(length, m.group("set_unit")))
+        elif m.group("dist") is not None:
+            found.setdefault("distance_km", _km(_value(m.group("dist"), m.group("dist_to")), m.group("dist_unit")))
+        elif m.group("dur") is not None:
+            found.setdefault("duration_min", _value(m.group("dur"), m.group("dur_to")))
+        elif m.group("reps") is not None:
+            found.setdefault("reps", round(_value(m.group("reps"), m.group("reps_to"))))
+        else:
+            found.setdefault("reps", round(_value(m.group("reps_n"), m.group("reps_n_to"))))
+    distance_km = found.get("distance_km")
+    duration_min = found.get("duration_min")
+    return {
+        "activity": ACTIVITY_PATTERNS[min(groups) - 1][1] if groups else OTHER,
+        "distance_km": round(distance_km, 2) if distance_km is not None else None,
+        "duration_min": round(duration_min, 2) if duration_min is not None else None,
+        "reps": found.get("reps"),
+    }
+
+
+@lru_cache(maxsize=2048)
+def parse_week(week_text):
+    """Semaine "Jour: Activité" (sortie de `enforce_week_structure`) en champs structurés.
+
+    Retourne `{"days": [...], "totals": {...}}`: par jour le libellé, le texte et les
+    champs de `parse_workout`; pour la semaine le total des km et des minutes, le nombre
+    de séances et de jours de repos, et les séances par activité. Mis en cache par
+    texte: le résultat est partagé, ne pas le modifier.
+    """
+    days = []
+    for line in week_text.split("\n"):
+        day, _, content = line.partition(":")
+        if not content:
+            continue
+        content = content.strip()
+        days.append(dict(day=day.strip(), text=content, **parse_workout(content)))
+
+    sessions = [d for d in days if d["activity"] != REST]
+    activities = {}
+    for d in sessions:
+        activities[d["activity"]] = activities.get(d["activity"], 0) + 1
+    totals = {
+        "total_km": round(sum((d["distance_km"] or 0 for d in sessions), 0.0), 2),
+        "total_min": round(sum((d["duration_min"] or 0 for d in sessions), 0.0), 2),
+        "sessions": len(sessions),
+        "rest_days": len(days) - len(sessions),
+        "activities": activities,
+    }
+    return {"days": days, "totals": totals}
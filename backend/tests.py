@@ -0,0 +1,798 @@
+# File for internal use (unit tests)
+#
+# Lancer depuis backend/: python -m pytest tests.py
+
+import json
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+import torch
+
+from app import (
+    DAY_LABELS, build_plan_input, build_week_instruction, generate_with_sampling, iter_plan_weeks, stream_week
+)
+from inference import (
+    AdmissionControl,
+    CausalGPT,
+    InferencePool,
+    MetricsRegistry,
+    ModelRouter,
+    ModelVariant,
+    NgramDraft,
+    QueueFullError,
+    RateLimitError,
+    ResponseCache,
+    SimpleGPT,
+    SingleFlight,
+    StopCriteria,
+    TokenTimer,
+    WeekGrammar,
+    ACTIVITY_PATTERNS,
+    WeekIndex,
+    apply_repetition_penalty,
+    clean_content,
+    convert_simple_gpt_state_dict,
+    enforce_week_structure,
+    export_safetensors,
+    generate_batch,
+    host_signature,
+    iter_generate_batch,
+    load_state_dict_file,
+    load_thread_profile,
+    make_week_key,
+    parse_message_features,
+    parse_week,
+    parse_workout,
+    quantize_dynamic_int8,
+    resolve_checkpoint,
+    restrict_output_vocab,
+    sample_top_k,
+    save_thread_profile,
+    sweep_threads,
+    thread_candidates,
+    thread_profile_lock,
+    verify_draft_token,
+)
+
+
+def _small_model():
+    torch.manual_seed(123)
+    model = SimpleGPT(vocab_size=100, embedding_dim=32, n_layers=2, n_heads=4, context_length=64)
+    return model.eval()
+
+
+def test_kv_cache_incremental_matches_full_recompute():
+    model = _small_model()
+    input_ids = torch.randint(0, 100, (1, 20))
+
+    with torch.no_grad():
+        full_logits = model(input_ids, causal=True)
+        logits, past_key_values = model.forward_cached(input_ids[:, :8])
+        step_logits = [logits]
+        for i in range(8, input_ids.size(1)):
+            logits, past_key_values = model.forward_cached(input_ids[:, i:i + 1], past_key_values)
+            step_logits.append(logits)
+
+    torch.testing.assert_close(torch.cat(step_logits, dim=1), full_logits, rtol=1e-4, atol=1e-4)
+    assert past_key_values[0][0].size(2) == input_ids.size(1)
+
+
+def test_generate_with_cache_stops_on_stop_token():
+    model = _small_model()
+    prompt_ids = torch.randint(0, 100, (1, 6))
+
+    torch.manual_seed(0)
+    output_ids = generate_with_sampling(
+        model, prompt_ids, None, "cpu", max_tokens=30, top_k=1, stop_token=-1, use_cache=True
+    )
+
+    assert output_ids.shape == (1, 36)
+    assert torch.equal(output_ids[:, :6], prompt_ids)
+
+
+def test_generate_batch_matches_single_generation():
+    model = _small_model()
+    prompts = [[5, 6, 7], [1, 2, 3, 4, 5, 6, 7, 8], [9, 10, 11, 12, 13]]
+
+    for use_cache in (False, True):
+        outputs = generate_batch(model, prompts, "cpu", max_tokens=10, top_k=1, stop_token=-1, use_cache=use_cache)
+        for prompt, output_ids in zip(prompts, outputs):
+            expected = generate_with_sampling(
+                model, torch.tensor([prompt]), None, "cpu", max_tokens=10, top_k=1, stop_token=-1,
+                use_cache=use_cache
+            )
+            assert torch.equal(output_ids, expected)
+
+
+class _PieceTokenizer:
+    """Tokenizer factice: chaque id est l'index d'un morceau de texte."""
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+
+    def encode(self, text):
+        return [self.pieces.index(text)]
+
+    def decode(self, ids):
+        return "".join(self.pieces[i] for i in ids)
+
+
+class _ByteTokenizer:
+    """Tokenizer factice des tests d'API: un id par octet UTF-8."""
+
+    def encode(self, text, **kwargs):
+        return list(text.encode("utf-8"))
+
+    def decode(self, ids):
+        return bytes(i for i in ids if i < 256).decode("utf-8", errors="ignore")
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """Module `app` servant un petit modèle, avec file, caches et admission propres au test"""
+    import app as backend
+
+    torch.manual_seed(123)
+    model = SimpleGPT(vocab_size=256, embedding_dim=16, n_layers=1, n_heads=2, context_length=1024).eval()
+    router = ModelRouter()
+    router.add(ModelVariant("a", "test.pth", model), weight=1.0)
+    for name, value in {
+        "model": model, "tokenizer": _ByteTokenizer(), "model_router": router,
+        "inference_pool": InferencePool(num_workers=1, max_queue=4), "response_cache": ResponseCache(),
+        "single_flight": SingleFlight(), "admission_control": AdmissionControl(tokens_per_s=0, max_concurrent=0),
+        "prompt_prefix": None, "week_grammar": None, "stop_criteria": None, "speculative_draft": None,
+        "week_index": None,
+    }.items():
+        monkeypatch.setattr(backend, name, value)
+    return backend
+
+
+def test_stream_week_emits_days_as_lines_close():
+    pieces = ["### Response:\n", "Lundi: Rest", "\n", "Mardi: 5", "km", " Run", " Mercredi: Tempo", "<|endoftext|>"]
+    tokenizer = _PieceTokenizer(pieces)
+    events = list(stream_week(iter(range(1, 8)), torch.tensor([[0]]), tokenizer, stop_token=7))
+
+    kinds = [kind for kind, _ in events]
+    days = [payload["line"] for kind, payload in events if kind == "day"]
+    assert days == ["Lundi: Rest", "Mardi: 5 km Run", "Mercredi: Tempo"]
+    # "Lundi" est émis dès le retour à la ligne, avant la fin de la génération
+    assert kinds[:3] == ["token", "token", "day"]
+    assert kinds[-1] == "week"
+    assert events[-1][1]["bot_response"].startswith("Lundi: Rest\nMardi: 5 km Run\nMercredi: Tempo\n")
+
+
+def test_response_cache_lru_ttl_and_normalized_key():
+    cache = ResponseCache(max_size=2, ttl_s=60)
+    sampling = {"top_k": 50, "temperature": 0.7}
+    key = ResponseCache.make_key("  Marathon   Débutant ", sampling)
+
+    assert cache.get(key) is None
+    cache.put(key, {"bot_response": "Lundi: Rest"})
+    assert cache.get(ResponseCache.make_key("marathon débutant", sampling)) == {"bot_response": "Lundi: Rest"}
+    assert cache.get(ResponseCache.make_key("marathon débutant", sampling, seed=1)) is None
+
+    cache.put("b", 1)
+    cache.put("c", 2)  # évince la clé la moins récemment utilisée
+    assert cache.get(key) is None
+    assert cache.stats() == {"hits": 1, "misses": 3, "size": 2}
+
+    cache.ttl_s = -1
+    assert cache.get("c") is None
+
+
+def test_generate_with_seed_is_reproducible():
+    model = _small_model()
+    prompt_ids = torch.randint(0, 100, (1, 6))
+
+    first = generate_with_sampling(model, prompt_ids, None, "cpu", max_tokens=15, stop_token=-1, seed=7)
+    second = generate_with_sampling(model, prompt_ids, None, "cpu", max_tokens=15, stop_token=-1, seed=7)
+    assert torch.equal(first, second)
+
+
+def test_generate_from_prefix_state_matches_full_prefill():
+    model = _small_model()
+    prompt_ids = torch.randint(0, 100, (1, 16))
+    with torch.no_grad():
+        _, prefix_past = model.forward_cached(prompt_ids[:, :10])
+
+    expected = generate_with_sampling(model, prompt_ids, None, "cpu", max_tokens=12, top_k=1, stop_token=-1, use_cache=True)
+    output_ids = generate_with_sampling(
+        model, prompt_ids, None, "cpu", max_tokens=12, top_k=1, stop_token=-1, use_cache=True,
+        past_key_values=prefix_past
+    )
+    assert torch.equal(output_ids, expected)
+
+
+def test_causal_gpt_loads_converted_weights_and_matches_causal_simple_gpt():
+    simple = _small_model()
+    causal = CausalGPT(vocab_size=100, embedding_dim=32, n_layers=2, n_heads=4, context_length=64).eval()
+    causal.load_state_dict(convert_simple_gpt_state_dict(simple.state_dict()))
+    input_ids = torch.randint(0, 100, (1, 20))
+
+    with torch.no_grad():
+        expected = simple(input_ids, causal=True)
+        torch.testing.assert_close(causal(input_ids), expected, rtol=1e-4, atol=1e-4)
+
+        logits, past_key_values = causal.forward_cached(input_ids[:, :8])
+        step_logits = [logits]
+        for i in range(8, input_ids.size(1)):
+            logits, past_key_values = causal.forward_cached(input_ids[:, i:i + 1], past_key_values)
+            step_logits.append(logits)
+    torch.testing.assert_close(torch.cat(step_logits, dim=1), expected, rtol=1e-4, atol=1e-4)
+
+    prompts = [[5, 6, 7], [1, 2, 3, 4, 5, 6, 7, 8]]
+    for output_ids, prompt in zip(generate_batch(causal, prompts, "cpu", max_tokens=8, top_k=1, stop_token=-1), prompts):
+        expected_ids = generate_with_sampling(causal, torch.tensor([prompt]), None, "cpu", max_tokens=8, top_k=1, stop_token=-1)
+        assert torch.equal(output_ids, expected_ids)
+
+
+def test_quantize_dynamic_int8_keeps_encoder_fast_path_usable():
+    model = _small_model()
+    quantized = quantize_dynamic_int8(model)
+    input_ids = torch.randint(0, 100, (1, 10))
+
+    assert isinstance(quantized.transformer.layers[0].linear1, torch.nn.Linear)
+    assert not isinstance(quantized.output_layer, torch.nn.Linear)
+    with torch.no_grad():
+        torch.testing.assert_close(quantized(input_ids), model(input_ids), rtol=0.1, atol=0.1)
+        quantized.forward_cached(input_ids)
+
+
+def test_restricted_vocab_head_slices_logits_and_maps_ids_back():
+    model = _small_model()
+    restricted = restrict_output_vocab(_small_model(), [3, 10, 42, 57, 99])
+    input_ids = torch.randint(0, 100, (1, 8))
+
+    with torch.no_grad():
+        torch.testing.assert_close(restricted(input_ids), model(input_ids)[..., restricted.vocab_ids])
+
+    output_ids = generate_with_sampling(restricted, input_ids, None, "cpu", max_tokens=10, stop_token=-1, seed=0)
+    assert set(output_ids[0, 8:].tolist()) <= {3, 10, 42, 57, 99}
+
+    prompts = [[5, 6, 7], [1, 2, 3, 4, 5, 6, 7, 8]]
+    for output_ids, prompt in zip(generate_batch(restricted, prompts, "cpu", max_tokens=8, top_k=1, stop_token=-1), prompts):
+        expected = generate_with_sampling(restricted, torch.tensor([prompt]), None, "cpu", max_tokens=8, top_k=1, stop_token=-1)
+        assert torch.equal(output_ids, expected)
+
+
+def test_week_grammar_forces_seven_day_lines_and_stops_after_sunday():
+    pieces = ["<|endoftext|>", "\n", "\n\n", " Rest", " 5", " km", " Run"] + [f"{label}:" for label in DAY_LABELS]
+    pieces += [f" w{i}" for i in range(100 - len(pieces))]
+    tokenizer = _PieceTokenizer(pieces)
+    grammar = WeekGrammar(tokenizer, DAY_LABELS, vocab_size=100, stop_token=0, max_line_tokens=4)
+    model = _small_model()
+    prompt_ids = torch.randint(0, 100, (1, 8))
+
+    output_ids = generate_with_sampling(model, prompt_ids, None, "cpu", stop_token=0, seed=0, grammar=grammar)
+    lines = tokenizer.decode(output_ids[0, 8:].tolist()).replace("<|endoftext|>", "").strip().split("\n")
+    assert [line.split(":")[0] for line in lines] == DAY_LABELS
+    assert all(1 <= len(line.split(":")[1].split()) <= 4 for line in lines)
+    assert output_ids.size(1) - 8 <= 7 * (1 + 4 + 1)
+
+    prompts = [[5, 6, 7], [1, 2, 3, 4, 5, 6, 7, 8]]
+    timers = [TokenTimer(0.0) for _ in prompts]
+    outputs = generate_batch(model, prompts, "cpu", timers=timers, top_k=1, stop_token=0, grammar=grammar)
+    for output_ids, prompt, batch_timer in zip(outputs, prompts, timers):
+        timer = TokenTimer(0.0)
+        expected = generate_with_sampling(
+            model, torch.tensor([prompt]), None, "cpu", top_k=1, stop_token=0, grammar=grammar, timer=timer
+        )
+        assert torch.equal(output_ids, expected)
+        # Les 7 libellés de jour imposés ne sont pas chronométrés
+        assert timer.count == batch_timer.count == output_ids.size(1) - len(prompt) - 7
+
+
+def test_stop_criteria_stop_strings_complete_week_and_kept_tokens():
+    pieces = ["<|endoftext|>", "\n", " Rest", "###", "Lundi: 5 km", " Run"] + [f"{label}:" for label in DAY_LABELS[1:]]
+    tokenizer = _PieceTokenizer(pieces)
+    week = [4, 5, 1, 6, 2, 1, 6, 2, 1] + [i for i in range(7, 12) for i in (i, 2, 1)]
+
+    criteria = StopCriteria(tokenizer, ["###"], day_labels=DAY_LABELS, stop_token=0)
+    state = criteria.start()
+    assert [state.update(token_id) for token_id in week].index(True) == len(week) - 1
+    assert state.kept_tokens == len(week)
+    # Lignes répétées ("Mardi" deux fois) et texte après la semaine: non conservés
+    assert criteria.kept_tokens([4, 5, 1, 6, 2, 1, 6, 2, 1, 7, 2, 1, 3, 2, 0, 2]) == 12
+    assert criteria.start().update(3)
+
+    model = _small_model()
+    prompt_ids = torch.randint(0, 100, (1, 8))
+    tokenizer = _PieceTokenizer([f" w{i}" for i in range(100)])
+    first = generate_with_sampling(model, prompt_ids, None, "cpu", max_tokens=1, top_k=1)[0, -1].item()
+    stopping = StopCriteria(tokenizer, [f" w{first}"])
+    assert generate_with_sampling(model, prompt_ids, None, "cpu", top_k=1, stopping=stopping).size(1) == 9
+
+
+def test_plan_prompts_match_dataset_format_and_batch_yields_each_week_once():
+    assert build_week_instruction(6, 20, "marathon", "general", 4) == (
+        "Generate a complete week (6) of a 20-week marathon running program. Training level: general, "
+        "4 training days per week. Format attendu: 7 lignes, une par jour, de Lundi à Dimanche, "
+        "au format 'Jour: Activité'."
+    )
+    assert build_plan_input("marathon", "general", 20, 4) == (
+        "Objectif: marathon; Niveau: general; Semaines: 20; Séances/sem: 4; Temps objectif: Non précisé."
+    )
+
+    model = _small_model()
+    prompts = [[1, 2, 3], [4, 5, 6, 7, 8], [9, 10], [11, 12, 13, 14]]
+    finished = list(iter_generate_batch(model, prompts, "cpu", max_tokens=12, stop_token=0, seed=3))
+    assert sorted(row for row, _ in finished) == [0, 1, 2, 3]
+    again = generate_batch(model, prompts, "cpu", max_tokens=12, stop_token=0, seed=3)
+    for row, output_ids in finished:
+        assert torch.equal(output_ids, again[row])
+        assert output_ids[0, :len(prompts[row])].tolist() == prompts[row]
+
+
+def test_inference_pool_bounded_queue_timeout_and_stats():
+    pool = InferencePool(num_workers=1, max_queue=1)
+    release = threading.Event()
+    blocking = pool.submit(release.wait)
+    while pool.stats()["busy"] == 0:
+        pass
+    queued = pool.submit(lambda: "ok")
+    with pytest.raises(QueueFullError) as excinfo:
+        pool.submit(lambda: "refusé")
+    assert excinfo.value.retry_after >= 1
+
+    release.set()
+    assert blocking.result(timeout=5) and queued.result(timeout=5) == "ok"
+    assert list(pool.submit_stream(lambda: iter(range(3)), timeout=5)) == [0, 1, 2]
+
+    stalled = threading.Event()
+    with pytest.raises(TimeoutError):
+        list(pool.submit_stream(lambda: (stalled.wait() for _ in range(3)), timeout=0.05))
+    stalled.set()
+
+    stats = pool.stats()
+    assert stats["rejected"] == 1 and stats["timeouts"] == 1 and stats["max_wait_s"] > 0
+
+
+def test_api_rejects_a_body_that_is_not_a_json_object_with_400(api):
+    client = api.app.test_client()
+    for url in ("/api/chat", "/api/chat/stream", "/api/plan", "/api/plan/stream"):
+        for kwargs in ({"data": "bonjour", "content_type": "text/plain"}, {"json": ["bonjour"]}, {}):
+            response = client.post(url, **kwargs)
+            assert response.status_code == 400, (url, kwargs)
+            assert "objet JSON" in response.get_json()["error"]
+    for url in ("/api/chat", "/api/chat/stream"):
+        response = client.post(url, json={"message": 42})
+        assert response.status_code == 400 and "message" in response.get_json()["error"]
+
+
+def test_api_returns_429_when_inference_queue_is_full_and_504_on_timeout(api, monkeypatch):
+    pool = InferencePool(num_workers=1, max_queue=1)
+    monkeypatch.setattr(api, "inference_pool", pool)
+    client = api.app.test_client()
+    plan = {"goal": "marathon", "level": "general", "weeks": 2, "sessions": 4, "max_tokens": 4}
+
+    # File pleine: une génération en cours, une en file
+    release = threading.Event()
+    pool.submit(release.wait)
+    while pool.stats()["busy"] == 0:
+        pass
+    pool.submit(lambda: None)
+    for url, body in (
+        ("/api/chat", {"message": "bonjour"}), ("/api/chat/stream", {"message": "bonjour"}),
+        ("/api/plan", plan), ("/api/plan/stream", plan),
+    ):
+        response = client.post(url, json=body)
+        assert response.status_code == 429, url
+        assert int(response.headers["Retry-After"]) == response.get_json()["retry_after"] >= 1
+    release.set()
+
+    # Délai par requête dépassé: génération bloquée au-delà de REQUEST_TIMEOUT_S
+    stall = threading.Event()
+
+    def stalled(*args, **kwargs):
+        stall.wait()
+        yield from ()
+
+    monkeypatch.setattr(api, "REQUEST_TIMEOUT_S", 0.05)
+    monkeypatch.setattr(api, "iter_chat_tokens", stalled)
+    monkeypatch.setattr(api, "iter_plan_weeks", stalled)
+    try:
+        assert client.post("/api/chat", json={"message": "bonjour"}).status_code == 504
+        assert client.post("/api/plan", json=plan).status_code == 504
+    finally:
+        stall.set()
+    assert pool.stats()["timeouts"] == 2
+
+
+def test_metrics_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    latency = registry.histogram("demo_seconds", "Latence", buckets=(0.1, 1.0), labelnames=("endpoint",))
+    errors = registry.counter("demo_errors_total", "Erreurs", labelnames=("status",))
+    registry.collector(lambda: [("demo_queue_length", "gauge", "File", 3)])
+    for value in (0.05, 0.5, 2.0):
+        latency.observe(value, endpoint="/api/chat")
+    errors.inc(status=500)
+    errors.inc(status=500)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE demo_seconds histogram" in lines
+    assert 'demo_seconds_bucket{endpoint="/api/chat",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{endpoint="/api/chat",le="1.0"} 2' in lines
+    assert 'demo_seconds_bucket{endpoint="/api/chat",le="+Inf"} 3' in lines
+    assert 'demo_seconds_sum{endpoint="/api/chat"} 2.55' in lines
+    assert 'demo_seconds_count{endpoint="/api/chat"} 3' in lines
+    assert 'demo_errors_total{status="500"} 2' in lines
+    assert "demo_queue_length 3" in lines
+
+
+def test_safetensors_export_is_preferred_and_loads_memory_mapped(tmp_path):
+    model = _small_model()
+    source = tmp_path / "model.pth"
+    torch.save(model.state_dict(), source)
+    assert resolve_checkpoint(source) == source
+
+    target = export_safetensors(source)
+    assert resolve_checkpoint(source) == target == tmp_path / "model.safetensors"
+    for path in (source, target):
+        for mmap in (True, False):
+            restored = SimpleGPT(vocab_size=100, embedding_dim=32, n_layers=2, n_heads=4, context_length=64)
+            restored.load_state_dict(load_state_dict_file(path, mmap=mmap), assign=True)
+            input_ids = torch.randint(0, 100, (1, 10))
+            with torch.no_grad():
+                torch.testing.assert_close(restored.eval()(input_ids), model(input_ids))
+
+
+def test_model_router_weighted_sticky_routing_swap_and_stats():
+    router = ModelRouter()
+    variant_a = ModelVariant("a", "a.pth", _small_model())
+    router.add(variant_a, weight=0.75)
+    router.add(ModelVariant("b", "b.pth", _small_model()), weight=0.25)
+
+    keys = [f"message {i}" for i in range(400)]
+    chosen = [router.choose(key).name for key in keys]
+    assert chosen == [router.choose(key).name for key in keys]
+    assert 0.15 < chosen.count("b") / len(keys) < 0.35
+
+    replacement = ModelVariant("a", "a2.pth", _small_model())
+    assert router.add(replacement) is variant_a
+    assert router.get("a") is replacement and replacement.version != variant_a.version
+    router.set_weights({"b": 1})
+    assert {router.choose(key).name for key in keys} == {"b"}
+    with pytest.raises(ValueError):
+        router.set_weights({"c": 1})
+    with pytest.raises(ValueError):
+        router.set_weights({"a": 0})
+
+    replacement.record(0.5, valid=True, generated_tokens=40)
+    replacement.record(1.5, valid=False, generated_tokens=60)
+    stats = router.stats()
+    assert stats["a"]["weight"] == 0.0 and stats["b"]["traffic_share"] == 1.0
+    assert stats["a"]["requests"] == 2 and stats["a"]["valid_ratio"] == 0.5
+    assert stats["a"]["avg_latency_s"] == 1.0 and stats["a"]["max_latency_s"] == 1.5
+
+    # Nouvelle variante sans poids: aucun trafic avant un appel de routage explicite
+    router.add(ModelVariant("c", "c.pth", _small_model()))
+    assert router.stats()["c"]["weight"] == 0.0 and {router.choose(key).name for key in keys} == {"b"}
+    router.set_weights({"c": 1})
+    assert router.choose("message 0").name == "c"
+
+
+def _wait_reload(api, name):
+    for _ in range(500):
+        if api.reload_status.get(name, {}).get("state") not in (None, "loading"):
+            return api.reload_status[name]
+        threading.Event().wait(0.01)
+    raise AssertionError(f"rechargement de {name} non terminé")
+
+
+def test_admin_endpoints_require_token_confine_checkpoints_and_validate_weights(api, monkeypatch, tmp_path):
+    client = api.app.test_client()
+    assert client.get("/api/admin/models").status_code == 403
+
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(api, "reload_status", {})
+    monkeypatch.setattr(api, "MODEL_PATH", tmp_path / "models" / "model.pth")
+    assert client.get("/api/admin/models").status_code == 401
+    assert client.get("/api/admin/models", headers={"Authorization": "Bearer autre"}).status_code == 401
+    headers = {"Authorization": "Bearer secret"}
+    assert client.get("/api/admin/models", headers=headers).get_json()["models"]["a"]["weight"] == 1.0
+
+    # Seuls les fichiers du dossier des modèles sont chargeables
+    (tmp_path / "models").mkdir()
+    (tmp_path / "secret.pth").write_bytes(b"hors du dossier des modeles")
+    for checkpoint in ("../secret.pth", str(tmp_path / "secret.pth")):
+        response = client.post("/api/admin/models/b", json={"checkpoint": checkpoint}, headers=headers)
+        assert response.status_code == 400
+    assert api.model_router.get("b") is None and api.reload_status == {}
+
+    # Poids invalides (rechargement et routage)
+    for weight in (-1, True, "1"):
+        assert client.post("/api/admin/models/a", json={"weight": weight}, headers=headers).status_code == 400
+    for weights in ({"a": "x"}, {"a": -1}, {"z": 1}, {"a": 0}, [1]):
+        assert client.put("/api/admin/routing", json={"weights": weights}, headers=headers).status_code == 400
+
+    # Checkpoint illisible: erreur signalée, variante en service inchangée
+    (tmp_path / "models" / "broken.pth").write_bytes(b"pas un checkpoint")
+    served = api.model_router.get("a")
+    response = client.post("/api/admin/models/a", json={"checkpoint": "broken.pth"}, headers=headers)
+    assert response.status_code == 202 and _wait_reload(api, "a")["state"] == "error"
+    assert api.model_router.get("a") is served
+
+    # Nouvelle variante: chargée sans trafic, puis routée explicitement
+    monkeypatch.setattr(api, "build_variant", lambda name, path, device: ModelVariant(name, path, api.model))
+    (tmp_path / "models" / "b.pth").write_bytes(b"")
+    response = client.post("/api/admin/models/b", json={"checkpoint": "b.pth"}, headers=headers)
+    assert response.status_code == 202 and _wait_reload(api, "b")["state"] == "ok"
+    assert api.model_router.stats()["b"]["weight"] == 0.0
+    assert all(api.model_router.choose(f"message {i}").name == "a" for i in range(50))
+    response = client.put("/api/admin/routing", json={"weights": {"b": 1}}, headers=headers)
+    assert response.status_code == 200 and api.model_router.choose("message").name == "b"
+
+    # Rechargement de la variante principale: échangée, le modèle global suit
+    response = client.post("/api/admin/models/a", headers=headers)
+    assert response.status_code == 202 and _wait_reload(api, "a")["state"] == "ok"
+    assert api.model_router.get("a") is not served and api.model is api.model_router.get("a").model
+
+
+def test_repetition_penalty_is_sign_correct_and_batched_sampler_respects_top_k():
+    logits = torch.tensor([[2.0, -2.0, 1.0, -1.0], [2.0, -2.0, 1.0, -1.0]])
+    token_ids = torch.tensor([[0, 1, 1, 0], [3, 3, 2, 0]])
+    attention_mask = torch.tensor([[0, 1, 1, 1], [1, 1, 1, 0]])
+
+    penalized = apply_repetition_penalty(logits.clone(), token_ids, 2.0, attention_mask=attention_mask)
+    # Positif divisé, négatif multiplié; le padding (position masquée) n'est pas pénalisé
+    torch.testing.assert_close(penalized, torch.tensor([[1.0, -4.0, 1.0, -1.0], [2.0, -2.0, 0.5, -2.0]]))
+
+    # Vocabulaire restreint: ids convertis en colonnes, ids hors vocabulaire ignorés
+    vocab_index = torch.tensor([-1, 0, -1, 1, 2, 3])
+    penalized = apply_repetition_penalty(logits[:1].clone(), torch.tensor([[0, 2, 4]]), 2.0, vocab_index=vocab_index)
+    torch.testing.assert_close(penalized, torch.tensor([[2.0, -2.0, 0.5, -1.0]]))
+    assert torch.equal(apply_repetition_penalty(logits[:1].clone(), torch.tensor([[0, 2]]), 2.0, vocab_index=vocab_index), logits[:1])
+
+    generator = torch.Generator().manual_seed(0)
+    samples = torch.cat([sample_top_k(logits, top_k=2, generator=generator) for _ in range(50)], dim=1)
+    assert samples.shape == (2, 50) and set(samples.flatten().tolist()) == {0, 2}
+
+
+def test_speculative_decoding_with_ngram_draft_keeps_the_sampling_distribution():
+    model = _small_model()
+    prompt_ids = torch.tensor([[5, 6, 7, 8]])
+    expected = generate_with_sampling(model, prompt_ids, None, "cpu", max_tokens=20, top_k=1, stop_token=-1, use_cache=True)
+
+    # Brouillon en partie juste: la sortie gloutonne, et une suite concurrente plus fréquente
+    greedy = expected[0].tolist()
+    wrong = greedy[:10] + [(greedy[10] + 1) % 100]
+    draft = NgramDraft([greedy, wrong, wrong], order=2, min_confidence=0.0, stop_token=99)
+    assert draft.propose([5, 6], 3) == greedy[2:5]
+    output_ids = generate_with_sampling(
+        model, prompt_ids, None, "cpu", max_tokens=20, top_k=1, stop_token=-1, use_cache=True, draft=draft
+    )
+    assert torch.equal(output_ids, expected)
+    stats = draft.stats()
+    assert 0 < stats["accepted_tokens"] < stats["proposed_tokens"]
+
+    # Colonne proposée acceptée avec sa probabilité, loi des tokens produits inchangée
+    logits = torch.log(torch.tensor([[0.75, 0.25]]))
+    generator = torch.Generator().manual_seed(0)
+    results = [verify_draft_token(logits, 1, generator=generator) for _ in range(4000)]
+    accepted = sum(is_accepted for _, is_accepted in results) / len(results)
+    ones = sum(column.item() for column, _ in results) / len(results)
+    assert abs(accepted - 0.25) < 0.03 and abs(ones - 0.25) < 0.03
+
+
+def test_week_index_looks_up_dataset_features_and_counts_coverage():
+    plan_input = build_plan_input("marathon", "general", 20, 4)
+    entries = [
+        {"input": plan_input, "output": "Lundi: Rest", "metadata": {"week": 1}},
+        {"input": plan_input, "output": "Lundi: Rest", "metadata": {"week": 1}},
+        {"input": plan_input, "output": "Lundi: 5 km Run", "metadata": {"week": 1}},
+        {"input": plan_input, "output": "Lundi: Tempo", "metadata": {"week": 2}},
+    ]
+    index = WeekIndex(entries, postprocess=str.upper)
+
+    # Sorties distinctes de la plus fréquente à la moins fréquente, choisies par la graine
+    assert index.lookup_message(plan_input.replace("general", "General")) == "LUNDI: REST"
+    assert index.lookup_message(plan_input, seed=1) == "LUNDI: 5 KM RUN"
+    assert index.get(make_week_key("marathon", "general", "20", "4", "Non précisé", week=2)) == "LUNDI: TEMPO"
+    assert index.get(make_week_key("marathon", "advanced", 20, 4)) is None
+    assert index.stats() == {"keys": 2, "hits": 3, "nearest_hits": 0, "misses": 1, "coverage": 0.75}
+
+    # Message libre ou combinaison absente: semaine la plus proche du même objectif
+    assert parse_message_features("Semi-marathon débutant en 16 semaines, 4 séances, objectif 1h45, semaine 3") == (
+        {"goal": "halfmarathon", "level": "beginner", "weeks": "16", "sessions": "4", "goal_time": "1h45m"}, 3
+    )
+    assert parse_message_features("entrainement marathon")[1] is None
+    assert index.lookup_message("Je prépare un marathon en 18 semaines, 4 sorties par semaine") == "LUNDI: REST"
+    assert index.lookup_message("marathon, semaine 2 sur 20") == "LUNDI: TEMPO"
+    assert index.lookup({"goal": "marathon", "level": "general", "weeks": 20, "sessions": 5, "goal_time": None}, 2) == (
+        "LUNDI: TEMPO"
+    )
+    # Trop loin (niveau, séances et temps objectif différents), autre objectif, message sans objectif
+    assert index.lookup({"goal": "marathon", "level": "advanced", "weeks": 20, "sessions": 6, "goal_time": "3h"}) is None
+    assert index.lookup_message("plan 10 km en 8 semaines") is None
+    assert index.lookup_message("bonjour") is None
+    assert index.stats()["nearest_hits"] == 3 and index.stats()["misses"] == 4
+
+    # Programme entièrement indexé: semaines reprises dans l'ordre, sans modèle
+    plan = {"goal": "marathon", "level": "general", "weeks": 2, "sessions": 4, "goal_time": None}
+    indexed = {week: {"week": week, "bot_response": f"semaine {week}"} for week in (2, 1)}
+    assert [week for week, _ in iter_plan_weeks(None, plan, {}, indexed=indexed)] == [1, 2]
+
+
+def test_enforce_week_structure_matches_golden_corpus():
+    # Corpus: sorties de test_data_results*.json, brutes et dégradées (benchmarks/postprocess_engine.py)
+    golden_path = Path(__file__).resolve().parent / "tests_data" / "week_structure_golden.json"
+    with open(golden_path, "r", encoding="utf-8") as f:
+        golden = json.load(f)
+
+    assert [enforce_week_structure(text) for text, _ in golden] == [expected for _, expected in golden]
+    assert enforce_week_structure("Lundi: Rest Tuesday: 5km\\nMercredi: Mercredi: 10/12 min: tempo") == (
+        "Lundi: Rest\nMardi: 5 km Easy Run\nMercredi: Mercredi: 10 12 min tempo\nJeudi: Rest\n"
+        "Vendredi: Rest\nSamedi: Rest\nDimanche: Rest"
+    )
+    assert clean_content(" 8 tempo ") == "8 km Tempo"
+    assert clean_content("45MIN") == "45 MIN Easy Run"
+    assert clean_content("5 km Run Mardi: Rest") == "5 km Run"
+
+
+def test_parse_week_extracts_workout_fields_and_weekly_totals():
+    assert parse_workout("8-10 km Easy Run") == {"activity": "Run", "distance_km": 9.0, "duration_min": None, "reps": None}
+    assert parse_workout("6 x 400m intervals") == {"activity": "Intervals", "distance_km": 2.4, "duration_min": None, "reps": 6}
+    assert parse_workout("30 à 45 minutes recovery run") == {
+        "activity": "Recovery Run", "distance_km": None, "duration_min": 37.5, "reps": None
+    }
+    assert parse_workout("Long run 10 miles")["distance_km"] == 16.09
+    assert parse_workout("Easy")["activity"] == "Other"
+
+    week = parse_week("Lundi: Rest\nMardi: 5 km Run\nMercredi: 4 x 5 min tempo\nJeudi: Rest\n"
+                      "Vendredi: 8 km Run\nSamedi: Rest\nDimanche: 16 km Long Run")
+    assert [day["day"] for day in week["days"]] == DAY_LABELS
+    assert week["days"][2] == {
+        "day": "Mercredi", "text": "4 x 5 min tempo", "activity": "Tempo Run",
+        "distance_km": None, "duration_min": 20.0, "reps": 4,
+    }
+    assert week["totals"] == {
+        "total_km": 29.0, "total_min": 20.0, "sessions": 4, "rest_days": 3,
+        "activities": {"Run": 2, "Tempo Run": 1, "Long Run": 1},
+    }
+
+    # Mêmes libellés que le nettoyage du dataset d'entraînement
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    clean_training_text = pytest.importorskip("src.csv_to_json.clean_training_text")
+    assert ACTIVITY_PATTERNS == clean_training_text.CANONICAL_ACTIVITY_PATTERNS
+
+
+def test_single_flight_shares_one_generation_between_identical_requests():
+    flights = SingleFlight()
+    started = []
+    release = threading.Event()
+
+    def generation():
+        started.append(1)
+        yield 1
+        release.wait(timeout=5)
+        yield 2
+
+    leader_iter, leader = flights.stream("clé", generation)
+    assert leader and next(leader_iter) == 1
+    # Requête identique pendant la génération: mêmes éléments depuis le début, sans nouvelle génération
+    follower_iter, follower_leads = flights.stream("clé", generation)
+    assert not follower_leads and next(follower_iter) == 1
+    release.set()
+    assert list(follower_iter) == [2] and list(leader_iter) == [2] and len(started) == 1
+    assert flights.stats() == {"in_flight": 0, "leaders": 1, "followers": 1, "coalesce_ratio": 0.5}
+
+    # Génération terminée, ou abandonnée par tous: une requête suivante en redémarre une
+    abandoned, _ = flights.stream("clé", generation)
+    next(abandoned)
+    abandoned.close()
+    assert flights.stream("clé", generation)[1] and len(started) == 2
+
+    def failing():
+        raise ValueError("échec")
+        yield
+
+    first, _ = flights.stream("erreur", failing)
+    second, _ = flights.stream("erreur", failing)
+    for subscriber in (first, second):
+        with pytest.raises(ValueError):
+            next(subscriber)
+
+
+def test_admission_control_budgets_generated_tokens_per_client_and_caps_concurrency():
+    control = AdmissionControl(tokens_per_s=1e-3, burst=300, max_concurrent=2, busy_retry_after=lambda: 7)
+
+    # Réservation de max_tokens, puis seuls les tokens générés restent décomptés
+    first = control.admit("ip:a", 200)
+    first.settle(50)
+    first.release()
+    control.admit("ip:a", 200).release()
+    with pytest.raises(RateLimitError) as excinfo:
+        control.admit("ip:a", 200)
+    assert excinfo.value.retry_after > 1
+    # Budget distinct par client
+    second = control.admit("ip:b", 200)
+
+    # Plafond global: la place est libérée à la fin de la génération qu'elle garde
+    generation = second.guard(iter([1, 2]))
+    third = control.admit("ip:c", 10)
+    with pytest.raises(RateLimitError) as excinfo:
+        control.admit("ip:d", 10)
+    assert excinfo.value.retry_after == 7
+    third.release()
+    third.release()
+    assert list(generation) == [1, 2]
+    assert control.stats()["active"] == 0
+
+    # Requête servie sans génération (rattachée à une génération en cours): réservation rendue
+    follower = control.admit("ip:e", 100)
+    follower.release()
+    follower.settle(0)
+    follower.settle(100)
+    control.free("ip:e").settle(100)
+    assert control._buckets["ip:e"][0] == 300
+
+    # Requêtes identiques: seule la première admise réserve et prend une place
+    leader = control.admit("ip:e", 100, key="k")
+    assert control.admit("ip:e", 100, key="k") is None
+    leader.release()
+    assert control.admit("ip:e", 100, key="k") is not None
+    assert control.stats()["budget_rejected"] == 1 and control.stats()["concurrency_rejected"] == 1
+
+
+def test_plan_admits_only_weeks_missing_from_the_index(api, monkeypatch):
+    plan = {"goal": "marathon", "level": "general", "weeks": 2, "sessions": 4}
+    plan_input = build_plan_input(plan["goal"], plan["level"], plan["weeks"], plan["sessions"])
+    monkeypatch.setattr(api, "week_index", WeekIndex([
+        {"input": plan_input, "output": "Lundi: Rest", "metadata": {"week": week}} for week in (1, 2)
+    ]))
+    monkeypatch.setattr(api, "admission_control", AdmissionControl(tokens_per_s=0.001, burst=50, max_concurrent=2))
+    client = api.app.test_client()
+
+    # Budget du client épuisé par une génération de /api/chat
+    assert client.post("/api/chat", json={"message": "bonjour", "max_tokens": 50}).status_code == 200
+    assert client.post("/api/chat", json={"message": "encore", "max_tokens": 50}).status_code == 429
+    # Programme entièrement indexé: servi sans admission; une semaine à générer est refusée
+    response = client.post("/api/plan", json=plan)
+    assert response.status_code == 200 and response.get_json()["indexed_weeks"] == 2
+    assert client.post("/api/plan/stream", json=dict(plan, seed=1)).status_code == 200
+    assert client.post("/api/plan", json=dict(plan, goal="10km")).status_code == 429
+
+
+def test_thread_sweep_keeps_fastest_setting_and_profile_is_persisted_per_host(tmp_path):
+    assert thread_candidates(6) == [1, 2, 4, 6] and thread_candidates(1) == [1]
+
+    threads_before = torch.get_num_threads()
+    calls = []
+
+    def run():
+        # Plus rapide avec 2 threads
+        calls.append(torch.get_num_threads())
+        threading.Event().wait(0.002 if torch.get_num_threads() == 2 else 0.01)
+
+    try:
+        best, timings = sweep_threads(run, [1, 2, 3], repeats=2)
+        assert best == 2 and torch.get_num_threads() == 2 and sorted(timings) == [1, 2, 3]
+        assert calls == [1, 1, 1, 2, 2, 2, 3, 3, 3]
+    finally:
+        torch.set_num_threads(threads_before)
+
+    path = tmp_path / "profil" / "threads.json"
+    host = host_signature(model_arch="simple", web_workers=2)
+    assert load_thread_profile(path, host) is None
+    save_thread_profile(path, host, {"intra_op_threads": 2, "interop_threads": 1})
+    save_thread_profile(path, dict(host, web_workers=1), {"intra_op_threads": 4, "interop_threads": 1})
+    save_thread_profile(path, host, {"intra_op_threads": 3, "interop_threads": 2})
+    assert load_thread_profile(path, host) == {"intra_op_threads": 3, "interop_threads": 2, "host": host}
+    assert load_thread_profile(path, dict(host, web_workers=1))["intra_op_threads"] == 4
+
+    # Un seul processus mesure: les autres attendent le verrou du profil
+    order = []
+
+    def other_worker():
+        with thread_profile_lock(path):
+            order.append("other")
+
+    with thread_profile_lock(path):
+        worker = threading.Thread(target=other_worker)
+        worker.start()
+        worker.join(0.05)
+        order.append("sweep")
+    worker.join()
+    assert order == ["sweep", "other"]
@@ -0,0 +1,26 @@
+"""Point d'entrée WSGI de production (gunicorn, configuration dans gunicorn.conf.py).
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+Le modèle est chargé une seule fois dans le processus maître (`preload_app`): les
+workers forkés partagent ses poids en copie sur écriture au lieu de les recharger.
+"""
+import time
+
+_import_start = time.perf_counter()
+
+import torch
+
+# Un seul thread dans le maître: le pool OpenMP ne doit pas être créé avant le fork
+# (le nombre de threads de chaque worker est fixé dans gunicorn.conf.py)
+torch.set_num_threads(1)
+
+import app as backend
+
+# Imports mesurés depuis ce fichier: torch est importé ici, avant app
+backend.startup_timings["import_s"] = time.perf_counter() - _import_start
+
+if not backend.load_model(start_workers=False):
+    raise RuntimeError("Impossible de démarrer le serveur sans modèle")
+
+application = backend.app
@@ -32,6 +32,15 @@ function ChatInterface() {
       .replace(/(^|[ \t])\/n(?=[ \t]|$)/g, '$1\n');
   };
 
+  // Semaine structurée renvoyée par le backend (`structured: true`): un jour par ligne + totaux
+  const formatWeek = (data) => {
+    if (!data.structured) return normalizeNewlines(data.bot_response);
+    const { days, totals } = data.structured;
+    const lines = days.map((day) => `${day.day}: ${day.text}`);
+    lines.push('', `Total: ${totals.total_km} km, ${totals.sessions} séances`);
+    return lines.join('\n');
+  };
+
   const sendMessage = async (e) => {
     e.preventDefault();
     
@@ -68,13 +77,14 @@ function ChatInterface() {
       }
 
       const response = await axios.post(`${apiUrl}/api/chat`, {
-        message: userMessage.text
+        message: userMessage.text,
+        structured: true
       });
 
       // Ajouter la réponse du bot
       const botMessage = {
         id: messages.length + 2,
-        text: normalizeNewlines(response.data.bot_response),
+        text: formatWeek(response.data),
         sender: 'bot',
         timestamp: new Date()
       };
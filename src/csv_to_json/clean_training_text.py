@@ -1,6 +1,21 @@
 import hashlib
 import re
 
+# Canonical workout type labels, by priority (first match wins).
+# Goal: reduce label noise and keep diversity terms with consistent meaning.
+# The backend parses generated weeks with the same labels (backend/inference/workout_fields.py).
+CANONICAL_ACTIVITY_PATTERNS = [
+    (r"\blong\s*run\b", "Long Run"),
+    (r"\bmarathon\s*pace\b", "Marathon Pace"),
+    (r"\btempo\b|\bthreshold\b", "Tempo Run"),
+    (r"\bintervals?\b|\brepeats?\b|\brepetition\b|\brépétition\b|\btrack\b|\bfartlek\b", "Intervals"),
+    (r"\bhills?\b|\buphill\b|\buphills\b", "Hills"),
+    (r"\bstrides?\b", "Strides"),
+    (r"\bcross-?train\b|\bcross\s*training\b", "Cross-Train"),
+    (r"\brecovery\b", "Recovery Run"),
+    (r"\brun\b", "Run"),
+]
+
 
 def clean_training_text(text: str) -> str:
     if not text:
@@ -122,21 +137,8 @@ def clean_training_text(text: str) -> str:
     text = re.sub(r"\b(and|et)\b\s*$", "", text, flags=re.IGNORECASE).strip()
 
     # Canonicalize workout type labels (even when distance is missing)
-    # Goal: reduce label noise and keep diversity terms with consistent meaning.
-    canonical_patterns = [
-        (r"\blong\s*run\b", "Long Run"),
-        (r"\bmarathon\s*pace\b", "Marathon Pace"),
-        (r"\btempo\b|\bthreshold\b", "Tempo Run"),
-        (r"\bintervals?\b|\brepeats?\b|\brepetition\b|\brépétition\b|\btrack\b|\bfartlek\b", "Intervals"),
-        (r"\bhills?\b|\buphill\b|\buphills\b", "Hills"),
-        (r"\bstrides?\b", "Strides"),
-        (r"\bcross-?train\b|\bcross\s*training\b", "Cross-Train"),
-        (r"\brecovery\b", "Recovery Run"),
-        (r"\brun\b", "Run"),
-    ]
-
     canonical_activity = None
-    for pat, label in canonical_patterns:
+    for pat, label in CANONICAL_ACTIVITY_PATTERNS:
         if re.search(pat, text, flags=re.IGNORECASE):
             canonical_activity = label
             break